@@ -9,6 +9,7 @@ import logging
 
 # Assuming simple_video_assembler is in src and this script is at the project root
 from src.simple_video_assembler import assemble_video, load_config, natural_sort
+from src.build_manifest import BuildManifest, MANIFEST_FILENAME
 
 # Setup logging
 log_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assemble_from_output.log')
@@ -53,8 +54,14 @@ def main():
     logging.info(f"Using configuration: {config}")
 
     try:
-        image_files = natural_sort([os.path.join(slides_dir, f) for f in os.listdir(slides_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
-        audio_files = natural_sort([os.path.join(audio_dir, f) for f in os.listdir(audio_dir) if f.lower().endswith('.mp3')])
+        # The manifest written by src/main.py says exactly which files belong to the deck
+        artifacts = BuildManifest(os.path.join(project_root, "output", MANIFEST_FILENAME)).slide_artifacts()
+        if artifacts:
+            logging.info("Using the slides and audio recorded in the build manifest.")
+            image_files, audio_files = artifacts['images'], artifacts['audio']
+        else:
+            image_files = natural_sort([os.path.join(slides_dir, f) for f in os.listdir(slides_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
+            audio_files = natural_sort([os.path.join(audio_dir, f) for f in os.listdir(audio_dir) if f.lower().endswith('.mp3')])
 
         if not image_files:
             logging.error(f"No image files found in {slides_dir}")
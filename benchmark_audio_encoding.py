@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Audio encode time of the old assembly (each slide's MP3 decoded and encoded to AAC
+inside its own segment) against the current one (narration joined frame by frame,
+then encoded once per deck, or stream-copied with video.audio_codec: "copy").
+
+Test narration is generated with ffmpeg's sine source, so only ffmpeg is needed.
+
+Usage: python benchmark_audio_encoding.py [--slides 40] [--seconds 20]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.audio_utils import concatenate_mp3
+
+
+def ffmpeg(*args):
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', *args], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-slide vs per-deck narration encoding")
+    parser.add_argument("--slides", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=20.0, help="Narration length of each slide")
+    parser.add_argument("--bitrate", default="192k")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Same format as gTTS output: 24 kHz mono MP3
+        audio_files = []
+        for i in range(args.slides):
+            path = os.path.join(work_dir, f"audio_{i + 1}.mp3")
+            ffmpeg('-f', 'lavfi', '-i', f"sine=frequency={220 + 10 * i}:sample_rate=24000:duration={args.seconds}",
+                   '-ac', '1', '-codec:a', 'libmp3lame', '-b:a', '32k', path)
+            audio_files.append(path)
+
+        start = time.monotonic()
+        for i, path in enumerate(audio_files):
+            ffmpeg('-i', path, '-c:a', 'aac', '-b:a', args.bitrate, os.path.join(work_dir, f"segment_{i + 1}.m4a"))
+        per_slide = time.monotonic() - start
+
+        start = time.monotonic()
+        joined = concatenate_mp3(audio_files, os.path.join(work_dir, "narration.mp3"))
+        ffmpeg('-i', joined, '-c:a', 'aac', '-b:a', args.bitrate, os.path.join(work_dir, "narration.m4a"))
+        per_deck = time.monotonic() - start
+
+        start = time.monotonic()
+        joined = concatenate_mp3(audio_files, os.path.join(work_dir, "narration_copy.mp3"))
+        ffmpeg('-i', joined, '-c:a', 'copy', os.path.join(work_dir, "narration_copy.mp4"))
+        copied = time.monotonic() - start
+
+    print(f"{args.slides} slides of {args.seconds:.0f}s narration")
+    print(f"{'mode':<28} {'time':>8} {'speedup':>8} {'lossy encodes':>14}")
+    for name, elapsed, encodes in (("AAC per slide (old)", per_slide, 2), ("AAC once per deck (aac)", per_deck, 2),
+                                   ("stream copy (copy)", copied, 1)):
+        print(f"{name:<28} {elapsed:>7.2f}s {per_slide / elapsed:>7.1f}x {encodes:>14}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
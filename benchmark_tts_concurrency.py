@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Wall-clock time of generate_all_audio against the local mock TTS server
+(src/mock_tts_server.py), for increasing tts.concurrency. Each request to the
+server takes --latency seconds, as a real TTS service would, so the run time
+should fall roughly as slides / concurrency * latency until the server's own
+limit is reached. The real ElevenLabs or gTTS provider is used, pointed at the
+mock server through elevenlabs.base_url / tts.gtts_base_url.
+
+Usage: python benchmark_tts_concurrency.py [--provider elevenlabs] [--slides 24] [--latency 0.5] [--levels 1 2 4 8]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src import audio_generator
+from src.mock_tts_server import MockTTSServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generate_all_audio concurrency against a mock TTS server")
+    parser.add_argument("--provider", choices=["elevenlabs", "gtts"], default="elevenlabs")
+    parser.add_argument("--slides", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds the mock server takes per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency per request, up to this many seconds")
+    parser.add_argument("--server-limit", type=int, default=8, help="Concurrent requests the mock server accepts")
+    parser.add_argument("--levels", type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    narrations = [f"Narração do slide {i}." for i in range(1, args.slides + 1)]
+    print(f"{args.provider}: {args.slides} slides, {args.latency:.2f}s per request, server limit {args.server_limit}")
+    print(f"{'concurrency':>11} {'wall time':>10} {'speedup':>8} {'peak':>5} {'429s':>5}")
+    baseline = None
+    with MockTTSServer(latency=args.latency, latency_jitter=args.jitter, max_concurrency=args.server_limit,
+                       seed=0) as server:
+        for level in args.levels:
+            server.stats.update(max_in_flight=0, throttled=0)
+            with tempfile.TemporaryDirectory() as output_dir:
+                config = {
+                    'output_dir': output_dir,
+                    'cache': {'audio': False},
+                    'tts': {'provider': args.provider, 'concurrency': level, 'retry_backoff': 0.1,
+                            'gtts_base_url': server.base_url},
+                    'elevenlabs': {'api_key': 'benchmark', 'voice_id': 'mock', 'base_url': server.elevenlabs_url},
+                }
+                start = time.monotonic()
+                paths = audio_generator.generate_all_audio(narrations, config)
+                elapsed = time.monotonic() - start
+            if len(paths) != len(narrations):
+                print(f"{level:>11} {'failed':>10}")
+                continue
+            baseline = baseline or elapsed
+            print(f"{level:>11} {elapsed:>9.2f}s {baseline / elapsed:>7.1f}x "
+                  f"{server.stats['max_in_flight']:>5} {server.stats['throttled']:>5}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -32,11 +32,14 @@ from PyQt5.QtGui import QIcon, QPixmap
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.latex_parser import parse_latex_file, Slide
-from src.chatgpt_script_generator import format_slide_for_chatgpt, clean_chatgpt_response
+from src.chatgpt_script_generator import format_slide_for_chatgpt, clean_chatgpt_response, DeckContext
 from src.openai_script_generator import initialize_openai_client, generate_script_with_openai
 from src.image_generator import generate_slide_images
 from src.audio_generator import generate_all_audio
 from src.simple_video_assembler import assemble_video, natural_sort # Import natural_sort
+from src.speech_cache import configure_formula_cache
+from src.llm_cache import configure_llm_cache
+from src.audio_cache import configure_audio_cache
 
 # Configure logging
 logging.basicConfig(
@@ -495,6 +498,9 @@ class LaTeX2VideoGUI(QMainWindow):
                 os.makedirs(self.output_dir, exist_ok=True)
                 for sub_dir in ['slides', 'audio', 'temp_pdf', 'chatgpt_prompts', 'chatgpt_responses']:
                     os.makedirs(os.path.join(self.output_dir, sub_dir), exist_ok=True)
+                configure_formula_cache(self.config)
+                configure_llm_cache(self.config)
+                configure_audio_cache(self.config)
                 return True
             except Exception as e:
                 logging.error(f"Error loading config: {e}")
@@ -524,8 +530,9 @@ class LaTeX2VideoGUI(QMainWindow):
             temp_prompts = []
             if self.slides: # Ensure slides were actually parsed
                 logging.info(f"Generating prompts for {len(self.slides)} slides immediately after parsing.")
+                deck = DeckContext(self.slides)
                 for i, slide_obj in enumerate(self.slides):
-                    prompt_content = format_slide_for_chatgpt(slide_obj, self.slides, i)
+                    prompt_content = format_slide_for_chatgpt(slide_obj, self.slides, i, deck=deck)
                     temp_prompts.append(prompt_content)
                 self.prompts = temp_prompts
                 logging.info(f"Successfully generated {len(self.prompts)} prompts and stored them.")
@@ -569,8 +576,9 @@ class LaTeX2VideoGUI(QMainWindow):
             logging.info(f"Starting script generation for {len(self.slides)} slides.")
             narrations = []
             prompts = []
+            deck = DeckContext(self.slides)
             for i, slide in enumerate(self.slides):
-                formatted_content = format_slide_for_chatgpt(slide, self.slides, i)
+                formatted_content = format_slide_for_chatgpt(slide, self.slides, i, deck=deck)
                 prompts.append(formatted_content)
                 logging.info(f"Generating script for slide {i+1}/{len(self.slides)}")
                 script = generate_script_with_openai(client, formatted_content, self.config)
@@ -6,7 +6,6 @@ import yaml
 import argparse
 import glob
 import re
-import time
 from openai import OpenAI
 
 # Add the parent directory to the path so we can import from src
@@ -15,6 +14,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from src.latex_parser import parse_latex_file
 from src.chatgpt_script_generator import generate_chatgpt_prompts, save_prompts_to_files
 from src.automated_video_generation import generate_script_with_openai, initialize_openai_client
+from src.rate_limit import rate_limiter_from_config, map_in_order, DEFAULT_CONCURRENCY
+from src.llm_cache import configure_llm_cache
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -80,30 +81,24 @@ def regenerate_responses(prompts: list, empty_slides: list, client: OpenAI, conf
     """Regenerate responses for empty slides."""
     logging.info(f"Regenerating responses for {len(empty_slides)} empty slides...")
     
-    success = True
+    prompts_by_number = {p["slide_number"]: p for p in prompts}
+    limiter = rate_limiter_from_config(config)
     
-    for slide_number in empty_slides:
+    def regenerate(slide_number: int) -> bool:
         # Find the corresponding prompt
-        prompt_data = None
-        for p in prompts:
-            if p["slide_number"] == slide_number:
-                prompt_data = p
-                break
-        
+        prompt_data = prompts_by_number.get(slide_number)
         if not prompt_data:
             logging.error(f"Could not find prompt data for slide {slide_number}")
-            success = False
-            continue
+            return False
         
         logging.info(f"Generating response for slide {slide_number}: {prompt_data['title']}")
         
         # Generate script with OpenAI
-        raw_script = generate_script_with_openai(client, prompt_data, config)
+        raw_script = generate_script_with_openai(client, prompt_data, config, limiter)
         
         if not raw_script:
             logging.error(f"Failed to generate script for slide {slide_number}")
-            success = False
-            continue
+            return False
         
         # Save the response to a file
         response_file = os.path.join(responses_dir, f"slide_{slide_number}_response.txt")
@@ -113,12 +108,11 @@ def regenerate_responses(prompts: list, empty_slides: list, client: OpenAI, conf
             logging.info(f"Saved response for slide {slide_number} to {response_file}")
         except Exception as e:
             logging.error(f"Error saving response for slide {slide_number}: {e}")
-            success = False
-        
-        # Add a small delay to avoid rate limiting
-        time.sleep(1)
+            return False
+        return True
     
-    return success
+    concurrency = config.get('openai', {}).get('concurrency', DEFAULT_CONCURRENCY)
+    return all(map_in_order(regenerate, empty_slides, concurrency))
 
 def main():
     """Main function to regenerate prompts and responses for empty slides."""
@@ -155,6 +149,9 @@ def main():
     
     # Add output_dir to config
     config['output_dir'] = output_dir
+    # This script exists to get new answers, so never serve cached ones (they are still updated)
+    config.setdefault('openai', {})['reroll'] = True
+    configure_llm_cache(config)
     
     # Initialize OpenAI client
     client = initialize_openai_client(config)
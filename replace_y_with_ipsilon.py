@@ -4,22 +4,11 @@ import sys
 import glob
 import re
 
-def replace_y_with_ipsilon(text):
-    """Replace standalone 'y' with 'ipsilon' in the text."""
-    # Replace standalone 'y' (surrounded by spaces, punctuation, or at beginning/end)
-    # but not when it's part of a word
-    text = re.sub(r'(?<!\w)y(?!\w)', 'ipsilon', text)
-    
-    # Special cases for common mathematical expressions
-    text = re.sub(r'f\(x, y\)', 'f(x, ipsilon)', text)
-    text = re.sub(r'g\(x, y\)', 'g(x, ipsilon)', text)
-    text = re.sub(r'L\(x, y', 'L(x, ipsilon', text)  # Handle L(x, y, λ) case
-    
-    # Additional cases for mathematical expressions
-    text = re.sub(r'xy', 'x·ipsilon', text)  # Replace xy with x·ipsilon
-    text = re.sub(r'2y', '2·ipsilon', text)  # Replace 2y with 2·ipsilon
-    
-    return text
+# Add the project root to the path so we can import from src
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# The 'y' -> 'ipsilon' rules live in the shared narration normalizer
+from src.text_normalizer import replace_y_with_ipsilon
 
 def process_all_responses(responses_dir):
     """Process all response files to replace 'y' with 'ipsilon'."""
@@ -0,0 +1,79 @@
+import logging
+import threading
+
+from src.run_report import register_report_source
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+
+def _field(obj, name: str, default=None):
+    """Attribute of an SDK object or key of a plain dict (batch results are parsed JSON)."""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+class PromptCacheStats:
+    """
+    Token usage reported by the chat API, in particular how much of each prompt was
+    served from the provider's prompt cache (usage.prompt_tokens_details.cached_tokens).
+    The API only caches prefixes of 1024 tokens or more, so short prompts never hit.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage):
+        """Add the `usage` of one response; ignored when the response carries none."""
+        if usage is None:
+            return
+        prompt_tokens = _field(usage, 'prompt_tokens', 0) or 0
+        cached_tokens = _field(_field(usage, 'prompt_tokens_details'), 'cached_tokens', 0) or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.completion_tokens += _field(usage, 'completion_tokens', 0) or 0
+            if cached_tokens:
+                self.cache_hits += 1
+        logger.debug(f"Prompt tokens: {prompt_tokens} ({cached_tokens} cached)")
+
+    def hit_rate(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def report(self) -> str:
+        if not self.requests:
+            return "Prompt cache: no API usage recorded"
+        return (f"Prompt cache: {self.cache_hits}/{self.requests} requests hit, "
+                f"{self.cached_tokens} of {self.prompt_tokens} prompt tokens cached ({self.hit_rate():.0%}), "
+                f"{self.completion_tokens} completion tokens")
+
+
+_stats = PromptCacheStats()
+
+
+def get_usage_stats() -> PromptCacheStats:
+    return _stats
+
+
+def reset_usage_stats() -> PromptCacheStats:
+    """Start counting from zero, e.g. at the beginning of a run."""
+    global _stats
+    _stats = PromptCacheStats()
+    register_report_source('prompt_cache', _stats.report)
+    return _stats
+
+
+def record_usage(usage):
+    _stats.record(usage)
+
+
+register_report_source('prompt_cache', _stats.report)
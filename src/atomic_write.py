@@ -0,0 +1,59 @@
+import os
+import shutil
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def partial_path(path: str) -> str:
+    """
+    Where to write `path` before it is complete. The extension is kept, since ffmpeg,
+    PIL and gTTS pick the output format from it.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.partial{ext}"
+
+
+def discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """
+    Yield a temporary path to write `path` through. It replaces `path` only if the
+    block finishes without an exception, so a crash never leaves a truncated file
+    under the final name for a later run to reuse.
+
+        with atomic_output(image_path) as temp_path:
+            image.save(temp_path)
+    """
+    temp_path = partial_path(path)
+    discard(temp_path)
+    try:
+        yield temp_path
+    except BaseException:
+        discard(temp_path)
+        raise
+    os.replace(temp_path, path)
+
+
+def commit_partial(path: str, success: bool) -> bool:
+    """
+    Finish a write made through partial_path(path) by a call that reports failure with
+    a return value: on success the file replaces `path`, else it is discarded.
+    """
+    temp_path = partial_path(path)
+    if success and os.path.exists(temp_path):
+        os.replace(temp_path, path)
+    else:
+        discard(temp_path)
+    return success
+
+
+def atomic_copy(source: str, destination: str):
+    """Copy a file so that `destination` is never seen half written."""
+    with atomic_output(destination) as temp_path:
+        shutil.copyfile(source, temp_path)
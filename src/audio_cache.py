@@ -0,0 +1,91 @@
+import os
+import re
+import logging
+from typing import Dict, Optional
+
+from src.content_cache import ContentCache, cache_root, content_key
+from src.run_report import register_report_source
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 2048
+# Bump to invalidate every cached clip, e.g. after changing how text is sent to the providers
+AUDIO_CACHE_VERSION = "1"
+
+# The cache consulted by the TTS pool; None until a pipeline enables it
+_active_cache: Optional[ContentCache] = None
+_hardlinks = False
+
+
+def configure_audio_cache(config: Dict) -> Optional[ContentCache]:
+    """
+    Enable the synthesized-audio cache described by the 'cache' config section. Point
+    cache.dir at a shared directory to let several workers reuse each other's audio.
+    """
+    global _hardlinks
+    cache_config = config.get('cache', {}) or {}
+    if not cache_config.get('audio', True):
+        logger.info("Audio cache disabled in config")
+        set_audio_cache(None)
+        return None
+
+    _hardlinks = bool(cache_config.get('audio_hardlinks', False))
+    directory = os.path.join(cache_root(config), 'audio')
+    if _active_cache is not None and _active_cache.directory == directory:
+        return _active_cache
+    max_bytes = int(cache_config.get('audio_max_mb', DEFAULT_MAX_MB) * 1024 * 1024)
+    try:
+        set_audio_cache(ContentCache(directory, max_bytes, name="Audio cache", suffix='.mp3'))
+    except OSError as e:
+        logger.warning(f"Could not open audio cache at {directory}, continuing without it: {e}")
+        set_audio_cache(None)
+        return None
+    logger.info(f"Using audio cache at {directory}")
+    return _active_cache
+
+
+def set_audio_cache(cache: Optional[ContentCache]):
+    global _active_cache
+    _active_cache = cache
+    register_report_source('audio', cache.report if cache else None)
+
+
+def get_audio_cache() -> Optional[ContentCache]:
+    return _active_cache
+
+
+def normalize_tts_text(text: str) -> str:
+    """Text as far as the audio is concerned: surrounding and repeated whitespace do not matter."""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def audio_key(provider, text: str) -> Optional[str]:
+    """
+    Cache key of the audio `provider` produces for `text`, or None if the provider
+    does not describe its voice (see TTSProvider.cache_identity) and cannot be cached.
+    """
+    identity_method = getattr(provider, 'cache_identity', None)
+    identity = identity_method() if callable(identity_method) else None
+    if not isinstance(identity, dict):
+        return None
+    return content_key(AUDIO_CACHE_VERSION, identity, normalize_tts_text(text))
+
+
+def fetch_cached_audio(key: Optional[str], output_path: str) -> bool:
+    """Place the cached audio for `key` at output_path; False on a miss or without a cache."""
+    cache = _active_cache
+    if cache is None or key is None:
+        return False
+    return cache.copy_to(key, output_path, hardlink=_hardlinks)
+
+
+def store_audio(key: Optional[str], output_path: str):
+    """Remember freshly synthesized audio, if a cache is enabled."""
+    cache = _active_cache
+    if cache is None or key is None:
+        return
+    try:
+        cache.put_file(key, output_path)
+    except OSError as e:
+        logger.warning(f"Could not store audio in cache: {e}")
@@ -1,17 +1,28 @@
 import os
 import logging
 import time
-from typing import List, Dict, Optional # Added Optional
+from typing import Callable, Collection, List, Dict, Optional # Added Optional
 import yaml
 
 # Import the TTS provider interface and factory
 from .tts_provider import create_tts_provider, TTSProvider # Added TTSProvider for type hint
+from .tts_pool import TTSPool
+from .chunked_tts import synthesize_chunked, timing_path
+from .atomic_write import atomic_copy
 
 # Get a logger for this module
 logger = logging.getLogger(__name__)
 
-def generate_all_audio(narrations: List[str], config: Dict) -> List[str]:
-    """Generates audio files for all narration scripts using the configured TTS provider."""
+def generate_all_audio(narrations: List[str], config: Dict,
+                       on_audio_ready: Optional[Callable[[int, str], None]] = None,
+                       only: Optional[Collection[int]] = None) -> List[str]:
+    """
+    Generates audio files for all narration scripts using the configured TTS provider.
+    on_audio_ready, if given, is called with (slide index, audio path) as soon as each
+    slide's audio exists, so later stages can start on it before the whole deck is done.
+    With `only`, just those slides (0-based) are synthesized; the others must already
+    have their audio at the usual paths, which are returned for them unchanged.
+    """
     logger.info("========== generate_all_audio CALLED ==========")
     # Attempt to flush all handlers of the root logger
     for handler in logging.getLogger().handlers:
@@ -49,47 +60,67 @@ def generate_all_audio(narrations: List[str], config: Dict) -> List[str]:
             logger.error("[AUDIO] Abortando geração de áudio devido à falha na criação do provider.")
             return []
 
-        audio_paths = []
         total_narrations = len(narrations)
         logger.info(f"[AUDIO] Total de narrações para processar: {total_narrations}")
-        for handler in logging.getLogger().handlers: handler.flush()
-        
+        output_files = [os.path.join(audio_output_dir, f"audio_{i + 1}.mp3") for i in range(total_narrations)]
+
+        # One synthesis per distinct text; slides repeating a text get a copy of its audio
+        first_slide_for_text: Dict[str, int] = {}
+        slides_for_text: Dict[str, List[int]] = {}
+        jobs = []
+        job_slides = []
         for i, narration_text in enumerate(narrations):
-            slide_num = i + 1
-            output_file = os.path.join(audio_output_dir, f"audio_{slide_num}.mp3")
-            logger.info(f"[AUDIO-DEBUG] Loop iteration: slide {slide_num}/{total_narrations}")
-            logger.info(f"[AUDIO] --- Slide {slide_num}/{total_narrations} ---")
-            logger.info(f"[AUDIO] Caminho de saída: {output_file}")
+            if only is not None and i not in only:
+                continue
+            slides_for_text.setdefault(narration_text, []).append(i)
+            if narration_text in first_slide_for_text:
+                continue
+            first_slide_for_text[narration_text] = i
+            jobs.append((narration_text, output_files[i]))
+            job_slides.append(i)
             # Limit log length for narration text to avoid overly verbose logs
             log_narration_text = narration_text[:200].replace(chr(10), ' ') + ('...' if len(narration_text) > 200 else '')
-            logger.info(f"[AUDIO] Texto da narração (prévia): {log_narration_text}")
-            for handler in logging.getLogger().handlers: handler.flush()
-            
-            start_time = time.time()
-            success = False # Initialize
-            logger.info(f"[AUDIO-DEBUG] Attempting to call tts_provider.generate_audio for slide {slide_num}")
-            for handler in logging.getLogger().handlers: handler.flush()
-            
-            success = tts_provider.generate_audio(narration_text, output_file) # Critical call
-            
-            logger.info(f"[AUDIO-DEBUG] Retorno de tts_provider.generate_audio: {success} para {output_file}")
-            for handler in logging.getLogger().handlers: handler.flush()
-            
-            elapsed = time.time() - start_time
-            logger.info(f"[AUDIO-DEBUG] Tempo de execução para slide {slide_num}: {elapsed:.2f}s")
-            
-            if success:
-                logger.info(f"[AUDIO] Áudio gerado com sucesso: {output_file}")
-                audio_paths.append(output_file)
-            else:
-                logger.error(f"[AUDIO] Falha ao gerar áudio para o slide {slide_num}. Interrompendo o processo.")
-                logger.info(f"[AUDIO-DEBUG] audio_paths até o erro: {audio_paths}")
-                return [] 
-
-            # Add a small delay between API calls to avoid rate limiting if using online services
-            # Consider making this delay configurable or specific to certain providers
-            time.sleep(config.get('tts', {}).get('delay_between_calls', 1))
-            for handler in logging.getLogger().handlers: handler.flush()
+            logger.info(f"[AUDIO] Slide {i + 1}/{total_narrations} -> {output_files[i]}: {log_narration_text}")
+
+        def job_done(job_index: int, success: bool):
+            if not success:
+                return
+            source = job_slides[job_index]
+            for i in slides_for_text[narrations[source]]:
+                if i != source:
+                    # Replaced rather than written through: it may be a hard link into the audio cache
+                    atomic_copy(output_files[source], output_files[i])
+                    if os.path.exists(timing_path(output_files[source])):
+                        atomic_copy(timing_path(output_files[source]), timing_path(output_files[i]))
+                    logger.info(f"[AUDIO] Mesmo texto do slide {source + 1}, áudio copiado para {output_files[i]}")
+                if on_audio_ready:
+                    try:
+                        on_audio_ready(i, output_files[i])
+                    except Exception as e:
+                        logger.error(f"[AUDIO] Erro ao notificar áudio pronto do slide {i + 1}: {e}", exc_info=True)
+
+        pool = TTSPool.from_config(tts_provider, config)
+        logger.info(f"[AUDIO] Sintetizando {len(jobs)} textos com até {pool.concurrency} requisições simultâneas")
+        start_time = time.time()
+        chunk_sentences = tts_config.get('chunk_sentences', False)
+        render_breaks = tts_config.get('render_breaks', False)
+        if chunk_sentences or render_breaks:
+            # Sentences synthesized in parallel and cached one by one, then joined per slide,
+            # and/or <break> pauses spliced in as silence instead of sent to the provider
+            results = synthesize_chunked(pool, jobs, sentences=chunk_sentences, render_breaks=render_breaks,
+                                         on_done=job_done)
+        else:
+            results = pool.synthesize_all(jobs, on_done=job_done)
+        elapsed = time.time() - start_time
+        logger.info(f"[AUDIO] {len(jobs)} textos sintetizados em {elapsed:.2f}s ({pool.calls} chamadas ao provider)")
+
+        failed = [job_slides[j] + 1 for j, success in enumerate(results) if not success]
+        if failed:
+            logger.error(f"[AUDIO] Falha ao gerar áudio para os slides {failed} após as tentativas. Interrompendo o processo.")
+            return []
+
+        # Slides repeating a text got their copy as soon as its audio was ready
+        audio_paths = list(output_files)
 
         logger.info(f"[AUDIO] Geração de áudios finalizada. Total gerado: {len(audio_paths)}")
         logger.info(f"[AUDIO-DEBUG] Lista final de audio_paths: {audio_paths}")
@@ -0,0 +1,157 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+ID3V2_HEADER_SIZE = 10
+ID3V1_TAG_SIZE = 128
+
+
+def strip_id3_tags(data: bytes) -> bytes:
+    """Remove a leading ID3v2 tag and a trailing ID3v1 tag, leaving only MPEG audio frames."""
+    if data[:3] == b'ID3' and len(data) >= ID3V2_HEADER_SIZE:
+        # Tag size is a 28-bit "syncsafe" integer (7 bits per byte)
+        size = 0
+        for byte in data[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        has_footer = data[5] & 0x10
+        data = data[ID3V2_HEADER_SIZE + size + (ID3V2_HEADER_SIZE if has_footer else 0):]
+    if len(data) >= ID3V1_TAG_SIZE and data[-ID3V1_TAG_SIZE:-ID3V1_TAG_SIZE + 3] == b'TAG':
+        data = data[:-ID3V1_TAG_SIZE]
+    return data
+
+
+def concatenate_mp3(part_paths: List[str], output_path: str, gaps: Optional[Sequence[float]] = None,
+                    lead: float = 0.0) -> str:
+    """
+    Join MP3 files into one by appending their frames, the same way gTTS joins the
+    audio of long texts. No re-encoding is needed as long as all parts share the same
+    sample rate and channel layout, which holds for parts from the same TTS voice.
+    gaps[i], if given, is the seconds of silence inserted after part i, and `lead` the
+    seconds of silence before the first part.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = output_path + ".tmp"
+    with open(temp_path, 'wb') as output:
+        for index, part_path in enumerate(part_paths):
+            with open(part_path, 'rb') as part:
+                frames = strip_id3_tags(part.read())
+            if index == 0 and lead > 0:
+                output.write(silence_like(frames, lead))
+            output.write(frames)
+            if gaps and gaps[index] > 0:
+                output.write(silence_like(frames, gaps[index]))
+    os.replace(temp_path, output_path)
+    logger.debug(f"Joined {len(part_paths)} MP3 parts into {output_path}")
+    return output_path
+
+
+# Bitrates in kbps by [MPEG-1?][layer][index]; index 0 is "free format", 15 is invalid
+_BITRATES = {
+    True: {1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+           2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+           3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]},
+    False: {1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+            2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+            3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]},
+}
+# Sample rates in Hz by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _parse_frame_header(header: bytes):
+    """(frame length in bytes, samples in the frame, sample rate) of an MPEG audio frame header, or None."""
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 0x03
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version_bits == 3
+    bitrate = _BITRATES[mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if mpeg1 or layer == 2 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+
+def mp3_stream_format(path: str) -> Optional[tuple]:
+    """
+    (sample rate, channels) of an MP3 file from its first frame header, or None if it
+    holds no MPEG audio frame. Files with the same format can be joined without re-encoding.
+    """
+    with open(path, 'rb') as f:
+        data = strip_id3_tags(f.read(64 * 1024))
+    for position in range(max(len(data) - 3, 0)):
+        frame = _parse_frame_header(data[position:position + 4])
+        if frame is not None:
+            # Channel mode 3 is mono; stereo, joint stereo and dual channel have two
+            return frame[2], 1 if data[position + 3] >> 6 == 3 else 2
+    return None
+
+
+def mp3_duration(path: str) -> float:
+    """
+    Length of an MP3 file in seconds, from its frame headers: exact for constant and
+    variable bitrate files and needs no decoder. Bytes that are not a frame are skipped.
+    """
+    with open(path, 'rb') as f:
+        data = strip_id3_tags(f.read())
+    duration = 0.0
+    position = 0
+    while position + 4 <= len(data):
+        frame = _parse_frame_header(data[position:position + 4])
+        if frame is None:
+            position += 1
+            continue
+        length, samples, sample_rate = frame
+        duration += samples / sample_rate
+        position += length
+    return duration
+
+
+# Silent frame by the header of the audio it is spliced into, built once per format
+_silent_frames: Dict[bytes, Optional[bytes]] = {}
+_silent_frames_lock = threading.Lock()
+
+
+def _silent_frame(header: bytes) -> Optional[bytes]:
+    """
+    One frame of silence in the format of `header`: same version, layer, bitrate,
+    sample rate and channel mode, no CRC, no padding, and all-zero side information
+    and audio data, which every decoder plays as digital silence.
+    """
+    with _silent_frames_lock:
+        if header in _silent_frames:
+            return _silent_frames[header]
+    silent_header = bytes([header[0], header[1] | 0x01, header[2] & 0xFD, header[3]])
+    frame = _parse_frame_header(silent_header)
+    silent = silent_header + b'\x00' * (frame[0] - 4) if frame else None
+    with _silent_frames_lock:
+        _silent_frames[header] = silent
+    return silent
+
+
+def silence_like(frames: bytes, seconds: float) -> bytes:
+    """
+    MP3 frames of `seconds` silence (to the nearest frame, ~26 ms) that can be appended
+    to `frames` without re-encoding. Empty if `frames` holds no MPEG audio frame.
+    """
+    for position in range(max(len(frames) - 3, 0)):
+        frame = _parse_frame_header(frames[position:position + 4])
+        if frame is None:
+            continue
+        silent = _silent_frame(frames[position:position + 4])
+        if silent is None:
+            break
+        _, samples, sample_rate = frame
+        return silent * round(seconds * sample_rate / samples)
+    logger.warning("No MPEG audio frame found, pause left out")
+    return b''
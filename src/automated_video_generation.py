@@ -4,21 +4,30 @@ import sys
 import logging
 import yaml
 import argparse
-from typing import List, Dict
-import time
+from typing import List, Dict, Optional
 from openai import OpenAI
 
 # Add the parent directory to the path so we can import from src
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.latex_parser import parse_latex_file, Slide
-from src.chatgpt_script_generator import format_slide_for_chatgpt, clean_chatgpt_response
+from src.chatgpt_script_generator import clean_chatgpt_response, build_slide_prompts, save_prompts_to_files, NARRATION_GUIDELINES
+from src.text_normalizer import normalize_for_narration, find_narration_issues
 from src.image_generator import generate_slide_images
 from src.audio_generator import generate_all_audio
 from src.simple_video_assembler import assemble_video
+from src.speech_cache import configure_formula_cache
+from src.run_report import log_run_report
+from src.rate_limit import RateLimiter, rate_limiter_from_config, map_in_order, DEFAULT_CONCURRENCY
+from src.llm_cache import cached_completion_text, configure_llm_cache
+from src.audio_cache import configure_audio_cache
+from src.prompt_dedup import plan_script_requests
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SCRIPT_SYSTEM_MESSAGE = "You are an expert educational content creator who specializes in creating clear, concise narration scripts for educational videos. You explain complex concepts in an accessible way, with special attention to mathematical formulas. DO NOT include any markers like '[Início do Script de Narração]' or '[Fim do Script de Narração]' in your response. Just provide the narration script directly."
+EMPTY_SLIDE_INSTRUCTIONS = "For this empty slide, create a brief transition (2-3 sentences) that connects the previous topic to the next one. Do not invent content that isn't there, just create a smooth transition between concepts."
+
 def load_config(config_path: str) -> dict:
     """Loads configuration from YAML file."""
     try:
@@ -40,126 +49,145 @@ def load_config(config_path: str) -> dict:
         return {}
 
 def initialize_openai_client(config: Dict) -> OpenAI:
-    """Initialize the OpenAI client with API key from config."""
+    """
+    Initialize the OpenAI client with API key from config. openai.base_url points it at
+    another OpenAI-compatible server, e.g. src/mock_openai_server.py; a local server
+    does not need a real API key.
+    """
     openai_config = config.get('openai', {})
     api_key = openai_config.get('api_key')
+    base_url = openai_config.get('base_url')
     
     if not api_key:
-        logging.error("OpenAI API key not found in config. Please add your API key to config/config.yaml")
-        return None
+        if not base_url:
+            logging.error("OpenAI API key not found in config. Please add your API key to config/config.yaml")
+            return None
+        api_key = "local"
     
     try:
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, base_url=base_url or None)
+        if base_url:
+            logging.info(f"Using OpenAI-compatible API at {base_url}")
         return client
     except Exception as e:
         logging.error(f"Error initializing OpenAI client: {e}")
         return None
 
-def generate_script_with_openai(client: OpenAI, prompt_data: Dict, config: Dict) -> str:
-    """Generate a script for a slide using the OpenAI API."""
-    openai_config = config.get('openai', {})
-    model = openai_config.get('model', 'gpt-4o')
-    temperature = openai_config.get('temperature', 0.7)
-    max_tokens = openai_config.get('max_tokens', 1000)
-    
+def is_empty_slide_prompt(prompt: str) -> bool:
+    """Check if this is an empty slide that needs a transition script."""
+    return "[ATTENTION: This slide appears to have no content" in prompt
+
+def script_system_message(prompt_data: Dict) -> str:
+    """
+    System message of a script request. It is the same for every slide of every deck, so
+    all requests share a prefix the API can cache; whatever varies goes in the user message.
+    """
+    if 'context' in prompt_data:
+        return SCRIPT_SYSTEM_MESSAGE + "\n\n" + NARRATION_GUIDELINES
+    # Prompt formatted on its own, which carries the guidelines itself
+    return SCRIPT_SYSTEM_MESSAGE
+
+def slide_user_message(prompt_data: Dict) -> str:
+    """Deck outline (shared by all slides of the deck) followed by the slide-specific part."""
     prompt = prompt_data["prompt"]
-    slide_title = prompt_data["title"]
-    slide_number = prompt_data["slide_number"]
-    
-    # Check if this is an empty slide that needs a transition script
-    is_empty_slide = "[ATTENTION: This slide appears to have no content" in prompt
-    
-    # Adjust system message based on slide content
-    system_message = "You are an expert educational content creator who specializes in creating clear, concise narration scripts for educational videos. You explain complex concepts in an accessible way, with special attention to mathematical formulas. DO NOT include any markers like '[Início do Script de Narração]' or '[Fim do Script de Narração]' in your response. Just provide the narration script directly."
-    
-    if is_empty_slide:
-        # Add specific instructions for empty slides
-        system_message += " For this empty slide, create a brief transition (2-3 sentences) that connects the previous topic to the next one. Do not invent content that isn't there, just create a smooth transition between concepts."
-    
+    if is_empty_slide_prompt(prompt):
+        # Add specific instructions for empty slides, after the shared prefix
+        prompt += "\n\n" + EMPTY_SLIDE_INSTRUCTIONS
+    if prompt_data.get('context'):
+        return prompt_data['context'] + "\n\n" + prompt
+    return prompt
+
+def build_chat_request(prompt_data: Dict, config: Dict) -> Dict:
+    """Chat-completion request body (model, messages and sampling settings) for one slide prompt."""
+    openai_config = config.get('openai', {})
+    return {
+        "model": openai_config.get('model', 'gpt-4o'),
+        "messages": [
+            {"role": "system", "content": script_system_message(prompt_data)},
+            {"role": "user", "content": slide_user_message(prompt_data)}
+        ],
+        "temperature": openai_config.get('temperature', 0.7),
+        "max_tokens": openai_config.get('max_tokens', 1000),
+    }
+
+def finalize_script(script: str, prompt_data: Dict) -> str:
+    """Strip a generated script, replacing a missing transition for an empty slide with a default one."""
+    script = (script or "").strip()
+    # For empty slides, ensure we have at least some content
+    if is_empty_slide_prompt(prompt_data["prompt"]) and len(script) < 10:
+        logging.warning(f"Generated script for empty slide {prompt_data['slide_number']} was too short. Using default transition.")
+        script = f"Agora que vimos {prompt_data['title']}, vamos avançar para o próximo conceito. Esta transição nos ajuda a conectar as ideias e manter o fluxo da apresentação."
+    return script
+
+def generate_script_with_openai(client: OpenAI, prompt_data: Dict, config: Dict,
+                                limiter: Optional[RateLimiter] = None) -> str:
+    """Generate a script for a slide using the OpenAI API, within the limits of `limiter` if given."""
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
-        
-        script = response.choices[0].message.content.strip()
-        
-        # For empty slides, ensure we have at least some content
-        if is_empty_slide and (not script or len(script) < 10):
-            logging.warning(f"Generated script for empty slide {slide_number} was too short. Using default transition.")
-            script = f"Agora que vimos {slide_title}, vamos avançar para o próximo conceito. Esta transição nos ajuda a conectar as ideias e manter o fluxo da apresentação."
-        
-        return script
+        script = cached_completion_text(client, limiter, config, **build_chat_request(prompt_data, config))
+        return finalize_script(script, prompt_data)
     except Exception as e:
         logging.error(f"Error generating script with OpenAI: {e}")
         return ""
 
-def generate_all_scripts(slides: List[Slide], client: OpenAI, config: Dict) -> List[str]:
-    """Generate scripts for all slides using the OpenAI API."""
-    scripts = []
-    
+def prepare_prompts(slides: List[Slide], config: Dict) -> List[Dict]:
+    """Build the ChatGPT prompt of every slide and save them to output/chatgpt_prompts."""
     # Create directory for prompts
     output_dir = config.get('output_dir', 'output')
     prompts_dir = os.path.join(output_dir, 'chatgpt_prompts')
     os.makedirs(prompts_dir, exist_ok=True)
     
-    # Generate prompts for all slides
-    from src.chatgpt_script_generator import generate_chatgpt_prompts, save_prompts_to_files
-    
-    # Get the LaTeX file path or PDF file path
-    file_path = config.get('latex_file_path', '')
-    if not file_path:
-        logging.warning("LaTeX file path not found in config. Using the first slide's content directly.")
-        # Generate prompts directly from slides
-        prompts = []
-        for i, slide in enumerate(slides):
-            # Format the slide content for ChatGPT
-            prompt = format_slide_for_chatgpt(slide, slides, i)
-            prompts.append({
-                "slide_number": i+1,
-                "title": slide.title,
-                "prompt": prompt
-            })
-    else:
-        logging.info(f"Generating prompts from file: {file_path}")
-        prompts = generate_chatgpt_prompts(file_path)
+    # Generate prompts for all slides from the slides already parsed, numbered by position
+    # like the scripts and audio files
+    prompts = build_slide_prompts(slides, slide_numbers=list(range(1, len(slides) + 1)))
     
     # Save prompts to files
     prompt_file_paths = save_prompts_to_files(prompts, prompts_dir)
     logging.info(f"Generated and saved {len(prompts)} prompts to {prompts_dir}")
+    return prompts
+
+def generate_all_scripts(slides: List[Slide], client: OpenAI, config: Dict) -> List[str]:
+    """
+    Generate scripts for all slides using the OpenAI API.
+    Up to openai.concurrency requests run at once, within the requests/minute and
+    tokens/minute limits from the config. Scripts are returned in slide order.
+    """
+    prompts = prepare_prompts(slides, config)
+    limiter = rate_limiter_from_config(config)
     
-    for i, prompt in enumerate(prompts):
-        slide_number = prompt["slide_number"]
-        slide_title = prompt["title"]
-        logging.info(f"Generating script for slide {slide_number}/{len(prompts)}: {slide_title}")
-        
-        # Generate script with OpenAI - pass the prompt data dictionary
-        raw_script = generate_script_with_openai(client, prompt, config)
-        
-        if raw_script:
-            # Clean up the response to remove any ChatGPT-specific formatting or markers
-            cleaned_script = clean_chatgpt_response(raw_script)
-            
-            if cleaned_script:
-                scripts.append(cleaned_script)
-                logging.info(f"Successfully generated and cleaned script for slide {i+1}")
-            else:
-                logging.warning(f"Script for slide {i+1} was empty after cleaning. Using placeholder.")
-                scripts.append(f"Script for slide {i+1} could not be generated properly.")
-        else:
-            logging.error(f"Failed to generate script for slide {i+1}")
-            # Add a placeholder script to maintain alignment with slides
-            scripts.append(f"Script for slide {i+1} could not be generated.")
+    # Outline and section slides use template narration; identical prompts share one request
+    plan = plan_script_requests(slides, prompts, config)
+    
+    if config.get('openai', {}).get('pack_slides', False):
+        # Several consecutive slides per request, falling back to one request per slide
+        from src.request_packing import generate_packed_scripts
+        request_scripts = generate_packed_scripts(plan.requests, client, config, limiter)
+    else:
+        def generate(prompt: Dict) -> str:
+            logging.info(f"Generating script for slide {prompt['slide_number']}/{len(prompts)}: {prompt['title']}")
+            # Generate script with OpenAI - pass the prompt data dictionary
+            return generate_script_with_openai(client, prompt, config, limiter)
         
-        # Add a small delay to avoid rate limiting
-        time.sleep(1)
+        concurrency = config.get('openai', {}).get('concurrency', DEFAULT_CONCURRENCY)
+        request_scripts = map_in_order(generate, plan.requests, concurrency)
     
-    return scripts
+    raw_scripts = plan.expand(request_scripts)
+    return [clean_generated_script(raw_script, prompt["slide_number"]) for raw_script, prompt in zip(raw_scripts, prompts)]
+
+def clean_generated_script(raw_script: str, slide_number: int) -> str:
+    """Clean a raw API answer, or return a placeholder that keeps scripts aligned with slides."""
+    if not raw_script:
+        logging.error(f"Failed to generate script for slide {slide_number}")
+        # Add a placeholder script to maintain alignment with slides
+        return f"Script for slide {slide_number} could not be generated."
+    
+    # Clean up the response to remove any ChatGPT-specific formatting or markers
+    cleaned_script = clean_chatgpt_response(raw_script)
+    if not cleaned_script:
+        logging.warning(f"Script for slide {slide_number} was empty after cleaning. Using placeholder.")
+        return f"Script for slide {slide_number} could not be generated properly."
+    
+    logging.info(f"Successfully generated and cleaned script for slide {slide_number}")
+    return cleaned_script
 
 def save_scripts_to_files(scripts: List[str], output_dir: str) -> List[str]:
     """Save generated scripts to files."""
@@ -179,181 +207,60 @@ def save_scripts_to_files(scripts: List[str], output_dir: str) -> List[str]:
     return file_paths
 
 def process_scripts_for_narration(scripts_dir: str) -> bool:
-    """Process scripts to prepare them for narration.
+    """Process saved scripts to prepare them for narration.
     
-    This function:
-    1. Removes any remaining LaTeX control characters
-    2. Replaces 'y' with 'ipsilon' for proper Portuguese pronunciation
-    3. Tests the processed scripts to ensure they're ready for narration
+    Each response file is read once, normalized in memory (remaining LaTeX control
+    characters removed, 'y' read as 'ipsilon'), checked for leftover issues and
+    written back once.
     """
-    import re
     import glob
     
     logging.info("Processing scripts for narration...")
     
-    # Step 1: Remove LaTeX control characters
-    logging.info("Step 1: Removing LaTeX control characters...")
-    try:
-        # Define function to clean LaTeX control characters
-        def clean_latex_control_chars(text):
-            # Remove LaTeX math delimiters and control characters
-            # Inline math delimiters: \( ... \) or $ ... $
-            text = re.sub(r'\\\((.*?)\\\)', r'\1', text, flags=re.DOTALL)
-            text = re.sub(r'\$(.*?)\$', r'\1', text, flags=re.DOTALL)
-            
-            # Display math delimiters: \[ ... \] or $$ ... $$
-            text = re.sub(r'\\\[(.*?)\\\]', r'\1', text, flags=re.DOTALL)
-            text = re.sub(r'\$\$(.*?)\$\$', r'\1', text, flags=re.DOTALL)
-            
-            # Remove LaTeX commands that might remain
-            text = re.sub(r'\\[a-zA-Z]+', '', text)  # Remove LaTeX commands like \lambda, \alpha, etc.
-            text = re.sub(r'\\[^a-zA-Z]', '', text)  # Remove LaTeX special characters like \{, \}, etc.
-            
-            return text
-        
-        # Find all response files
-        response_files = glob.glob(os.path.join(scripts_dir, "slide_*_response.txt"))
-        
-        if not response_files:
-            logging.error(f"No response files found in '{scripts_dir}'.")
-            return False
-        
-        # Clean each file
-        for file_path in sorted(response_files):
-            # Read the original content
-            with open(file_path, 'r', encoding='utf-8') as f:
-                original_content = f.read()
-            
-            # Clean the content
-            cleaned_content = clean_latex_control_chars(original_content)
-            
-            # Write the cleaned content back to the original file
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(cleaned_content)
-            
-            logging.info(f"Cleaned LaTeX control characters from {os.path.basename(file_path)}")
-        
-        logging.info("Successfully removed LaTeX control characters from all scripts.")
+    # Find all response files
+    response_files = glob.glob(os.path.join(scripts_dir, "slide_*_response.txt"))
     
-    except Exception as e:
-        logging.error(f"Error removing LaTeX control characters: {e}")
+    if not response_files:
+        logging.error(f"No response files found in '{scripts_dir}'.")
         return False
     
-    # Step 2: Replace 'y' with 'ipsilon'
-    logging.info("Step 2: Replacing 'y' with 'ipsilon' for proper Portuguese pronunciation...")
+    all_clean = True
     try:
-        # Define function to replace 'y' with 'ipsilon'
-        def replace_y_with_ipsilon(text):
-            # Replace standalone 'y' (surrounded by spaces, punctuation, or at beginning/end)
-            # but not when it's part of a word
-            text = re.sub(r'(?<!\w)y(?!\w)', 'ipsilon', text)
-            
-            # Special cases for common mathematical expressions
-            text = re.sub(r'f\(x, y\)', 'f(x, ipsilon)', text)
-            text = re.sub(r'g\(x, y\)', 'g(x, ipsilon)', text)
-            text = re.sub(r'L\(x, y', 'L(x, ipsilon', text)  # Handle L(x, y, λ) case
-            
-            # Additional cases for mathematical expressions
-            text = re.sub(r'xy', 'x·ipsilon', text)  # Replace xy with x·ipsilon
-            text = re.sub(r'2y', '2·ipsilon', text)  # Replace 2y with 2·ipsilon
-            
-            return text
-        
-        # Find all response files
-        response_files = glob.glob(os.path.join(scripts_dir, "slide_*_response.txt"))
-        
-        # Process each file
         for file_path in sorted(response_files):
-            # Read the original content
             with open(file_path, 'r', encoding='utf-8') as f:
                 original_content = f.read()
             
-            # Replace 'y' with 'ipsilon'
-            processed_content = replace_y_with_ipsilon(original_content)
+            processed_content = normalize_for_narration(original_content)
+            if not check_script_for_narration(processed_content, os.path.basename(file_path)):
+                all_clean = False
             
-            # Write the processed content back to the original file
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(processed_content)
+            if processed_content != original_content:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    f.write(processed_content)
             
-            logging.info(f"Replaced 'y' with 'ipsilon' in {os.path.basename(file_path)}")
-        
-        logging.info("Successfully replaced 'y' with 'ipsilon' in all scripts.")
-    
+            logging.info(f"Normalized {os.path.basename(file_path)} for narration")
     except Exception as e:
-        logging.error(f"Error replacing 'y' with 'ipsilon': {e}")
+        logging.error(f"Error processing scripts for narration: {e}")
         return False
     
-    # Step 3: Test the processed scripts
-    logging.info("Step 3: Testing processed scripts...")
-    try:
-        # Define function to check for remaining issues
-        def check_for_issues(text):
-            issues = []
-            
-            # Check for LaTeX control characters
-            latex_patterns = [
-                r'\\[a-zA-Z]+',  # LaTeX commands like \lambda, \alpha, etc.
-                r'\\[\(\)\[\]]',  # Math delimiters \(, \), \[, \]
-                r'\\\{', r'\\\}',  # Escaped braces \{, \}
-                r'\\[,;]',  # Spacing commands \, \;
-                r'\$\$.*?\$\$',  # Display math $$...$$
-                r'\$.*?\$',  # Inline math $...$
-            ]
-            
-            for pattern in latex_patterns:
-                matches = re.findall(pattern, text)
-                if matches:
-                    issues.append(f"Found LaTeX control characters: {matches[:3]}")
-            
-            # Check for standalone 'y'
-            y_matches = re.findall(r'(?<!\w)y(?!\w)', text)
-            if y_matches:
-                issues.append(f"Found standalone 'y' characters: {y_matches[:3]}")
-            
-            # Check for 'xy' or '2y' patterns
-            xy_matches = re.findall(r'xy', text)
-            if xy_matches:
-                issues.append(f"Found 'xy' patterns: {xy_matches[:3]}")
-            
-            two_y_matches = re.findall(r'2y', text)
-            if two_y_matches:
-                issues.append(f"Found '2y' patterns: {two_y_matches[:3]}")
-            
-            return issues
-        
-        # Find all response files
-        response_files = glob.glob(os.path.join(scripts_dir, "slide_*_response.txt"))
-        
-        all_clean = True
-        
-        # Test each file
-        for file_path in sorted(response_files):
-            # Read the file content
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Check for issues
-            issues = check_for_issues(content)
-            
-            if issues:
-                logging.warning(f"Issues found in {os.path.basename(file_path)}:")
-                for issue in issues:
-                    logging.warning(f"  - {issue}")
-                all_clean = False
-            else:
-                logging.info(f"No issues found in {os.path.basename(file_path)}")
-        
-        if all_clean:
-            logging.info("All scripts are clean and ready for narration.")
-        else:
-            logging.warning("Some scripts have issues that may affect narration quality.")
-            # We continue with the process, but log the warning
-        
-        return True
+    if all_clean:
+        logging.info("All scripts are clean and ready for narration.")
+    else:
+        logging.warning("Some scripts have issues that may affect narration quality.")
+        # We continue with the process, but log the warning
     
-    except Exception as e:
-        logging.error(f"Error testing processed scripts: {e}")
+    return True
+
+def check_script_for_narration(script: str, label: str) -> bool:
+    """Log any markup left in a normalized script. Returns True when the script is clean."""
+    issues = find_narration_issues(script)
+    if issues:
+        logging.warning(f"Issues found in {label}:")
+        for issue in issues:
+            logging.warning(f"  - {issue}")
         return False
+    logging.info(f"No issues found in {label}")
+    return True
 
 def main():
     """Main function to automate the entire video generation process."""
@@ -361,6 +268,8 @@ def main():
     parser.add_argument("latex_file", help="Path to the input LaTeX (.tex) file.")
     parser.add_argument("-c", "--config", default="config/config.yaml", help="Path to the configuration YAML file.")
     parser.add_argument("-s", "--save-scripts", action="store_true", help="Save the generated scripts to files.")
+    parser.add_argument("--reroll", action="store_true", help="Ask the model again even for slides with a cached response.")
+    parser.add_argument("--stream", action="store_true", help="Stream each script into TTS sentence by sentence while it is generated.")
     
     args = parser.parse_args()
     
@@ -381,6 +290,11 @@ def main():
     if not config:
         logging.error("Failed to load configuration. Exiting.")
         return
+    if args.reroll:
+        config.setdefault('openai', {})['reroll'] = True
+    configure_formula_cache(config)
+    configure_llm_cache(config)
+    configure_audio_cache(config)
     
     # Ensure output directories exist
     output_dir = config.get('output_dir', 'output')
@@ -429,66 +343,31 @@ def main():
     logging.info(f"Successfully prepared {len(content_image_paths)} images for {len(slides)} slides.")
     
     # --- 5. Generate Scripts with OpenAI ---
-    logging.info("Step 5: Generating scripts with OpenAI...")
-    scripts = generate_all_scripts(slides, client, config)
+    streaming = args.stream or config.get('openai', {}).get('stream_to_tts', False)
+    if streaming:
+        # --- 5+6. Stream scripts into TTS sentence by sentence ---
+        from src.streaming_narration import stream_scripts_to_audio
+        logging.info("Step 5: Streaming scripts from OpenAI into audio files...")
+        scripts, audio_paths = stream_scripts_to_audio(prepare_prompts(slides, config), client, config)
+    else:
+        logging.info("Step 5: Generating scripts with OpenAI...")
+        scripts = generate_all_scripts(slides, client, config)
+        
+        # Normalize every script for narration once, in memory
+        logging.info("Processing scripts for narration...")
+        scripts = [normalize_for_narration(script) for script in scripts]
+    for i, script in enumerate(scripts):
+        check_script_for_narration(script, f"script for slide {i+1}")
     
     # Save scripts if requested
     if args.save_scripts:
         logging.info(f"Saving scripts to {scripts_dir}...")
-        script_paths = save_scripts_to_files(scripts, scripts_dir)
-        
-        # --- 5a. Process Scripts for Narration ---
-        logging.info("Step 5a: Processing scripts for narration...")
-        if not process_scripts_for_narration(scripts_dir):
-            logging.error("Failed to process scripts for narration. Exiting.")
-            return
-        
-        # Read the processed scripts back
-        processed_scripts = []
-        for script_path in script_paths:
-            try:
-                with open(script_path, 'r', encoding='utf-8') as f:
-                    processed_scripts.append(f.read())
-            except Exception as e:
-                logging.error(f"Error reading processed script {script_path}: {e}")
-                return
-        
-        # Use the processed scripts instead of the original ones
-        scripts = processed_scripts
-    else:
-        # If scripts are not saved to files, process them in memory
-        logging.info("Processing scripts in memory...")
-        # Process each script to remove LaTeX control characters and replace 'y' with 'ipsilon'
-        import re
-        
-        def process_script(text):
-            # Remove LaTeX control characters
-            text = re.sub(r'\\\((.*?)\\\)', r'\1', text, flags=re.DOTALL)
-            text = re.sub(r'\$(.*?)\$', r'\1', text, flags=re.DOTALL)
-            text = re.sub(r'\\\[(.*?)\\\]', r'\1', text, flags=re.DOTALL)
-            text = re.sub(r'\$\$(.*?)\$\$', r'\1', text, flags=re.DOTALL)
-            text = re.sub(r'\\[a-zA-Z]+', '', text)
-            text = re.sub(r'\\[^a-zA-Z]', '', text)
-            
-            # Replace 'y' with 'ipsilon'
-            text = re.sub(r'(?<!\w)y(?!\w)', 'ipsilon', text)
-            text = re.sub(r'f\(x, y\)', 'f(x, ipsilon)', text)
-            text = re.sub(r'g\(x, y\)', 'g(x, ipsilon)', text)
-            text = re.sub(r'L\(x, y', 'L(x, ipsilon', text)
-            text = re.sub(r'xy', 'x·ipsilon', text)
-            text = re.sub(r'2y', '2·ipsilon', text)
-            
-            return text
-        
-        processed_scripts = []
-        for script in scripts:
-            processed_scripts.append(process_script(script))
-        
-        scripts = processed_scripts
+        save_scripts_to_files(scripts, scripts_dir)
     
     # --- 6. Generate Audio Files ---
-    logging.info("Step 6: Generating audio files from scripts...")
-    audio_paths = generate_all_audio(scripts, config)
+    if not streaming:
+        logging.info("Step 6: Generating audio files from scripts...")
+        audio_paths = generate_all_audio(scripts, config)
     if not audio_paths:
         logging.error("Failed to generate audio files. Exiting.")
         return
@@ -518,6 +397,7 @@ def main():
     
     logging.info(f"--- Video Generation Complete ---")
     logging.info(f"Final video saved to: {final_video_path}")
+    log_run_report()
     print(f"\nSuccess! Final video available at: {final_video_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Render many decks in one process, e.g. a whole semester:
+
+    python -m src.batch lectures/ -c config/config.yaml
+    python -m src.batch "semester/*/aula*.tex" --parallel-decks 6 --incremental
+
+Every deck runs the same pipeline as src/main.py, into its own directory under
+output_dir, but the stages of all decks share one worker pool, each TTS and LLM
+account has one set of rate limits for the whole batch instead of one per deck, and
+the formula speech and audio caches are shared. A per-deck summary is logged at the
+end and written to batch_summary.json in output_dir.
+"""
+import os
+import sys
+import copy
+import glob
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+# Add the parent directory to the path so we can import from src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import load_config, run_pipeline
+from src.speech_cache import configure_formula_cache
+from src.audio_cache import configure_audio_cache
+from src.tts_pool import share_tts_limits
+from src.rate_limit import share_rate_limiters
+from src.run_report import log_run_report
+from src.atomic_write import atomic_output
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARALLEL_DECKS = 4
+# Each deck has at most a few stages runnable at once (images, narration/audio, video)
+DEFAULT_WORKERS_PER_DECK = 2
+SUMMARY_FILENAME = 'batch_summary.json'
+
+
+def is_deck(path: str) -> bool:
+    """A .tex file with a \\documentclass, as opposed to a file \\input by a deck."""
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return '\\documentclass' in f.read()
+    except OSError:
+        return False
+
+
+def find_decks(targets: Sequence[str]) -> List[str]:
+    """Decks named by directories (searched recursively), glob patterns or .tex paths, in order."""
+    decks: List[str] = []
+    for target in targets:
+        if os.path.isdir(target):
+            candidates = sorted(glob.glob(os.path.join(target, '**', '*.tex'), recursive=True))
+        else:
+            candidates = sorted(glob.glob(target, recursive=True))
+        for path in candidates:
+            path = os.path.abspath(path)
+            if path not in decks and is_deck(path):
+                decks.append(path)
+    return decks
+
+
+def deck_names(decks: Sequence[str]) -> List[str]:
+    """Output directory names: the file name, or the path below the common directory where names clash."""
+    stems = [os.path.splitext(os.path.basename(deck))[0] for deck in decks]
+    if len(set(stems)) == len(stems):
+        return stems
+    root = os.path.commonpath([os.path.dirname(deck) for deck in decks])
+    return [os.path.splitext(os.path.relpath(deck, root))[0].replace(os.sep, '-') for deck in decks]
+
+
+def deck_config(config: Dict, output_dir: str) -> Dict:
+    deck = copy.deepcopy(config)
+    deck['output_dir'] = output_dir
+    return deck
+
+
+def run_batch(decks: Sequence[str], config: Dict, parallel_decks: int = DEFAULT_PARALLEL_DECKS,
+              workers: int = 0, **pipeline_options) -> List[Dict]:
+    """
+    Run the pipeline of every deck, up to `parallel_decks` at a time, with all their
+    stages on one pool of `workers` threads (default: two per parallel deck). Returns
+    run_pipeline's summary for each deck, in order, with its 'name' added.
+    pipeline_options are passed on to run_pipeline (stream_segments, incremental, resume).
+    """
+    if not decks:
+        return []
+    output_root = config.get('output_dir', 'output')
+    names = deck_names(decks)
+    workers = workers or parallel_decks * DEFAULT_WORKERS_PER_DECK
+    configure_formula_cache(config)
+    configure_audio_cache(config)
+    share_tts_limits(True)
+    share_rate_limiters(True)
+    logger.info(f"[BATCH] {len(decks)} decks, {parallel_decks} at a time, {workers} stage workers")
+
+    def run_deck(index: int) -> Dict:
+        name = names[index]
+        logger.info(f"[BATCH] Starting deck {index + 1}/{len(decks)}: {name}")
+        started = time.monotonic()
+        try:
+            result = run_pipeline(decks[index], deck_config(config, os.path.join(output_root, name)),
+                                  executor=stage_pool, **pipeline_options)
+        except Exception as e:
+            logger.error(f"[BATCH] Deck {name} failed: {e}", exc_info=True)
+            result = {'latex_file': decks[index], 'video': "", 'error': str(e),
+                      'seconds': time.monotonic() - started, 'reports': {}}
+        result['name'] = name
+        status = 'done' if result['video'] else f"FAILED ({result['error']})"
+        logger.info(f"[BATCH] Deck {name} {status} in {result['seconds']:.1f}s")
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as stage_pool, \
+                ThreadPoolExecutor(max_workers=parallel_decks) as deck_pool:
+            return list(deck_pool.map(run_deck, range(len(decks))))
+    finally:
+        share_tts_limits(False)
+        share_rate_limiters(False)
+
+
+def summary_lines(results: Sequence[Dict], wall_seconds: float) -> List[str]:
+    lines = []
+    for result in results:
+        status = 'ok' if result['video'] else 'FAILED'
+        detail = result['video'] or result['error']
+        lines.append(f"{result['name']}: {status} in {result['seconds']:.1f}s - {detail}")
+        for report in result.get('reports', {}).values():
+            lines.append(f"    {report}")
+    failed = sum(1 for result in results if not result['video'])
+    deck_seconds = sum(result['seconds'] for result in results)
+    lines.append(f"{len(results) - failed}/{len(results)} decks done, {failed} failed; "
+                 f"{wall_seconds:.1f}s wall for {deck_seconds:.1f}s of deck time")
+    return lines
+
+
+def write_summary(results: Sequence[Dict], path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with atomic_output(path) as temp_path:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(results), f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the videos of many LaTeX Beamer decks in one run.")
+    parser.add_argument("targets", nargs='+', help="Directories, glob patterns or .tex files of the decks.")
+    parser.add_argument("-c", "--config", default="config/config.yaml",
+                        help="Path to the configuration YAML file (default: config/config.yaml relative to project root).")
+    parser.add_argument("--parallel-decks", type=int, default=None,
+                        help=f"Decks in progress at once (default: batch.parallel_decks, else {DEFAULT_PARALLEL_DECKS}).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Threads running the stages of all decks (default: batch.workers, else two per parallel deck).")
+    parser.add_argument("--stream-segments", action="store_true", help="As in src/main.py, for every deck.")
+    parser.add_argument("--incremental", action="store_true", help="As in src/main.py, for every deck.")
+    parser.add_argument("--resume", action="store_true", help="As in src/main.py, for every deck.")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config_path = args.config if os.path.isabs(args.config) else os.path.join(project_root, args.config)
+    config = load_config(config_path)
+    if not config:
+        logger.error(f"[BATCH] Could not load configuration from {config_path}")
+        return 1
+    decks = find_decks(args.targets)
+    if not decks:
+        logger.error(f"[BATCH] No LaTeX decks found in {args.targets}")
+        return 1
+
+    batch_config = config.get('batch', {}) or {}
+    started = time.monotonic()
+    results = run_batch(decks, config,
+                        parallel_decks=args.parallel_decks or batch_config.get('parallel_decks', DEFAULT_PARALLEL_DECKS),
+                        workers=args.workers or batch_config.get('workers', 0),
+                        stream_segments=args.stream_segments, incremental=args.incremental, resume=args.resume)
+    logger.info("--- Batch Summary ---")
+    for line in summary_lines(results, time.monotonic() - started):
+        logger.info(line)
+    log_run_report()
+    summary_path = os.path.join(config['output_dir'], SUMMARY_FILENAME)
+    write_summary(results, summary_path)
+    logger.info(f"[BATCH] Summary written to {summary_path}")
+    return 0 if all(result['video'] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
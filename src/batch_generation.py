@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import argparse
+from typing import Callable, Dict, List, Optional
+
+# Add the parent directory to the path so we can import from src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatgpt_script_generator import generate_chatgpt_prompts, save_prompts_to_files
+from src.automated_video_generation import load_config, initialize_openai_client, build_chat_request, finalize_script
+from src.llm_cache import configure_llm_cache, lookup_cached_completion, store_completion
+from src.run_report import log_run_report
+from src.api_usage import record_usage
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+STATE_FILENAME = "batch_job.json"
+DEFAULT_POLL_INTERVAL = 60
+
+
+class OpenAIBatchBackend:
+    """Batch endpoints of the OpenAI API."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def upload_file(self, path: str) -> str:
+        with open(path, 'rb') as f:
+            return self.client.files.create(file=f, purpose="batch").id
+
+    def create_batch(self, input_file_id: str) -> str:
+        batch = self.client.batches.create(input_file_id=input_file_id, endpoint=CHAT_COMPLETIONS_URL,
+                                           completion_window=COMPLETION_WINDOW)
+        return batch.id
+
+    def retrieve_batch(self, batch_id: str) -> Dict:
+        batch = self.client.batches.retrieve(batch_id)
+        return {"status": batch.status, "output_file_id": batch.output_file_id,
+                "error_file_id": batch.error_file_id}
+
+    def download_file(self, file_id: str) -> str:
+        return self.client.files.content(file_id).text
+
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the batch endpoints, for tests and offline builds.
+    A batch is answered by `responder(request_body) -> text` the first time it is
+    polled after `polls_until_complete` polls.
+    """
+
+    def __init__(self, directory: str, responder: Callable[[Dict], str], polls_until_complete: int = 1):
+        self.directory = directory
+        self.responder = responder
+        self.polls_until_complete = polls_until_complete
+        os.makedirs(os.path.join(directory, 'files'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'batches'), exist_ok=True)
+
+    def _file_path(self, file_id: str) -> str:
+        return os.path.join(self.directory, 'files', file_id + '.jsonl')
+
+    def _batch_path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, 'batches', batch_id + '.json')
+
+    def upload_file(self, path: str) -> str:
+        file_id = f"file-{uuid.uuid4().hex}"
+        shutil.copyfile(path, self._file_path(file_id))
+        return file_id
+
+    def create_batch(self, input_file_id: str) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch = {"status": "in_progress", "input_file_id": input_file_id, "polls": 0,
+                 "output_file_id": None, "error_file_id": None}
+        with open(self._batch_path(batch_id), 'w', encoding='utf-8') as f:
+            json.dump(batch, f)
+        return batch_id
+
+    def retrieve_batch(self, batch_id: str) -> Dict:
+        with open(self._batch_path(batch_id), encoding='utf-8') as f:
+            batch = json.load(f)
+        if batch["status"] == "in_progress":
+            batch["polls"] += 1
+            if batch["polls"] >= self.polls_until_complete:
+                batch["output_file_id"] = self._answer(batch["input_file_id"])
+                batch["status"] = "completed"
+            with open(self._batch_path(batch_id), 'w', encoding='utf-8') as f:
+                json.dump(batch, f)
+        return batch
+
+    def _answer(self, input_file_id: str) -> str:
+        output_file_id = f"file-{uuid.uuid4().hex}"
+        with open(self._file_path(input_file_id), encoding='utf-8') as requests_file, \
+                open(self._file_path(output_file_id), 'w', encoding='utf-8') as output_file:
+            for line in requests_file:
+                request = json.loads(line)
+                completion = {"object": "chat.completion", "model": request["body"]["model"],
+                              "choices": [{"index": 0, "finish_reason": "stop",
+                                           "message": {"role": "assistant",
+                                                       "content": self.responder(request["body"])}}]}
+                result = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                          "response": {"status_code": 200, "body": completion}, "error": None}
+                output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        return output_file_id
+
+    def download_file(self, file_id: str) -> str:
+        with open(self._file_path(file_id), encoding='utf-8') as f:
+            return f.read()
+
+
+def custom_id_for(slide_number: int) -> str:
+    return f"slide-{slide_number}"
+
+
+def write_batch_file(prompts: List[Dict], config: Dict, path: str) -> str:
+    """Write one chat-completion request per slide prompt as batch JSONL. Returns the file's sha256."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = []
+    for prompt_data in prompts:
+        request = {"custom_id": custom_id_for(prompt_data["slide_number"]), "method": "POST",
+                   "url": CHAT_COMPLETIONS_URL, "body": build_chat_request(prompt_data, config)}
+        lines.append(json.dumps(request, ensure_ascii=False))
+    content = "\n".join(lines) + "\n"
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def load_batch_state(batch_dir: str) -> Optional[Dict]:
+    state_path = os.path.join(batch_dir, STATE_FILENAME)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_batch_state(batch_dir: str, state: Dict):
+    """Write the job state atomically so an interrupted run can always resume from it."""
+    state_path = os.path.join(batch_dir, STATE_FILENAME)
+    temp_path = state_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, state_path)
+
+
+def save_response(responses_dir: str, slide_number: int, text: str) -> str:
+    response_file = os.path.join(responses_dir, f"slide_{slide_number}_response.txt")
+    with open(response_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return response_file
+
+
+def import_batch_results(output: str, prompts: List[Dict], config: Dict, responses_dir: str) -> List[int]:
+    """Save every successful result of a batch to chatgpt_responses/. Returns the imported slide numbers."""
+    prompts_by_id = {custom_id_for(p["slide_number"]): p for p in prompts}
+    imported = []
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        prompt_data = prompts_by_id.get(result.get("custom_id"))
+        response = result.get("response") or {}
+        if prompt_data is None:
+            logging.warning(f"Ignoring batch result for unknown request {result.get('custom_id')}")
+            continue
+        if result.get("error") or response.get("status_code") != 200:
+            logging.error(f"Batch request for slide {prompt_data['slide_number']} failed: {result.get('error') or response}")
+            continue
+        content = response["body"]["choices"][0]["message"]["content"]
+        record_usage(response["body"].get("usage"))
+        store_completion(build_chat_request(prompt_data, config), content)
+        save_response(responses_dir, prompt_data["slide_number"], finalize_script(content, prompt_data))
+        imported.append(prompt_data["slide_number"])
+    logging.info(f"Imported {len(imported)} batch results into {responses_dir}")
+    return imported
+
+
+def run_batch(prompts: List[Dict], backend, config: Dict, batch_dir: str, responses_dir: str,
+              poll_interval: float = DEFAULT_POLL_INTERVAL, timeout: Optional[float] = None) -> Optional[List[int]]:
+    """
+    Submit every slide prompt as one batch job, wait for it and import the results.
+    The job ID is kept in batch_dir, so running again after an interruption resumes
+    the same job instead of paying for a new one. Slides whose request is already in
+    the LLM response cache are written directly and left out of the batch.
+    Returns the slide numbers with a response, or None if the job has not finished within `timeout`.
+    """
+    os.makedirs(batch_dir, exist_ok=True)
+    os.makedirs(responses_dir, exist_ok=True)
+
+    answered = []
+    pending = []
+    for prompt_data in prompts:
+        cached = lookup_cached_completion(build_chat_request(prompt_data, config), config)
+        if cached is not None:
+            save_response(responses_dir, prompt_data["slide_number"], finalize_script(cached, prompt_data))
+            answered.append(prompt_data["slide_number"])
+        else:
+            pending.append(prompt_data)
+    if answered:
+        logging.info(f"{len(answered)} slides answered from the LLM response cache")
+    if not pending:
+        return answered
+
+    batch_file = os.path.join(batch_dir, "batch_requests.jsonl")
+    content_hash = write_batch_file(pending, config, batch_file)
+    state = load_batch_state(batch_dir)
+    if state and state.get("content_hash") == content_hash and state.get("status") not in ("failed", "expired", "cancelled"):
+        logging.info(f"Resuming batch job {state['batch_id']} (status: {state['status']})")
+    else:
+        if state:
+            logging.info(f"Previous batch job {state.get('batch_id')} does not match the current prompts; submitting a new one")
+        input_file_id = backend.upload_file(batch_file)
+        batch_id = backend.create_batch(input_file_id)
+        state = {"batch_id": batch_id, "input_file_id": input_file_id, "content_hash": content_hash,
+                 "slide_numbers": [p["slide_number"] for p in pending], "status": "submitted",
+                 "submitted_at": time.time()}
+        save_batch_state(batch_dir, state)
+        logging.info(f"Submitted batch job {batch_id} with {len(pending)} slide prompts")
+
+    if state["status"] != "imported":
+        started = time.monotonic()
+        while True:
+            batch = backend.retrieve_batch(state["batch_id"])
+            if batch["status"] != state["status"]:
+                state["status"] = batch["status"]
+                save_batch_state(batch_dir, state)
+                logging.info(f"Batch job {state['batch_id']} is {batch['status']}")
+            if batch["status"] in TERMINAL_STATUSES:
+                break
+            if timeout is not None and time.monotonic() - started >= timeout:
+                logging.info(f"Batch job {state['batch_id']} still running; run again later to resume it")
+                return None
+            time.sleep(poll_interval)
+
+        # Expired batches still deliver the requests that finished in time
+        if batch.get("output_file_id"):
+            state["imported"] = import_batch_results(backend.download_file(batch["output_file_id"]),
+                                                     pending, config, responses_dir)
+        else:
+            state["imported"] = []
+        if batch.get("error_file_id"):
+            logging.error(f"Batch job {state['batch_id']} reported errors in file {batch['error_file_id']}")
+        if batch["status"] == "completed":
+            state["status"] = "imported"
+        save_batch_state(batch_dir, state)
+
+    return answered + state.get("imported", [])
+
+
+def main():
+    """Write all slide prompts of a presentation as one OpenAI batch job and import the answers."""
+    parser = argparse.ArgumentParser(description="Generate narration scripts for a whole deck with the OpenAI Batch API.")
+    parser.add_argument("latex_file", help="Path to the input LaTeX (.tex) file.")
+    parser.add_argument("-c", "--config", default="config/config.yaml", help="Path to the configuration YAML file.")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, help="Seconds between job status checks.")
+    parser.add_argument("--no-wait", action="store_true", help="Submit (or check) the job and exit; run again later to import it.")
+
+    args = parser.parse_args()
+    latex_path = os.path.abspath(args.latex_file)
+    config_path = os.path.abspath(args.config)
+
+    if not os.path.exists(latex_path):
+        print(f"Error: LaTeX input file not found at {latex_path}")
+        return
+    elif not os.path.exists(config_path):
+        print(f"Error: Config file not found at {config_path}")
+        return
+
+    config = load_config(config_path)
+    if not config:
+        logging.error("Failed to load configuration. Exiting.")
+        return
+    configure_llm_cache(config)
+
+    client = initialize_openai_client(config)
+    if not client:
+        logging.error("Failed to initialize OpenAI client. Exiting.")
+        return
+
+    output_dir = config['output_dir']
+    prompts = generate_chatgpt_prompts(latex_path)
+    if not prompts:
+        logging.error("Failed to generate prompts. Exiting.")
+        return
+    save_prompts_to_files(prompts, os.path.join(output_dir, 'chatgpt_prompts'))
+
+    responses_dir = os.path.join(output_dir, 'chatgpt_responses')
+    answered = run_batch(prompts, OpenAIBatchBackend(client), config, os.path.join(output_dir, 'batch'),
+                         responses_dir, poll_interval=args.poll_interval, timeout=0 if args.no_wait else None)
+    log_run_report()
+    if answered is None:
+        print("\nBatch job submitted. Run the same command again later to import the results.")
+    elif len(answered) == len(prompts):
+        print(f"\nSuccess! {len(answered)} responses saved to {responses_dir}")
+        print(f"python -m src.use_chatgpt_scripts {latex_path}")
+    else:
+        print(f"\nWarning: only {len(answered)} of {len(prompts)} responses were generated. Check the log for details.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+# Bump when the meaning of the recorded keys changes; older manifests are then ignored
+MANIFEST_VERSION = 1
+FILE_HASH_CHUNK = 1024 * 1024
+
+# tts settings that change how requests are scheduled but not the audio they produce
+TTS_SCHEDULING_KEYS = ('concurrency', 'requests_per_minute', 'delay_between_calls', 'max_retries', 'retry_backoff')
+# Files a deck can read besides its .tex, when pdflatex left no -recorder list of them
+LATEX_INPUT_EXTENSIONS = ('.tex', '.sty', '.cls', '.bib', '.bst', '.def', '.cfg',
+                          '.png', '.jpg', '.jpeg', '.pdf', '.eps', '.svg')
+
+
+def file_digest(path: str) -> str:
+    """sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(FILE_HASH_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_path(config: Dict) -> str:
+    return os.path.join(config.get('output_dir', 'output'), MANIFEST_FILENAME)
+
+
+def tts_params(config: Dict) -> Dict:
+    """
+    The configuration that decides what a slide's audio sounds like, without secrets
+    or service addresses (a mock server answers like the real one).
+    """
+    tts_config = {key: value for key, value in (config.get('tts', {}) or {}).items()
+                  if key not in TTS_SCHEDULING_KEYS and not key.endswith('base_url')}
+    provider = tts_config.get('provider', 'gtts')
+    section = 'local_tts' if provider == 'local' else provider
+    provider_config = {key: value for key, value in (config.get(section, {}) or {}).items()
+                       if 'key' not in key and not key.endswith('base_url')}
+    return {'tts': tts_config, section: provider_config}
+
+
+def recorded_latex_inputs(fls_path: str, deck_dir: str) -> Optional[List[str]]:
+    """
+    Files under deck_dir that pdflatex read, from the .fls file written by its
+    -recorder option, relative to deck_dir. Files it also wrote (.aux, .nav, .toc)
+    and those of the TeX distribution are left out. None if there is no recording.
+    """
+    try:
+        with open(fls_path, encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    deck_dir = os.path.abspath(deck_dir)
+    cwd = deck_dir
+    read, written = [], set()
+    for line in lines:
+        kind, _, path = line.partition(' ')
+        if kind == 'PWD':
+            cwd = path
+        elif kind in ('INPUT', 'OUTPUT'):
+            path = os.path.normpath(os.path.join(cwd, path))
+            if kind == 'INPUT':
+                read.append(path)
+            else:
+                written.add(path)
+    relative = {os.path.relpath(path, deck_dir) for path in read if path not in written}
+    return sorted(path for path in relative if not path.startswith(os.pardir))
+
+
+def scanned_latex_inputs(deck_dir: str, exclude_dirs: Sequence[str] = ()) -> List[str]:
+    """
+    Every file under deck_dir a deck could \\input, \\include or \\includegraphics, relative
+    to deck_dir, for decks pdflatex has not recorded. Hidden directories and
+    exclude_dirs (the output directory) are skipped.
+    """
+    deck_dir = os.path.abspath(deck_dir)
+    excluded = {os.path.abspath(path) for path in exclude_dirs}
+    found = []
+    for root, dirs, files in os.walk(deck_dir):
+        dirs[:] = [name for name in dirs
+                   if not name.startswith('.') and os.path.join(root, name) not in excluded]
+        for name in files:
+            if name.lower().endswith(LATEX_INPUT_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), deck_dir))
+    return sorted(found)
+
+
+def latex_inputs(latex_file: str, exclude_dirs: Sequence[str] = ()) -> List[str]:
+    """
+    The files a deck's slide images depend on, relative to its directory: those
+    pdflatex recorded in the last compile, else every likely input under the directory.
+    The PDF compiled from the deck is not one of them.
+    """
+    latex_file = os.path.abspath(latex_file)
+    deck_dir = os.path.dirname(latex_file)
+    base = os.path.splitext(latex_file)[0]
+    inputs = recorded_latex_inputs(f"{base}.fls", deck_dir)
+    if inputs is None:
+        inputs = scanned_latex_inputs(deck_dir, exclude_dirs)
+    compiled_pdf = os.path.relpath(f"{base}.pdf", deck_dir)
+    return sorted((set(inputs) | {os.path.basename(latex_file)}) - {compiled_pdf})
+
+
+def latex_inputs_digest(deck_dir: str, inputs: Sequence[str]) -> Dict[str, Optional[str]]:
+    """Content digest of each input, None for one that no longer exists."""
+    digests = {}
+    for path in inputs:
+        full_path = os.path.join(deck_dir, path)
+        digests[path] = file_digest(full_path) if os.path.isfile(full_path) else None
+    return digests
+
+
+def image_params(config: Dict) -> Dict:
+    """The configuration that decides how slides are rasterized."""
+    video_config = config.get('video', {}) or {}
+    return {'latex': config.get('latex', {}) or {},
+            'video': {key: video_config.get(key) for key in ('resolution', 'placeholder_bg_color', 'placeholder_text_color')}}
+
+
+class BuildManifest:
+    """
+    Record of what produced each artifact in the output directory: for every node (a
+    stage, or one slide of a stage) the hash of its inputs and parameters and the
+    hashes of the files it wrote. A node is fresh when its inputs hash is unchanged and
+    its files are still the ones it wrote; only stale nodes need to run again.
+
+    The manifest is rewritten atomically after every record, so it always describes
+    the files on disk, even after an interrupted run.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.base_dir = os.path.dirname(self.path)
+        self.nodes: Dict[str, Dict] = {}
+        self.reused: List[str] = []
+        self.rebuilt: List[str] = []
+        self._lock = threading.Lock()
+        # Serializes whole saves, so an older snapshot never replaces a newer one
+        self._save_lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def for_config(cls, config: Dict) -> 'BuildManifest':
+        return cls(manifest_path(config))
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable build manifest {self.path}: {e}")
+            return
+        if data.get('version') != MANIFEST_VERSION:
+            logger.info(f"Build manifest {self.path} has another version, starting a new one")
+            return
+        self.nodes = data.get('nodes', {})
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                payload = json.dumps({'version': MANIFEST_VERSION, 'nodes': self.nodes},
+                                     ensure_ascii=False, indent=1, sort_keys=True)
+            os.makedirs(self.base_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.base_dir, prefix='.manifest-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(temp_path, self.path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+    def _relative(self, path: str) -> str:
+        path = os.path.abspath(path)
+        relative = os.path.relpath(path, self.base_dir)
+        # Files outside the output directory keep their absolute path
+        return path if relative.startswith(os.pardir) else relative
+
+    def _absolute(self, path: str) -> str:
+        return os.path.normpath(os.path.join(self.base_dir, path))
+
+    def _file_entry(self, path: str) -> Dict:
+        stat = os.stat(path)
+        return {'path': self._relative(path), 'sha256': file_digest(path),
+                'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _unchanged(self, entry: Dict) -> bool:
+        path = self._absolute(entry['path'])
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        # Touched but possibly identical, e.g. copied back from a backup
+        return file_digest(path) == entry['sha256']
+
+    def is_fresh(self, node: str, inputs: str) -> bool:
+        """True if `node` last ran with these inputs and its files are still on disk, unchanged."""
+        with self._lock:
+            entry = self.nodes.get(node)
+        return (entry is not None and entry['inputs'] == inputs
+                and all(self._unchanged(output) for output in entry['outputs']))
+
+    def outputs(self, node: str) -> List[str]:
+        """Absolute paths of the files `node` wrote, in the order they were recorded."""
+        with self._lock:
+            entry = self.nodes.get(node, {})
+        return [self._absolute(output['path']) for output in entry.get('outputs', [])]
+
+    def params(self, node: str) -> Dict:
+        """The params recorded with `node`, empty if there are none."""
+        with self._lock:
+            return dict(self.nodes.get(node, {}).get('params', {}))
+
+    def output_digests(self, node: str) -> List[str]:
+        with self._lock:
+            entry = self.nodes.get(node, {})
+        return [output['sha256'] for output in entry.get('outputs', [])]
+
+    def reuse(self, node: str):
+        """Note that a fresh node was skipped, for the report."""
+        with self._lock:
+            self.reused.append(node)
+
+    def record(self, node: str, inputs: str, outputs: Sequence[str], params: Optional[Dict] = None):
+        """Store what `node` produced from `inputs` and save the manifest."""
+        entry = {'inputs': inputs, 'outputs': [self._file_entry(path) for path in outputs],
+                 'updated': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        if params:
+            entry['params'] = params
+        with self._lock:
+            self.nodes[node] = entry
+            self.rebuilt.append(node)
+        self.save()
+
+    def slide_artifacts(self) -> Optional[Dict[str, List[str]]]:
+        """
+        Images and audio files of the last recorded run, in slide order, or None if the
+        manifest does not describe a complete deck.
+        """
+        slide_count = self.params('images').get('slides')
+        if not slide_count:
+            return None
+        images = self.outputs('images')[:slide_count]
+        audio = []
+        for index in range(slide_count):
+            paths = self.outputs(f'audio/{index}')
+            if not paths:
+                return None
+            audio.append(paths[0])
+        return {'images': images, 'audio': audio}
+
+    def report(self) -> str:
+        with self._lock:
+            reused, rebuilt = len(self.reused), len(self.rebuilt)
+        return f"Build manifest: {reused} nodes reused, {rebuilt} rebuilt ({self.path})"
@@ -1,16 +1,45 @@
 import os
 import sys
 import logging
-from typing import List, Dict
+from functools import cached_property
+from typing import List, Dict, Optional
 import re
 
 # Add the parent directory to the path so we can import from src
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.latex_parser import parse_latex_file, Slide
+from src.math_speech import latex_to_speech_pt
+from src.text_normalizer import normalize_chatgpt_response
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Delimited math spans: $$...$$, \[...\], \(...\) and $...$. Inline spans end at a
+# newline, and a $ after a letter is a currency sign ("R$ 20"), not a delimiter.
+MATH_SPAN_PATTERN = re.compile(
+    r'\$\$(.+?)\$\$|\\\[(.+?)\\\]|\\\(([^\n]+?)\\\)'
+    r'|(?<![A-Za-z\\])\$(?!\s)([^\n$]+?)(?<!\s)\$',
+    re.DOTALL)
+
+# Instructions shared by every slide. Sent once at the start of each request, ahead of
+# anything slide-specific, so that all requests of a deck begin with the same text and
+# the API can reuse its cached prefix.
+NARRATION_GUIDELINES = (
+    "Para cada slide, crie um script de narração que explique o conteúdo de forma clara e concisa. "
+    "Dê atenção especial às fórmulas matemáticas, explicando-as de maneira simples e compreensível. "
+    "IMPORTANTE: Não inclua na narração fórmulas ou conceitos matemáticos que não estejam presentes no slide. "
+    "Limite-se apenas ao conteúdo que está explicitamente mostrado no slide. "
+    "Siga as instruções específicas que acompanham cada slide. "
+    "O script deve ser adequado para narração em um vídeo educacional."
+)
+
+def math_spans_to_speech(text: str) -> str:
+    """Replace every delimited math span in the text by its spoken Portuguese form."""
+    def span_to_speech(match):
+        formula = next(group for group in match.groups() if group is not None)
+        return f" {latex_to_speech_pt(formula)} "
+    return MATH_SPAN_PATTERN.sub(span_to_speech, text)
+
 def clean_chatgpt_response(response: str) -> str:
     """
     Clean up ChatGPT response to ensure it doesn't contain any markup or unwanted text.
@@ -54,179 +83,57 @@ def clean_chatgpt_response(response: str) -> str:
     if specific_case:
         return specific_case
 
-    # Remove any markdown headers (# Header)
-    response = re.sub(r'^#+ .*$', '', response, flags=re.MULTILINE)
-
-    # Remove markdown formatting for bold and italic
-    response = re.sub(r'\*\*(.*?)\*\*', r'\1', response)  # Bold
-    response = re.sub(r'\*(.*?)\*', r'\1', response)      # Italic
-    response = re.sub(r'__(.*?)__', r'\1', response)      # Bold
-    response = re.sub(r'_(.*?)_', r'\1', response)        # Italic
-
-    # Remove markdown code blocks
-    response = re.sub(r'```.*?```', '', response, flags=re.DOTALL)
-    response = re.sub(r'`(.*?)`', r'\1', response)
-
-    # Remove markdown lists
-    response = re.sub(r'^\s*[-*+]\s+', '', response, flags=re.MULTILINE)
-    response = re.sub(r'^\s*\d+\.\s+', '', response, flags=re.MULTILINE)
-
-    # --- LaTeX to Portuguese speech ---
-
-    # 1. Frações: \frac{a}{b} -> "a dividido por b"
-    def frac_to_speech(match):
-        numerador = match.group(1).strip()
-        denominador = match.group(2).strip()
-        return f"{numerador} dividido por {denominador}"
-    response = re.sub(r'\\frac\s*\{([^\{\}]*)\}\s*\{([^\{\}]*)\}', frac_to_speech, response)
-
-    # 2. Letras gregas para português
-    greek_map = {
-        "alpha": "alfa", "beta": "beta", "gamma": "gama", "delta": "delta", "epsilon": "épsilon",
-        "zeta": "zeta", "eta": "eta", "theta": "teta", "iota": "iota", "kappa": "kapa",
-        "lambda": "lambda", "mu": "mi", "nu": "ni", "xi": "xi", "omicron": "ômicron",
-        "pi": "pi", "rho": "rô", "sigma": "sigma", "tau": "tau", "upsilon": "ípsilon",
-        "phi": "fi", "chi": "chi", "psi": "psi", "omega": "ômega"
-    }
-    for latex, pt in greek_map.items():
-        # minúsculas
-        response = re.sub(rf'\\{latex}\b', pt, response)
-        # maiúsculas (ex: \Alpha)
-        response = re.sub(rf'\\{latex.capitalize()}\b', f"{pt.capitalize()} maiúsculo", response)
-
-    # 3. Substituir comandos matemáticos comuns por fala
-    response = re.sub(r'\\cdot', ' vezes ', response)
-    response = re.sub(r'\\times', ' vezes ', response)
-    response = re.sub(r'\\pm', ' mais ou menos ', response)
-    response = re.sub(r'\\mp', ' menos ou mais ', response)
-    response = re.sub(r'\\leq', ' menor ou igual a ', response)
-    response = re.sub(r'\\geq', ' maior ou igual a ', response)
-    response = re.sub(r'\\neq', ' diferente de ', response)
-    response = re.sub(r'\\approx', ' aproximadamente igual a ', response)
-    response = re.sub(r'\\infty', ' infinito ', response)
-    # Raiz quadrada
-    response = re.sub(r'\\sqrt\{([^\{\}]*)\}', r'raiz quadrada de \1', response)
-    # Raiz cúbica
-    response = re.sub(r'\\sqrt\[3\]\{([^\{\}]*)\}', r'raiz cúbica de \1', response)
-    # Somatório
-    response = re.sub(r'\\sum\b', ' somatório ', response)
-    # Produtório
-    response = re.sub(r'\\prod\b', ' produtório ', response)
-    # União
-    response = re.sub(r'\\cup\b', ' união ', response)
-    # Interseção
-    response = re.sub(r'\\cap\b', ' interseção ', response)
-    # Operadores diferenciais
-    response = re.sub(r'\\partial\b', ' derivada parcial ', response)
-    # Rotacional, divergente, gradiente (expressões comuns)
-    response = re.sub(r'\\nabla\s*\\times', ' rotacional ', response)
-    response = re.sub(r'\\nabla\s*\\cdot', ' divergente ', response)
-    response = re.sub(r'\\nabla', ' gradiente ', response)
-    response = re.sub(r'\\int\b', ' integral ', response)
-    response = re.sub(r'\\oint\b', ' integral de linha ', response)
-    # Matrizes
-    response = re.sub(r'\\begin\{bmatrix\}', 'início da matriz', response)
-    response = re.sub(r'\\end\{bmatrix\}', 'fim da matriz', response)
-    response = re.sub(r'\\begin\{pmatrix\}', 'início da matriz', response)
-    response = re.sub(r'\\end\{pmatrix\}', 'fim da matriz', response)
-    response = re.sub(r'\\begin\{matrix\}', 'início da matriz', response)
-    response = re.sub(r'\\end\{matrix\}', 'fim da matriz', response)
-    response = re.sub(r'\\\\', ';', response)  # Fim de linha da matriz
-    response = re.sub(r'&', ' e ', response)   # Separador de coluna
-
-    # 4. Subscritos e sobrescritos
-    # Padrões físicos comuns
-    response = re.sub(r'E_k', 'E_k', response)
-    response = re.sub(r'k_e', 'k_e', response)
-    response = re.sub(r'm_1', 'm_1', response)
-    response = re.sub(r'm_2', 'm_2', response)
-    response = re.sub(r'q_1', 'q_1', response)
-    response = re.sub(r'q_2', 'q_2', response)
-
-    # Outros subscritos
-    response = re.sub(r'([A-Za-z])_\{([^\{\}]*)\}', r'\1 subscrito \2', response)
-    response = re.sub(r'([A-Za-z])_([A-Za-z0-9])', r'\1 subscrito \2', response)
-
-    # Superscritos
-    response = re.sub(r'([A-Za-z0-9])\^\{([^\{\}]*)\}', r'\1 sobrescrito \2', response)
-    response = re.sub(r'([A-Za-z0-9])\^([A-Za-z0-9])', r'\1 sobrescrito \2', response)
-
-    # 5. Remover delimitadores de matemática LaTeX
-    response = re.sub(r'\\\((.*?)\\\)', r'\1', response, flags=re.DOTALL)
-    response = re.sub(r'\$(.*?)\$', r'\1', response, flags=re.DOTALL)
-    response = re.sub(r'\\\[(.*?)\\\]', r'\1', response, flags=re.DOTALL)
-    response = re.sub(r'\$\$(.*?)\$\$', r'\1', response, flags=re.DOTALL)
-
-    # 6. Corrigir múltiplos espaços
-    response = re.sub(r'\s+', ' ', response)
-    response = response.replace(' ;', ';').replace(' ,', ',').replace(' .', '.').strip()
-
-    # 7. Corrigir símbolos físicos comuns
-    response = re.sub(r'k subscrito e', 'k_e', response)
-    response = re.sub(r'm subscrito 1', 'm_1', response)
-    response = re.sub(r'm subscrito 2', 'm_2', response)
-    response = re.sub(r'q subscrito 1', 'q_1', response)
-    response = re.sub(r'q subscrito 2', 'q_2', response)
-    response = re.sub(r'E subscrito k', 'E_k', response)
-    response = re.sub(r'\\hbar', 'hbar', response)
-    response = re.sub(r'hbar', 'hbar', response)  # preserve hbar if present
-
-    # 8. Remover comandos LaTeX restantes
-    response = re.sub(r'\\[a-zA-Z]+', '', response)  # Remove comandos como \sin, \cos, etc.
-    response = re.sub(r'\\[^a-zA-Z]', '', response)  # Remove caracteres especiais LaTeX
-
-    # Remove common ChatGPT phrases
-    phrases_to_remove = [
-        r"^Aqui está um script de narração.*?:",
-        r"^Aqui está uma narração.*?:",
-        r"^Script de narração.*?:",
-        r"^Narração.*?:",
-        r"^Claro.*?:",
-        r"^Certamente.*?:",
-        r"^Vamos criar.*?:",
-        r"^Segue abaixo.*?:",
-        r"^Segue o script.*?:",
-        r"^Segue a narração.*?:",
-        r"^Espero que isso ajude.*$",
-        r"^Espero que esta narração.*$",
-        r"^Espero que este script.*$",
-        r"^Espero ter atendido.*$",
-        r"^Se precisar de alguma alteração.*$",
-        r"^Se precisar de ajustes.*$",
-        # Remove specific markers
-        r"\[Início do Script de Narração\]",
-        r"\[Fim do Script de Narração\]",
-        r"\{Início do Video\]",
-        r"\{Fim do Video\]",
-        r"\[Início da Narração\]",
-        r"\[Fim da Narração\]",
-        r"\[Início\]",
-        r"\[Fim\]",
-        r"\{Início\]",
-        r"\{Fim\]",
-    ]
-
-    for phrase in phrases_to_remove:
-        response = re.sub(phrase, '', response, flags=re.MULTILINE | re.IGNORECASE)
-
-    # Remove any lines that start with common ChatGPT markers
-    response = re.sub(r'^>.*$', '', response, flags=re.MULTILINE)
-
-    # Remove any lines that are just dashes or equals signs (separators)
-    response = re.sub(r'^[=-]+$', '', response, flags=re.MULTILINE)
-
-    # Remove any lines that are just whitespace
-    response = re.sub(r'^\s*$', '', response, flags=re.MULTILINE)
-
-    # Consolidate multiple newlines into a single newline
-    response = re.sub(r'\n{2,}', '\n', response)
+    # Delimited formulas go through the math speech engine, which understands nesting
+    # (e.g. \frac inside \frac); the normalizer below only handles leftovers.
+    response = math_spans_to_speech(response)
 
-    # Trim whitespace
-    response = response.strip()
+    # Markdown, leftover LaTeX and ChatGPT boilerplate are removed by the shared
+    # table-driven normalizer
+    return normalize_chatgpt_response(response)
 
-    return response
-
-def format_slide_for_chatgpt(slide: Slide, all_slides: List[Slide] = None, slide_index: int = None) -> str:
+class DeckContext:
+    """
+    What prompt formatting needs to know about the deck around a slide: its position,
+    its neighbours and whether it continues a slide with the same title. Built once per
+    deck; every lookup is constant time and the outline is computed on first use.
+    """
+    def __init__(self, slides: List[Slide]):
+        self.slides = slides
+        self.total = len(slides)
+
+    def previous(self, index: int) -> Optional[Slide]:
+        return self.slides[index - 1] if index > 0 else None
+
+    def next(self, index: int) -> Optional[Slide]:
+        return self.slides[index + 1] if index < self.total - 1 else None
+
+    def continues_previous(self, index: int) -> bool:
+        """True if the slide has the same title as the one before it (a split frame)."""
+        previous = self.previous(index)
+        return previous is not None and previous.title == self.slides[index].title
+
+    def continued_by_next(self, index: int) -> bool:
+        return index < self.total - 1 and self.continues_previous(index + 1)
+
+    @cached_property
+    def outline(self) -> str:
+        """
+        Outline of the whole presentation, identical for all of its slides. It goes right
+        after the fixed instructions and before the slide-specific part of each prompt.
+        """
+        lines = [f"## Apresentação", f"Esta apresentação tem {self.total} slides, nesta ordem:"]
+        lines += [f"{i}. {slide.title}" for i, slide in enumerate(self.slides, 1)]
+        return "\n".join(lines)
+
+def standalone_prompt(prompt: Dict[str, str]) -> str:
+    """Full text of a prompt for pasting into ChatGPT by hand: deck outline, slide, then the guidelines."""
+    if 'context' not in prompt:
+        # Formatted on its own, already self-contained
+        return prompt['prompt']
+    return "\n\n".join([prompt['context'], prompt['prompt'], NARRATION_GUIDELINES])
+
+def format_slide_for_chatgpt(slide: Slide, all_slides: List[Slide] = None, slide_index: int = None,
+                             include_guidelines: bool = True, deck: DeckContext = None) -> str:
     """
     Format a slide's content for sending to ChatGPT-4o.
     Includes special handling for mathematical formulas and title pages.
@@ -235,36 +142,42 @@ def format_slide_for_chatgpt(slide: Slide, all_slides: List[Slide] = None, slide
         slide: The current slide to format
         all_slides: Optional list of all slides in the presentation
         slide_index: Optional index of the current slide in the all_slides list
+        include_guidelines: Whether to end with the general narration instructions. Leave
+            them out when NARRATION_GUIDELINES is sent separately, ahead of the slide.
+        deck: DeckContext of all_slides, when formatting every slide of a deck in a loop
     """
-    logging.info(f"Formatting slide for ChatGPT: {slide.title} (Frame {slide.frame_number})")
-    logging.info(f"  - All slides provided: {all_slides is not None}")
-    logging.info(f"  - Slide index provided: {slide_index is not None}")
+    logging.debug(f"Formatting slide for ChatGPT: {slide.title} (Frame {slide.frame_number})")
+    
+    if deck is None and all_slides and slide_index is not None:
+        deck = DeckContext(all_slides)
+    if slide_index is None:
+        deck = None
+    prev_slide = deck.previous(slide_index) if deck else None
+    next_slide = deck.next(slide_index) if deck else None
+    is_continuation = deck is not None and deck.continues_previous(slide_index)
     
     # Start with the slide title
     formatted_content = f"# {slide.title}\n\n"
     
     # Add sequence information if available
-    if all_slides and slide_index is not None:
-        total_slides = len(all_slides)
+    if deck:
         formatted_content += f"## Informação de Sequência\n"
-        formatted_content += f"- Este é o slide {slide_index + 1} de {total_slides}.\n"
+        formatted_content += f"- Este é o slide {slide_index + 1} de {deck.total}.\n"
         
         # Add information about previous slide if not the first slide
-        if slide_index > 0:
-            prev_slide = all_slides[slide_index - 1]
+        if prev_slide:
             formatted_content += f"- Slide anterior: \"{prev_slide.title}\"\n"
             
             # Check if this slide has the same title as the previous one
-            if slide.title == prev_slide.title:
+            if is_continuation:
                 formatted_content += f"- Este slide é uma continuação do slide anterior com o mesmo título.\n"
         
         # Add information about next slide if not the last slide
-        if slide_index < total_slides - 1:
-            next_slide = all_slides[slide_index + 1]
+        if next_slide:
             formatted_content += f"- Próximo slide: \"{next_slide.title}\"\n"
             
             # Check if the next slide has the same title as this one
-            if slide.title == next_slide.title:
+            if deck.continued_by_next(slide_index):
                 formatted_content += f"- O próximo slide é uma continuação deste slide com o mesmo título.\n"
         
         formatted_content += "\n"
@@ -273,7 +186,7 @@ def format_slide_for_chatgpt(slide: Slide, all_slides: List[Slide] = None, slide
     content = slide.content
     
     # Check if the content is empty or just the title of the previous slide
-    if not content.strip() or (slide_index is not None and slide_index > 0 and content.strip() == all_slides[slide_index - 1].title):
+    if not content.strip() or (prev_slide and content.strip() == prev_slide.title):
         # Use a placeholder message indicating that content is missing
         logging.warning(f"Slide {slide.frame_number} ({slide.title}) has no content or only contains the title of the previous slide.")
         
@@ -281,17 +194,15 @@ def format_slide_for_chatgpt(slide: Slide, all_slides: List[Slide] = None, slide
         content = f"[ATTENTION: This slide appears to have no content. It may be a transition slide or a slide meant for visual emphasis.]"
         
         # Add information about the slide sequence to help generate a meaningful transition script
-        if all_slides and slide_index is not None:
-            if slide_index > 0:
-                prev_slide = all_slides[slide_index - 1]
+        if deck:
+            if prev_slide:
                 content += f"\n\nPrevious slide title: \"{prev_slide.title}\""
                 if prev_slide.content.strip():
                     # Add a brief summary of the previous slide's content (first 100 chars)
                     prev_content = prev_slide.content.strip()
                     content += f"\nPrevious slide content summary: \"{prev_content[:100]}...\""
             
-            if slide_index < len(all_slides) - 1:
-                next_slide = all_slides[slide_index + 1]
+            if next_slide:
                 content += f"\n\nNext slide title: \"{next_slide.title}\""
                 if next_slide.content.strip():
                     # Add a brief summary of the next slide's content (first 100 chars)
@@ -403,15 +314,14 @@ def format_slide_for_chatgpt(slide: Slide, all_slides: List[Slide] = None, slide
     
     # Add instructions for ChatGPT-4o
     formatted_content += "\n\n---\n\n"
-    formatted_content += "Por favor, crie um script de narração para este slide que explique o conteúdo de forma clara e concisa. "
+    if include_guidelines:
+        formatted_content += "Por favor, crie um script de narração para este slide que explique o conteúdo de forma clara e concisa. "
     
     # Add special instructions for continuation slides
-    if all_slides and slide_index is not None and slide_index > 0:
-        prev_slide = all_slides[slide_index - 1]
-        if slide.title == prev_slide.title:
-            formatted_content += "Este slide é uma continuação do slide anterior com o mesmo título. "
-            formatted_content += "Sua narração deve continuar naturalmente a partir do slide anterior, sem repetir a introdução ou o contexto já apresentado. "
-            formatted_content += "Use frases de transição como 'Continuando...', 'Além disso...', 'Adicionalmente...', etc. "
+    if is_continuation:
+        formatted_content += "Este slide é uma continuação do slide anterior com o mesmo título. "
+        formatted_content += "Sua narração deve continuar naturalmente a partir do slide anterior, sem repetir a introdução ou o contexto já apresentado. "
+        formatted_content += "Use frases de transição como 'Continuando...', 'Além disso...', 'Adicionalmente...', etc. "
     
     # Add special instructions for empty slides
     if "[ATTENTION: This slide appears to have no content" in content:
@@ -420,14 +330,34 @@ def format_slide_for_chatgpt(slide: Slide, all_slides: List[Slide] = None, slide
         formatted_content += "A narração deve ser breve (2-3 frases) e servir como uma ponte entre os conceitos. "
         formatted_content += "Você pode mencionar que estamos passando para o próximo tópico ou que vamos explorar um novo conceito relacionado. "
         formatted_content += "Não invente conteúdo que não existe, apenas crie uma transição suave. "
-    else:
+    elif include_guidelines:
         formatted_content += "Dê atenção especial às fórmulas matemáticas, explicando-as de maneira simples e compreensível. "
         formatted_content += "IMPORTANTE: Não inclua na narração fórmulas ou conceitos matemáticos que não estejam presentes neste slide. "
         formatted_content += "Limite-se apenas ao conteúdo que está explicitamente mostrado no slide. "
+    else:
+        formatted_content += "Explique o conteúdo deste slide."
     
-    formatted_content += "O script deve ser adequado para narração em um vídeo educacional."
+    if include_guidelines:
+        formatted_content += "O script deve ser adequado para narração em um vídeo educacional."
     
-    return formatted_content
+    return formatted_content.rstrip()
+
+def build_slide_prompts(slides: List[Slide], slide_numbers: List[int] = None) -> List[Dict[str, str]]:
+    """
+    Prompt data of every slide of a deck. The deck outline is computed once and shared,
+    and the general guidelines are left out of each slide's prompt so that requests can
+    send them in the fixed system prefix (see standalone_prompt for the pasteable text).
+    """
+    deck = DeckContext(slides)
+    prompts = []
+    for i, slide in enumerate(slides):
+        prompts.append({
+            "slide_number": slide_numbers[i] if slide_numbers else slide.frame_number,
+            "title": slide.title,
+            "context": deck.outline,
+            "prompt": format_slide_for_chatgpt(slide, slides, i, include_guidelines=False, deck=deck),
+        })
+    return prompts
 
 def generate_chatgpt_prompts(latex_file_path: str) -> List[Dict[str, str]]:
     """
@@ -444,15 +374,8 @@ def generate_chatgpt_prompts(latex_file_path: str) -> List[Dict[str, str]]:
         logging.error("Failed to parse slides from LaTeX file.")
         return []
     
-    prompts = []
-    for i, slide in enumerate(slides):
-        # Pass the slide index and all slides to include sequence information
-        formatted_content = format_slide_for_chatgpt(slide, slides, i)
-        prompts.append({
-            "slide_number": slide.frame_number,
-            "title": slide.title,
-            "prompt": formatted_content
-        })
+    # Includes the sequence information of each slide and the deck outline
+    prompts = build_slide_prompts(slides)
     
     logging.info(f"Generated {len(prompts)} prompts for ChatGPT-4o")
     return prompts
@@ -470,10 +393,10 @@ def save_prompts_to_files(prompts: List[Dict[str, str]], output_dir: str) -> Lis
         file_path = os.path.join(output_dir, file_name)
         
         with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(prompt['prompt'])
+            f.write(standalone_prompt(prompt))
         
         file_paths.append(file_path)
-        logging.info(f"Saved prompt for slide {prompt['slide_number']} to {file_path}")
+        logging.debug(f"Saved prompt for slide {prompt['slide_number']} to {file_path}")
     
     return file_paths
 
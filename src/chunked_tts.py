@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import shutil
+import logging
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from src.audio_utils import concatenate_mp3, mp3_duration
+from src.sentence_splitter import split_sentences
+from src.tts_pool import TTSPool
+from src.atomic_write import atomic_output
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# SSML pause emitted by narration_generator around formulas
+BREAK_TAG = re.compile(r'<break[^>]*/?>')
+BREAK_TIME = re.compile(r'time="([0-9.]+)\s*(ms|s)"')
+
+
+def break_seconds(tag: str) -> float:
+    """Length of the pause a <break time="..."/> tag asks for; 0 if it gives none."""
+    match = BREAK_TIME.search(tag)
+    if not match:
+        return 0.0
+    value = float(match.group(1))
+    return value / 1000.0 if match.group(2) == 'ms' else value
+
+
+def plan_tts_chunks(text: str, sentences: bool = True,
+                    render_breaks: bool = False) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Cut a narration into (chunk text, seconds of silence after it) for separate synthesis.
+    A <break> tag always ends a chunk; with `sentences` the spans between breaks are also
+    cut at sentence ends. Without `render_breaks` the tag stays at the end of its chunk
+    for the provider to render; with it the tag is removed and becomes spliced silence.
+    Returns the seconds of silence before the first chunk, from breaks ahead of any text
+    (e.g. a narration that starts with a formula), and the chunks. Without
+    `render_breaks` such tags start the first chunk instead.
+    """
+    chunks: List[Tuple[str, float]] = []
+    lead = 0.0
+    leading_tags: List[str] = []
+
+    def add_span(span: str):
+        if sentences:
+            chunks.extend((sentence, 0.0) for sentence in split_sentences(span))
+        elif span.strip():
+            chunks.append((span.strip(), 0.0))
+
+    position = 0
+    for match in BREAK_TAG.finditer(text):
+        add_span(text[position:match.start()])
+        position = match.end()
+        if not chunks:
+            # No text yet to attach the pause to: it goes before the first chunk
+            if render_breaks:
+                lead += break_seconds(match.group(0))
+            else:
+                leading_tags.append(match.group(0))
+            continue
+        chunk_text, pause = chunks[-1]
+        if render_breaks:
+            chunks[-1] = (chunk_text, pause + break_seconds(match.group(0)))
+        else:
+            chunks[-1] = (f"{chunk_text} {match.group(0)}", pause)
+    add_span(text[position:])
+    if leading_tags and chunks:
+        chunk_text, pause = chunks[0]
+        chunks[0] = (' '.join(leading_tags + [chunk_text]), pause)
+    return lead, chunks
+
+
+def split_tts_chunks(text: str) -> List[str]:
+    """Sentences of a narration, each <break> tag kept at the end of the chunk before it."""
+    return [chunk for chunk, _ in plan_tts_chunks(text)[1]]
+
+
+def timing_path(audio_path: str) -> str:
+    """Sidecar file holding the chunk boundaries of audio_path."""
+    return os.path.splitext(audio_path)[0] + '.timing.json'
+
+
+def write_timing(audio_path: str, chunks: Sequence[Tuple[str, float]], chunk_paths: Sequence[str],
+                 lead: float = 0.0):
+    """Record where each chunk starts and ends in the joined audio, in seconds."""
+    entries = []
+    start = lead
+    for (text, pause), path in zip(chunks, chunk_paths):
+        end = start + mp3_duration(path)
+        entries.append({"text": text, "start": round(start, 3), "end": round(end, 3)})
+        start = end + pause
+    with atomic_output(timing_path(audio_path)) as temp_path:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"audio": os.path.basename(audio_path), "duration": round(start, 3), "chunks": entries},
+                      f, ensure_ascii=False, indent=2)
+
+
+def synthesize_chunked(pool: TTSPool, jobs: Sequence[Tuple[str, str]], sentences: bool = True,
+                       render_breaks: bool = False,
+                       on_done: Optional[Callable[[int, bool], None]] = None) -> List[bool]:
+    """
+    Like TTSPool.synthesize_all, but every chunk of every text (see plan_tts_chunks) is
+    a job of its own: the sentences of a long slide are synthesized in parallel and
+    cached separately, so editing one sentence only re-synthesizes that sentence. The
+    chunks of each text are then joined into its output file, with the pauses of
+    rendered breaks spliced in as silent frames, and their boundaries written next to it.
+    A text is joined, and reported to on_done, as soon as its last chunk is done.
+    """
+    chunk_jobs: List[Tuple[str, str]] = []
+    layout: List[Tuple[float, List[Tuple[str, float]], List[str]]] = []
+    owner: List[int] = []
+    for index, (text, output_path) in enumerate(jobs):
+        lead, chunks = plan_tts_chunks(text, sentences, render_breaks)
+        chunks = chunks or [(text, 0.0)]
+        chunk_dir = os.path.splitext(output_path)[0] + '_chunks'
+        os.makedirs(chunk_dir, exist_ok=True)
+        paths = [os.path.join(chunk_dir, f"chunk_{k}.mp3") for k in range(1, len(chunks) + 1)]
+        chunk_jobs.extend((chunk_text, path) for (chunk_text, _), path in zip(chunks, paths))
+        layout.append((lead, chunks, paths))
+        owner.extend([index] * len(paths))
+    logger.info(f"Synthesizing {len(jobs)} texts as {len(chunk_jobs)} chunks")
+
+    results = [False] * len(jobs)
+    failed_chunks = [0] * len(jobs)
+    pending = [len(paths) for _, _, paths in layout]
+    lock = threading.Lock()
+
+    def chunk_done(chunk_index: int, chunk_success: bool):
+        index = owner[chunk_index]
+        with lock:
+            failed_chunks[index] += not chunk_success
+            pending[index] -= 1
+            if pending[index]:
+                return
+        output_path = jobs[index][1]
+        lead, chunks, paths = layout[index]
+        success = not failed_chunks[index]
+        if success:
+            # concatenate_mp3 replaces the file, so a hard link into the audio cache is never written through
+            concatenate_mp3(paths, output_path, gaps=[pause for _, pause in chunks], lead=lead)
+            write_timing(output_path, chunks, paths, lead)
+        else:
+            logger.error(f"{failed_chunks[index]} of {len(paths)} chunks failed for {output_path}")
+        shutil.rmtree(os.path.dirname(paths[0]), ignore_errors=True)
+        results[index] = success
+        if on_done:
+            on_done(index, success)
+
+    pool.synthesize_all(chunk_jobs, on_done=chunk_done)
+    return results
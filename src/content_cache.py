@@ -0,0 +1,178 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, Optional
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'latex2video')
+
+# When over budget, evict down to this fraction of the limit to avoid evicting on every write
+EVICTION_TARGET_RATIO = 0.9
+
+
+def cache_root(config: Dict) -> str:
+    """Directory holding every cache shared between decks ('cache.dir' in config)."""
+    cache_config = config.get('cache', {}) or {}
+    return os.path.expanduser(cache_config.get('dir', DEFAULT_CACHE_DIR))
+
+
+def content_key(*parts) -> str:
+    """Stable sha256 hex digest of JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ContentCache:
+    """
+    Directory of blobs addressed by the hash of whatever produced them. Files are
+    sharded by the first two hex digits of the key and written atomically, so
+    concurrent runs never see partial entries. Reads refresh a file's mtime, and the
+    least recently used files are removed once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, name: str = "Cache", suffix: str = ''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.name = name
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self.path_for(key))
+
+    def copy_to(self, key: str, destination: str, hardlink: bool = False) -> bool:
+        """
+        Put the cached file for `key` at `destination`, returning False on a miss. With
+        `hardlink` the file is linked instead of copied when both are on the same file
+        system; the destination must then never be rewritten in place.
+        """
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+            os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+            temp_path = destination + '.tmp'
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            linked = False
+            if hardlink:
+                try:
+                    os.link(path, temp_path)
+                    linked = True
+                except OSError:
+                    # Different file system, or links not supported
+                    pass
+            if not linked:
+                shutil.copyfile(path, temp_path)
+            os.replace(temp_path, destination)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key: str, data: bytes) -> str:
+        """Store `data` under `key` and return the path of the cached file."""
+        return self._store(key, len(data), lambda f: f.write(data))
+
+    def put_file(self, key: str, source: str) -> str:
+        """Store a copy of the file at `source` under `key` and return the cached path."""
+        def copy(f):
+            with open(source, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        return self._store(key, os.path.getsize(source), copy)
+
+    def _store(self, key: str, size: int, write) -> str:
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            previous = os.path.getsize(path)
+        except OSError:
+            previous = 0
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size - previous
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _entries(self):
+        for shard in os.listdir(self.directory):
+            shard_path = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(shard_path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Other processes may have written too, so rescan instead of trusting the running total
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            logger.info(f"Evicted {removed} entries from {self.directory}")
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = f"{100 * self.hits / lookups:.0f}%" if lookups else "n/a"
+        return f"{self.name}: {self.hits} hits, {self.misses} misses (hit rate {hit_rate}) in {self.directory}"
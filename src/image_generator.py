@@ -8,6 +8,8 @@ from typing import List, Dict, Optional
 import yaml
 import shutil # Added for shutil.move
 
+from src.atomic_write import atomic_output
+
 # Attempt to import Slide class for type hinting
 try:
     from src.latex_parser import Slide
@@ -57,7 +59,8 @@ def compile_latex_to_pdf(latex_file_path: str, output_dir: str) -> Optional[str]
     for i in range(2):
         try:
             process = subprocess.run(
-                ['pdflatex', '-interaction=nonstopmode', latex_file_path],
+                # -recorder lists the files the deck reads in <base>.fls, for --incremental
+                ['pdflatex', '-interaction=nonstopmode', '-recorder', latex_file_path],
                 cwd=source_dir, capture_output=True, text=True, timeout=60
             )
             if process.stdout: logging.debug(f"pdflatex run stdout:\n{process.stdout}")
@@ -182,7 +185,8 @@ def generate_placeholder_image(title: str, output_path: str, width: int, height:
         text_width, text_height = draw.textsize(title, font=font)
     x = (width - text_width) / 2; y = (height - text_height) / 2
     draw.text((x, y), title, fill=text_color, font=font)
-    img.save(output_path)
+    with atomic_output(output_path) as temp_path:
+        img.save(temp_path)
     logging.info(f"Generated placeholder image: {output_path}")
 
 def generate_slide_images(latex_file_path: str, slides_data: List[Slide], config: Dict) -> List[str]:
@@ -0,0 +1,106 @@
+import os
+import json
+import logging
+from typing import Callable, Dict, Optional
+
+from src.content_cache import ContentCache, cache_root, content_key
+from src.rate_limit import RateLimiter, create_chat_completion
+from src.api_usage import record_usage
+from src.run_report import register_report_source
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 256
+
+# The cache consulted by cached_completion_text; None until a pipeline enables it
+_active_cache: Optional[ContentCache] = None
+
+
+def configure_llm_cache(config: Dict) -> Optional[ContentCache]:
+    """Enable the chat-completion response cache described by the 'cache' config section."""
+    cache_config = config.get('cache', {}) or {}
+    if not cache_config.get('llm_responses', True):
+        logger.info("LLM response cache disabled in config")
+        set_llm_cache(None)
+        return None
+
+    directory = os.path.join(cache_root(config), 'llm_responses')
+    if _active_cache is not None and _active_cache.directory == directory:
+        return _active_cache
+    max_bytes = int(cache_config.get('llm_responses_max_mb', DEFAULT_MAX_MB) * 1024 * 1024)
+    try:
+        set_llm_cache(ContentCache(directory, max_bytes, name="LLM response cache", suffix='.json'))
+    except OSError as e:
+        logger.warning(f"Could not open LLM response cache at {directory}, continuing without it: {e}")
+        set_llm_cache(None)
+        return None
+    logger.info(f"Using LLM response cache at {directory}")
+    return _active_cache
+
+
+def set_llm_cache(cache: Optional[ContentCache]):
+    global _active_cache
+    _active_cache = cache
+    register_report_source('llm_responses', cache.report if cache else None)
+
+
+def get_llm_cache() -> Optional[ContentCache]:
+    return _active_cache
+
+
+def request_key(request: Dict) -> str:
+    """Hash of everything that determines a completion: model, sampling settings, system message and prompt."""
+    messages = request.get('messages', [])
+    system = '\n'.join(m.get('content') or '' for m in messages if m.get('role') == 'system')
+    prompt = [(m.get('role'), m.get('content')) for m in messages if m.get('role') != 'system']
+    return content_key(request.get('model'), request.get('temperature'), request.get('max_tokens'), system, prompt)
+
+
+def lookup_cached_completion(request: Dict, config: Dict) -> Optional[str]:
+    """Cached answer to `request`, or None if there is none (or openai.reroll is set)."""
+    cache = _active_cache
+    if cache is None or config.get('openai', {}).get('reroll', False):
+        return None
+    key = request_key(request)
+    data = cache.get(key)
+    if data is None:
+        return None
+    try:
+        return json.loads(data)['content']
+    except (ValueError, KeyError):
+        logger.warning(f"Ignoring corrupt LLM cache entry {key}")
+        return None
+
+
+def store_completion(request: Dict, content: str):
+    """Remember the answer to `request` in the response cache, if one is enabled."""
+    cache = _active_cache
+    if cache is None or not content:
+        return
+    entry = {'model': request.get('model'), 'content': content}
+    try:
+        cache.put(request_key(request), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+    except OSError as e:
+        logger.warning(f"Could not store response in LLM cache: {e}")
+
+
+def cached_completion_text(client, limiter: Optional[RateLimiter], config: Dict,
+                           validate: Optional[Callable[[str], bool]] = None, **request) -> str:
+    """
+    Text of the chat completion for `request`, served from the response cache when the
+    same request was answered before. Set openai.reroll in config to ask the model again
+    anyway; the new answer then replaces the cached one.
+
+    With `validate`, only answers it accepts are cached, and a cached answer it rejects
+    is asked for again, so one malformed answer is not replayed on every later run.
+    """
+    content = lookup_cached_completion(request, config)
+    if content is not None and (validate is None or validate(content)):
+        return content
+    response = create_chat_completion(client, limiter, **request)
+    record_usage(getattr(response, 'usage', None))
+    content = response.choices[0].message.content
+    if validate is None or validate(content):
+        store_completion(request, content)
+    return content
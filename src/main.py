@@ -1,4 +1,5 @@
 import os
+import time
 import logging
 import yaml
 import argparse
@@ -35,6 +36,13 @@ try:
     
     from .video_assembler import assemble_video
     logger.info("[MAIN_IMPORT] Imported video_assembler.")
+    from .speech_cache import configure_formula_cache
+    from .audio_cache import configure_audio_cache
+    from .run_report import log_run_report, register_report_source
+    from .pipeline_dag import TaskGraph, PipelineError
+    from .segment_streamer import SegmentStreamer
+    from .build_manifest import BuildManifest, latex_inputs, latex_inputs_digest, image_params, tts_params
+    from .content_cache import content_key
     logger.info("[MAIN_IMPORT] All main imports in main.py completed.")
     for handler in logging.getLogger().handlers: handler.flush()
 
@@ -88,18 +96,27 @@ def load_config(config_path: str) -> dict:
     finally:
         for handler in logging.getLogger().handlers: handler.flush()
 
-def main(latex_file: str, config_file: str):
-    """Main function to generate video from LaTeX presentation."""
-    logger.info("--- Starting LaTeX to Video Generation ---")
-    for handler in logging.getLogger().handlers: handler.flush()
-    
-    # --- 1. Load Configuration ---
-    config = load_config(config_file)
-    if not config:
-        logger.error("Failed to load configuration. Exiting.")
-        return
-    
+def run_pipeline(latex_file: str, config: dict, stream_segments: bool = False, incremental: bool = False,
+                 resume: bool = False, executor=None) -> dict:
+    """
+    Generate the video of one deck from an already loaded config. With stream_segments (or
+    pipeline.stream_segments in config) each slide's video segment is encoded as soon
+    as its image and audio exist, and output/preview.mp4 shows the slides done so far.
+    Every run records its artifacts in output/manifest.json; with incremental (or
+    pipeline.incremental) the images, audio and video whose inputs did not change since
+    they were recorded are reused instead of rebuilt. Slides are recorded as they
+    finish, so with resume a failed or interrupted run continues from the last slide
+    checkpointed instead of starting over.
+
+    The stages run on `executor` when one is given (see src/batch.py), else on a pool
+    of their own. Returns a summary: 'video' (its path, "" on failure), 'error',
+    'seconds' and 'reports', the report lines of the pipeline, manifest and streamer.
+    """
+    started = time.monotonic()
+    result = {'latex_file': os.path.abspath(latex_file), 'video': "", 'error': None, 'seconds': 0.0, 'reports': {}}
     config['latex_file_path'] = os.path.abspath(latex_file)
+    configure_formula_cache(config)
+    configure_audio_cache(config)
     logger.info(f"[MAIN] LaTeX file path set in config: {config['latex_file_path']}")
 
     output_dir = config.get('output_dir') # Should be absolute now
@@ -115,97 +132,183 @@ def main(latex_file: str, config_file: str):
         logger.info(f"Ensured output directories exist in: {output_dir}")
     except OSError as e:
         logger.error(f"Error creating output directories: {e}", exc_info=True)
-        return
+        result['error'] = f"Error creating output directories: {e}"
+        return result
     finally:
         for handler in logging.getLogger().handlers: handler.flush()
 
-    # --- 2. Parse LaTeX File ---
-    logger.info("Step 1: Parsing LaTeX file...")
-    for handler in logging.getLogger().handlers: handler.flush()
-    slides = parse_latex_file(latex_file)
-    if not slides:
-        logger.error("Failed to parse slides from LaTeX file. Exiting.")
-        return
-    logger.info(f"Successfully parsed {len(slides)} slides.")
-    for handler in logging.getLogger().handlers: handler.flush()
-
-    # --- 3. Generate Slide Images ---
-    logger.info("Step 2: Generating slide images...")
-    for handler in logging.getLogger().handlers: handler.flush()
     abs_latex_file_path = os.path.abspath(latex_file)
-    image_paths = generate_slide_images(abs_latex_file_path, config)
-    if not image_paths:
-        logger.error("Failed to generate slide images. Exiting.")
-        return
-    logger.info(f"Generated {len(image_paths)} raw slide images.")
-    for handler in logging.getLogger().handlers: handler.flush()
-        
-    content_image_paths = []
-    if len(image_paths) == len(slides):
-        logger.info("Number of images matches number of slides. All slides will be included in the video.")
+    # Resuming reuses the same per-node checkpoints as an incremental rebuild
+    incremental = incremental or resume or config.get('pipeline', {}).get('incremental', False)
+    manifest = BuildManifest.for_config(config)
+    if resume:
+        if manifest.nodes:
+            logger.info(f"Resuming from {len(manifest.nodes)} checkpoints in {manifest.path}")
+        else:
+            logger.warning(f"No checkpoints in {manifest.path}; nothing to resume, starting from the beginning.")
+    streamer = None
+    if stream_segments or config.get('pipeline', {}).get('stream_segments', False):
+        streamer = SegmentStreamer(config, manifest=manifest, reuse=incremental)
+
+    # --- 2. Pipeline stages ---
+    # Slide rasterization only needs the parsed slides, so it runs alongside narration
+    # and audio; each stage raises PipelineError to stop the stages that depend on it.
+    def parse_stage():
+        logger.info("Step 1: Parsing LaTeX file...")
+        slides = parse_latex_file(latex_file)
+        if not slides:
+            raise PipelineError("Failed to parse slides from LaTeX file.")
+        logger.info(f"Successfully parsed {len(slides)} slides.")
+        return slides
+
+    def images_stage(slides):
+        # pdflatex renders the whole deck at once, so the images are a single node. Its key
+        # covers every file the last compile read (\input parts, graphics, local packages)
+        deck_dir = os.path.dirname(abs_latex_file_path)
+
+        def images_key(inputs):
+            return content_key('images', latex_inputs_digest(deck_dir, inputs), len(slides), image_params(config))
+
+        recorded_inputs = manifest.params('images').get('inputs')
+        if incremental and recorded_inputs and manifest.is_fresh('images', images_key(recorded_inputs)):
+            image_paths = manifest.outputs('images')
+            manifest.reuse('images')
+            logger.info(f"Step 2: Slide images unchanged, reusing {len(image_paths)} images.")
+        else:
+            logger.info("Step 2: Generating slide images...")
+            image_paths = generate_slide_images(abs_latex_file_path, slides, config)
+            if not image_paths:
+                raise PipelineError("Failed to generate slide images.")
+            logger.info(f"Generated {len(image_paths)} raw slide images.")
+            inputs = latex_inputs(abs_latex_file_path, exclude_dirs=[output_dir])
+            manifest.record('images', images_key(inputs), image_paths, {'slides': len(slides), 'inputs': inputs})
+        if streamer:
+            # Extra images are non-content pages, see video_stage
+            streamer.set_images(image_paths[:len(slides)])
+        return image_paths
+
+    def narration_stage(slides):
+        logger.info("Step 3: Generating narration scripts...")
+        narrations = generate_all_narrations(slides, config)
+        if not narrations or len(narrations) != len(slides):
+            raise PipelineError(f"Failed to generate narration scripts or mismatch in count (Narrations: {len(narrations) if narrations else 0}, Slides: {len(slides)}).")
+        logger.info(f"Successfully generated {len(narrations)} narration scripts.")
+        return narrations
+
+    def audio_stage(narrations):
+        logger.info("Step 4: Generating audio files...")
+        params = tts_params(config)
+        audio_keys = [content_key('audio', narration, params) for narration in narrations]
+        stale = [i for i, key in enumerate(audio_keys) if not (incremental and manifest.is_fresh(f'audio/{i}', key))]
+
+        checkpointed = set()
+
+        def audio_ready(index, path):
+            manifest.record(f'audio/{index}', audio_keys[index], [path])
+            checkpointed.add(index)
+            if streamer:
+                streamer.audio_ready(index, path)
+
+        for i in sorted(set(range(len(narrations))) - set(stale)):
+            manifest.reuse(f'audio/{i}')
+            if streamer:
+                streamer.audio_ready(i, manifest.outputs(f'audio/{i}')[0])
+        if not stale:
+            logger.info(f"Audio of all {len(narrations)} slides unchanged, reusing it.")
+            return [manifest.outputs(f'audio/{i}')[0] for i in range(len(narrations))]
+        logger.info(f"Preparing to generate audio for {len(stale)} of {len(narrations)} narration scripts. Output directory: {audio_dir}")
+        try:
+            audio_paths = generate_all_audio(narrations, config, on_audio_ready=audio_ready,
+                                             only=stale if len(stale) < len(narrations) else None)
+        except Exception as e_audio_gen: # Catch any Python exception from generate_all_audio
+            logger.error(f"[MAIN_AUDIO_CALL] !!!! Exception during generate_all_audio call: {e_audio_gen}", exc_info=True)
+            raise PipelineError("Audio generation step failed critically.") from e_audio_gen
+        if not audio_paths or len(audio_paths) != len(narrations):
+            done = len(narrations) - len(stale) + len(checkpointed)
+            raise PipelineError(f"Failed to generate all audio files or mismatch in count (Audio files: {len(audio_paths) if audio_paths else 0}, Narrations: {len(narrations)}). "
+                                f"{done} of {len(narrations)} slides have their audio checkpointed; run again with --resume to synthesize only the rest.")
+        logger.info(f"Successfully generated {len(audio_paths)} audio files.")
+        return audio_paths
+
+    def video_stage(slides, image_paths, audio_paths):
         content_image_paths = image_paths
-    else:
-        logger.warning(f"Mismatch between images ({len(image_paths)}) and slides ({len(slides)}). Attempting to adjust...")
-        if len(image_paths) > len(slides):
-            logger.info(f"Using only the first {len(slides)} images, assuming extra images are non-content (e.g. title pages not in parsed slides).")
+        if len(image_paths) == len(slides):
+            logger.info("Number of images matches number of slides. All slides will be included in the video.")
+        elif len(image_paths) > len(slides):
+            logger.warning(f"Mismatch between images ({len(image_paths)}) and slides ({len(slides)}). Using only the first {len(slides)} images, assuming extra images are non-content (e.g. title pages not in parsed slides).")
             content_image_paths = image_paths[:len(slides)]
-        elif len(slides) > len(image_paths):
-            logger.info(f"More slides parsed ({len(slides)}) than images generated ({len(image_paths)}). Using only the first {len(image_paths)} slides for narration and video.")
-            slides = slides[:len(image_paths)] # Trim slides to match available images
-            content_image_paths = image_paths
-    logger.info(f"Successfully prepared {len(content_image_paths)} slides with matching images for video.")
-    for handler in logging.getLogger().handlers: handler.flush()
+        else:
+            # Narration and audio ran alongside rasterization, so the extra slides are dropped here
+            logger.warning(f"More slides parsed ({len(slides)}) than images generated ({len(image_paths)}). Using only the first {len(image_paths)} slides for the video.")
+            audio_paths = audio_paths[:len(image_paths)]
 
+        slide_count = len(audio_paths[:len(content_image_paths)])
+        video_key = content_key('video', manifest.output_digests('images')[:slide_count],
+                                [manifest.output_digests(f'audio/{i}') for i in range(slide_count)],
+                                config.get('video', {}))
+        if incremental and manifest.is_fresh('video', video_key):
+            manifest.reuse('video')
+            if streamer:
+                streamer.close(cancel=True)
+            logger.info("Step 5: Slides and audio unchanged, reusing the final video.")
+            return manifest.outputs('video')[0]
 
-    # --- 4. Generate Narration Scripts ---
-    logger.info("Step 3: Generating narration scripts...")
-    for handler in logging.getLogger().handlers: handler.flush()
-    narrations = generate_all_narrations(slides, config) # Pass potentially trimmed slides
-    if not narrations or len(narrations) != len(slides): # Compare with (potentially trimmed) slides
-        logger.error(f"Failed to generate narration scripts or mismatch in count (Narrations: {len(narrations) if narrations else 0}, Slides: {len(slides)}). Exiting.")
-        return
-    logger.info(f"Successfully generated {len(narrations)} narration scripts.")
-    for handler in logging.getLogger().handlers: handler.flush()
+        logger.info("Step 5: Assembling final video...")
+        if streamer:
+            # Most segments are already encoded; only the last ones and the join remain
+            final_video_path = streamer.finish(slide_count)
+        else:
+            final_video_path = assemble_video(content_image_paths, audio_paths, config)
+        if not final_video_path:
+            raise PipelineError("Failed to assemble the final video.")
+        manifest.record('video', video_key, [final_video_path], {'slides': slide_count})
+        return final_video_path
 
-    # --- 5. Generate Audio Files ---
-    logger.info("Step 4: Generating audio files...") # This is the message seen in user feedback
-    logger.info(f"Preparing to generate audio for {len(narrations)} narration scripts. Output directory: {audio_dir}")
-    for handler in logging.getLogger().handlers: handler.flush()
-    
-    audio_paths = None
+    graph = TaskGraph(max_workers=config.get('pipeline', {}).get('max_workers', 4), executor=executor)
+    graph.add('parse', parse_stage)
+    graph.add('images', images_stage, ['parse'])
+    graph.add('narration', narration_stage, ['parse'])
+    graph.add('audio', audio_stage, ['narration'])
+    graph.add('video', video_stage, ['parse', 'images', 'audio'])
     try:
-        logger.info("[MAIN_AUDIO_CALL] >>> Calling generate_all_audio now...")
-        for handler in logging.getLogger().handlers: handler.flush()
-        
-        audio_paths = generate_all_audio(narrations, config) # THE CRITICAL CALL
-        
-        logger.info(f"[MAIN_AUDIO_CALL] <<< Returned from generate_all_audio. Result: {'Success' if audio_paths else 'Failure/Empty'}")
-        if audio_paths: logger.info(f"[MAIN_AUDIO_CALL] audio_paths count: {len(audio_paths)}")
+        result['video'] = graph.run()['video']
+    except PipelineError as e:
+        logger.error(f"{e} Exiting.")
+        logger.info(graph.report())
+        result['error'] = str(e)
+    finally:
+        if streamer:
+            streamer.close()
+        result['seconds'] = time.monotonic() - started
+        result['reports'] = {'pipeline': graph.report(), 'manifest': manifest.report()}
+        if streamer:
+            result['reports']['segments'] = streamer.report()
         for handler in logging.getLogger().handlers: handler.flush()
+    return result
 
-    except Exception as e_audio_gen: # Catch any Python exception from generate_all_audio
-        logger.error(f"[MAIN_AUDIO_CALL] !!!! Exception during generate_all_audio call: {e_audio_gen}", exc_info=True)
-        for handler in logging.getLogger().handlers: handler.flush()
-        # Decide if to exit or try to continue if partial audio is acceptable (currently, it's not)
-        logger.error("Audio generation step failed critically. Exiting.")
-        return
 
-    if not audio_paths or len(audio_paths) != len(narrations):
-        logger.error(f"Failed to generate all audio files or mismatch in count (Audio files: {len(audio_paths) if audio_paths else 0}, Narrations: {len(narrations)}). Exiting.")
-        return
-    logger.info(f"Successfully generated {len(audio_paths)} audio files.")
+def main(latex_file: str, config_file: str, stream_segments: bool = False, incremental: bool = False,
+         resume: bool = False):
+    """Main function to generate video from LaTeX presentation; see run_pipeline for the options."""
+    logger.info("--- Starting LaTeX to Video Generation ---")
     for handler in logging.getLogger().handlers: handler.flush()
+    
+    # --- 1. Load Configuration ---
+    config = load_config(config_file)
+    if not config:
+        logger.error("Failed to load configuration. Exiting.")
+        return
 
-    # --- 6. Assemble Final Video ---
-    logger.info("Step 5: Assembling final video...")
-    for handler in logging.getLogger().handlers: handler.flush()
-    final_video_path = assemble_video(content_image_paths, audio_paths, config)
-    if not final_video_path:
-        logger.error("Failed to assemble the final video. Exiting.")
+    result = run_pipeline(latex_file, config, stream_segments=stream_segments, incremental=incremental, resume=resume)
+    for name, line in result['reports'].items():
+        register_report_source(name, lambda line=line: line)
+    if not result['video']:
         return
+    final_video_path = result['video']
         
     logger.info(f"--- Video Generation Complete ---")
     logger.info(f"Final video saved to: {final_video_path}")
+    log_run_report()
     print(f"\nSuccess! Final video available at: {final_video_path}")
     for handler in logging.getLogger().handlers: handler.flush()
 
@@ -224,6 +327,12 @@ if __name__ == "__main__":
     parser.add_argument("latex_file", help="Path to the input LaTeX (.tex) file.")
     parser.add_argument("-c", "--config", default="config/config.yaml", 
                         help="Path to the configuration YAML file (default: config/config.yaml relative to project root).")
+    parser.add_argument("--stream-segments", action="store_true",
+                        help="Encode each slide's video segment as soon as its audio is ready, with a preview of the finished slides.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse the images, audio and video recorded in output/manifest.json whose inputs did not change.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue a failed or interrupted run from the slides it already finished.")
     
     args = parser.parse_args()
     logger.info(f"[MAIN_SCRIPT_EXEC] Parsed arguments: {args}")
@@ -260,6 +369,7 @@ if __name__ == "__main__":
     else:
          logger.info(f"[MAIN_SCRIPT_EXEC] Calling main_function with LaTeX: {latex_path}, Config: {config_path}")
          for handler in logging.getLogger().handlers: handler.flush()
-         main(latex_path, config_path)
+         main(latex_path, config_path, stream_segments=args.stream_segments, incremental=args.incremental,
+              resume=args.resume)
          logger.info("[MAIN_SCRIPT_EXEC] main_function finished.")
          for handler in logging.getLogger().handlers: handler.flush()
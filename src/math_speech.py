@@ -0,0 +1,619 @@
+import re
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+from src.speech_cache import cached_formula_speech
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Bump whenever the rendered speech for an existing formula changes, so that any
+# stored speech produced by an older engine is not reused.
+ENGINE_VERSION = "1"
+# Key of this engine's entries in the persistent formula speech cache
+SPEECH_CACHE_ENGINE = f"math_speech/{ENGINE_VERSION}"
+
+# Maximum number of distinct formulas kept in the in-memory LRU
+MAX_CACHED_FORMULAS = 4096
+
+# --- Vocabulary tables (LaTeX -> spoken Portuguese) ---
+
+GREEK_PT = {
+    'alpha': 'alfa', 'beta': 'beta', 'gamma': 'gama', 'delta': 'delta',
+    'epsilon': 'épsilon', 'varepsilon': 'épsilon', 'zeta': 'zeta', 'eta': 'eta',
+    'theta': 'teta', 'vartheta': 'teta', 'iota': 'iota', 'kappa': 'kapa',
+    'lambda': 'lambda', 'mu': 'mi', 'nu': 'ni', 'xi': 'csi', 'omicron': 'ômicron',
+    'pi': 'pi', 'varpi': 'pi', 'rho': 'rô', 'varrho': 'rô', 'sigma': 'sigma',
+    'varsigma': 'sigma', 'tau': 'tau', 'upsilon': 'ípsilon', 'phi': 'fi',
+    'varphi': 'fi', 'chi': 'qui', 'psi': 'psi', 'omega': 'ômega',
+}
+
+# Uppercase Greek letters that have their own glyph in LaTeX
+GREEK_UPPER_PT = {
+    'Gamma': 'gama', 'Delta': 'delta', 'Theta': 'teta', 'Lambda': 'lambda',
+    'Xi': 'csi', 'Pi': 'pi', 'Sigma': 'sigma', 'Upsilon': 'ípsilon',
+    'Phi': 'fi', 'Psi': 'psi', 'Omega': 'ômega',
+}
+
+SYMBOLS_PT = {
+    'cdot': 'vezes', 'times': 'vezes', 'div': 'dividido por',
+    'pm': 'mais ou menos', 'mp': 'menos ou mais',
+    'leq': 'menor ou igual a', 'le': 'menor ou igual a',
+    'geq': 'maior ou igual a', 'ge': 'maior ou igual a',
+    'neq': 'diferente de', 'ne': 'diferente de',
+    'approx': 'aproximadamente igual a', 'simeq': 'aproximadamente igual a',
+    'equiv': 'equivalente a', 'propto': 'proporcional a', 'sim': 'da ordem de',
+    'll': 'muito menor que', 'gg': 'muito maior que',
+    'infty': 'infinito', 'to': 'tende a', 'rightarrow': 'tende a',
+    'Rightarrow': 'implica', 'implies': 'implica', 'iff': 'se e somente se',
+    'Leftrightarrow': 'se e somente se',
+    'in': 'pertence a', 'notin': 'não pertence a',
+    'subset': 'contido em', 'subseteq': 'contido ou igual a',
+    'cup': 'união', 'cap': 'interseção', 'setminus': 'menos',
+    'forall': 'para todo', 'exists': 'existe',
+    'ldots': 'e assim por diante', 'dots': 'e assim por diante',
+    'cdots': 'e assim por diante',
+    'hbar': 'h cortado', 'ell': 'ele', 'partial': 'a derivada parcial',
+    'nabla': 'o gradiente de', 'circ': 'composta com', 'degree': 'graus',
+    'prime': 'linha', '%': 'por cento',
+}
+
+FUNCTIONS_PT = {
+    'sin': 'seno', 'cos': 'cosseno', 'tan': 'tangente', 'cot': 'cotangente',
+    'sec': 'secante', 'csc': 'cossecante', 'arcsin': 'arco seno',
+    'arccos': 'arco cosseno', 'arctan': 'arco tangente', 'sinh': 'seno hiperbólico',
+    'cosh': 'cosseno hiperbólico', 'tanh': 'tangente hiperbólica',
+    'log': 'logaritmo', 'ln': 'logaritmo natural', 'exp': 'exponencial',
+    'det': 'determinante', 'max': 'máximo', 'min': 'mínimo',
+}
+
+# Operators whose sub/superscripts are limits ("de a até b")
+BIG_OPERATORS_PT = {
+    'sum': 'o somatório', 'prod': 'o produtório', 'int': 'a integral',
+    'iint': 'a integral dupla', 'iiint': 'a integral tripla',
+    'oint': 'a integral de linha', 'lim': 'o limite',
+    'bigcup': 'a união', 'bigcap': 'a interseção',
+}
+
+CHARS_PT = {
+    '+': 'mais', '-': 'menos', '=': 'igual a', '<': 'menor que', '>': 'maior que',
+    '*': 'vezes', '/': 'dividido por', '!': 'fatorial', ',': ',', ';': ';',
+    ':': 'tal que', '|': '', '(': '', ')': '', '[': '', ']': '', '.': '',
+    "'": 'linha',
+}
+
+ACCENTS_PT = {
+    'vec': 'o vetor {}', 'overrightarrow': 'o vetor {}', 'hat': '{} chapéu',
+    'bar': '{} barra', 'overline': '{} barra', 'tilde': '{} til',
+    'dot': '{} ponto', 'ddot': '{} dois pontos', 'mathbf': '{}', 'boldsymbol': '{}',
+    'mathcal': '{}', 'mathbb': '{}', 'mathit': '{}',
+}
+
+TEXT_COMMANDS = {'text', 'textrm', 'textit', 'textbf', 'mathrm', 'operatorname', 'mbox'}
+
+IGNORED_COMMANDS = {
+    ',', ';', ':', '!', ' ', 'quad', 'qquad', 'left', 'right', 'big', 'Big',
+    'bigg', 'Bigg', 'displaystyle', 'textstyle', 'limits', 'nolimits',
+    'langle', 'rangle', '{', '}', 'label', 'nonumber', 'notag',
+}
+
+MATRIX_ENVIRONMENTS = {'matrix', 'bmatrix', 'pmatrix', 'Bmatrix', 'smallmatrix'}
+
+_TOKEN_RE = re.compile(r'\\[a-zA-Z]+|\\.|\d+(?:[.,]\d+)?|\s+|.', re.DOTALL)
+
+
+# --- Syntax tree ---
+
+class Node:
+    """Base class for all nodes of the math syntax tree."""
+    __slots__ = ()
+
+
+class Symbol(Node):
+    """A single token: a variable, number, operator or command without arguments."""
+    __slots__ = ('token',)
+
+    def __init__(self, token: str):
+        self.token = token
+
+    def __repr__(self):
+        return f"Symbol({self.token!r})"
+
+
+class Group(Node):
+    """An ordered sequence of nodes (a braced group or a whole formula)."""
+    __slots__ = ('items',)
+
+    def __init__(self, items: List[Node]):
+        self.items = items
+
+    def __repr__(self):
+        return f"Group({self.items!r})"
+
+
+class Frac(Node):
+    __slots__ = ('numerator', 'denominator')
+
+    def __init__(self, numerator: Group, denominator: Group):
+        self.numerator = numerator
+        self.denominator = denominator
+
+    def __repr__(self):
+        return f"Frac({self.numerator!r}, {self.denominator!r})"
+
+
+class Sqrt(Node):
+    __slots__ = ('index', 'radicand')
+
+    def __init__(self, index: Optional[Group], radicand: Group):
+        self.index = index
+        self.radicand = radicand
+
+    def __repr__(self):
+        return f"Sqrt({self.index!r}, {self.radicand!r})"
+
+
+class Scripts(Node):
+    """A base with an optional subscript and/or superscript."""
+    __slots__ = ('base', 'sub', 'sup')
+
+    def __init__(self, base: Node, sub: Optional[Node] = None, sup: Optional[Node] = None):
+        self.base = base
+        self.sub = sub
+        self.sup = sup
+
+    def __repr__(self):
+        return f"Scripts({self.base!r}, sub={self.sub!r}, sup={self.sup!r})"
+
+
+class Accent(Node):
+    __slots__ = ('command', 'argument')
+
+    def __init__(self, command: str, argument: Group):
+        self.command = command
+        self.argument = argument
+
+    def __repr__(self):
+        return f"Accent({self.command!r}, {self.argument!r})"
+
+
+class Text(Node):
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __repr__(self):
+        return f"Text({self.text!r})"
+
+
+class Environment(Node):
+    """A \\begin{name}...\\end{name} block split into rows (\\\\) and cells (&)."""
+    __slots__ = ('name', 'rows')
+
+    def __init__(self, name: str, rows: List[List[Group]]):
+        self.name = name
+        self.rows = rows
+
+    def __repr__(self):
+        return f"Environment({self.name!r}, {self.rows!r})"
+
+
+# --- Parser ---
+
+class _Parser:
+    """Recursive-descent parser. Every token is consumed exactly once."""
+
+    def __init__(self, formula: str):
+        self.tokens = _TOKEN_RE.findall(formula)
+        self.pos = 0
+
+    def _peek(self, skip_space: bool = True) -> Optional[str]:
+        if skip_space:
+            while self.pos < len(self.tokens) and self.tokens[self.pos].isspace():
+                self.pos += 1
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> Optional[str]:
+        token = self._peek()
+        if token is not None:
+            self.pos += 1
+        return token
+
+    def parse(self) -> Group:
+        group = self._parse_sequence(())
+        # Unbalanced closing braces: skip them and keep going
+        while self._peek() is not None:
+            self.pos += 1
+            group.items.extend(self._parse_sequence(()).items)
+        return group
+
+    def _parse_sequence(self, stops) -> Group:
+        items = []
+        while True:
+            token = self._peek()
+            if token is None or token == '}' or token in stops:
+                return Group(items)
+            node = self._parse_atom()
+            if node is None:
+                continue
+            items.append(self._parse_scripts(node))
+
+    def _parse_scripts(self, base: Node) -> Node:
+        sub = sup = None
+        while True:
+            token = self._peek()
+            if token == '_' and sub is None:
+                self.pos += 1
+                sub = self._parse_argument()
+            elif token == '^' and sup is None:
+                self.pos += 1
+                sup = self._parse_argument()
+            elif token == "'" and sup is None:
+                self.pos += 1
+                sup = Symbol("'")
+            else:
+                break
+        if sub is None and sup is None:
+            return base
+        return Scripts(base, sub, sup)
+
+    def _parse_argument(self) -> Group:
+        """Parse a macro argument: a braced group or a single token."""
+        token = self._peek()
+        if token is None or token == '}':
+            return Group([])
+        if token == '{':
+            self.pos += 1
+            group = self._parse_sequence(())
+            if self._peek() == '}':
+                self.pos += 1
+            return group
+        if token.isdigit() and len(token) > 1:
+            # \frac12 means \frac{1}{2}: split multi-digit numbers one digit at a time
+            self.tokens[self.pos] = token[1:]
+            return Group([Symbol(token[0])])
+        node = self._parse_atom()
+        return Group([node] if node is not None else [])
+
+    def _read_raw_group(self) -> str:
+        """Read a braced group verbatim (used for \\text and environment names)."""
+        if self._peek() != '{':
+            return ''
+        self.pos += 1
+        depth, parts = 1, []
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            self.pos += 1
+            if token == '{':
+                depth += 1
+            elif token == '}':
+                depth -= 1
+                if depth == 0:
+                    break
+            parts.append(token)
+        return ''.join(parts)
+
+    def _parse_atom(self) -> Optional[Node]:
+        token = self._next()
+        if token is None:
+            return None
+        if token == '{':
+            group = self._parse_sequence(())
+            if self._peek() == '}':
+                self.pos += 1
+            return group
+        if token in ('_', '^', '&'):
+            return None
+        if not token.startswith('\\') or len(token) == 1:
+            return Symbol(token)
+
+        name = token[1:]
+        if name in ('frac', 'dfrac', 'tfrac', 'cfrac'):
+            return Frac(self._parse_argument(), self._parse_argument())
+        if name == 'sqrt':
+            index = None
+            if self._peek() == '[':
+                self.pos += 1
+                index = self._parse_sequence((']',))
+                if self._peek() == ']':
+                    self.pos += 1
+            return Sqrt(index, self._parse_argument())
+        if name == 'begin':
+            return self._parse_environment(self._read_raw_group())
+        if name == 'end':
+            self._read_raw_group()
+            return None
+        if name in TEXT_COMMANDS:
+            return Text(self._read_raw_group())
+        if name in ACCENTS_PT:
+            return Accent(name, self._parse_argument())
+        if name in ('label', 'tag'):
+            self._read_raw_group()
+            return None
+        if name in IGNORED_COMMANDS:
+            return None
+        if name == '\\':
+            # Stray line break outside of an environment
+            return Symbol(';')
+        return Symbol(token)
+
+    def _parse_environment(self, name: str) -> Environment:
+        base_name = name.rstrip('*')
+        if base_name == 'array' and self._peek() == '{':
+            self._read_raw_group()  # column specification
+        rows, cells = [], []
+        stops = ('&', '\\\\', '\\end')
+        while True:
+            cells.append(self._parse_sequence(stops))
+            token = self._next()
+            if token == '&':
+                continue
+            rows.append(cells)
+            cells = []
+            if token == '\\\\':
+                continue
+            if token == '\\end':
+                self._read_raw_group()
+            elif token == '}':
+                # Unbalanced brace inside the environment: treat as its end
+                pass
+            break
+        # Drop the empty row produced by a trailing \\
+        rows = [row for row in rows if any(cell.items for cell in row)]
+        return Environment(base_name, rows)
+
+
+def parse_math(formula: str) -> Group:
+    """Parse a LaTeX math formula (without delimiters) into a syntax tree."""
+    return _Parser(formula).parse()
+
+
+# --- Renderer ---
+
+def _is_simple(node: Node) -> bool:
+    """True when the node is read as a single word (so no grouping words are needed)."""
+    if isinstance(node, Group):
+        return len(node.items) == 1 and _is_simple(node.items[0])
+    if isinstance(node, Symbol):
+        return True
+    if isinstance(node, Scripts):
+        return (_is_simple(node.base) and (node.sub is None or _is_simple(node.sub))
+                and node.sup is None)
+    return False
+
+
+def _command_name(node: Node) -> Optional[str]:
+    if isinstance(node, Symbol) and node.token.startswith('\\') and len(node.token) > 1:
+        return node.token[1:]
+    return None
+
+
+def _leading_differential(group: Group):
+    """Return ('d' | 'partial', rest) when the group starts with a differential."""
+    if not isinstance(group, Group) or not group.items:
+        return None
+    first = group.items[0]
+    if _command_name(first) == 'partial':
+        return 'partial', Group(group.items[1:])
+    if isinstance(first, Symbol) and first.token == 'd':
+        return 'd', Group(group.items[1:])
+    return None
+
+
+class _Renderer:
+    """Renders a syntax tree to spoken Portuguese in a single traversal."""
+
+    def render(self, node: Node) -> str:
+        if isinstance(node, Group):
+            return self._render_sequence(node.items)
+        if isinstance(node, Symbol):
+            return self._render_symbol(node.token)
+        if isinstance(node, Frac):
+            return self._render_frac(node)
+        if isinstance(node, Sqrt):
+            return self._render_sqrt(node)
+        if isinstance(node, Scripts):
+            return self._render_scripts(node)
+        if isinstance(node, Accent):
+            return ACCENTS_PT[node.command].format(self.render(node.argument))
+        if isinstance(node, Text):
+            return node.text.strip()
+        if isinstance(node, Environment):
+            return self._render_environment(node)
+        return ''
+
+    def _render_symbol(self, token: str) -> str:
+        if token == 'y':
+            return 'ipsilon'
+        if token in CHARS_PT:
+            return CHARS_PT[token]
+        if not token.startswith('\\') or len(token) == 1:
+            return token
+        name = token[1:]
+        if name in GREEK_PT:
+            return GREEK_PT[name]
+        if name in GREEK_UPPER_PT:
+            return f"{GREEK_UPPER_PT[name]} maiúsculo"
+        if name in SYMBOLS_PT:
+            return SYMBOLS_PT[name]
+        if name in FUNCTIONS_PT:
+            return FUNCTIONS_PT[name]
+        if name in BIG_OPERATORS_PT:
+            return f"{BIG_OPERATORS_PT[name]} de"
+        if len(name) == 1 and not name.isalpha():
+            # Escaped character such as \{ or \$
+            return '' if name in '{}$#&_' else name
+        return name
+
+    def _render_sequence(self, items: List[Node]) -> str:
+        words = []
+        i = 0
+        while i < len(items):
+            item = items[i]
+            name = _command_name(item)
+            following = items[i + 1] if i + 1 < len(items) else None
+
+            # \nabla \times, \nabla \cdot and \nabla^2 are read as operators
+            if name == 'nabla' and following is not None:
+                follow_name = _command_name(following)
+                if follow_name == 'times':
+                    words.append('o rotacional de')
+                    i += 2
+                    continue
+                if follow_name == 'cdot':
+                    words.append('o divergente de')
+                    i += 2
+                    continue
+            if (isinstance(item, Scripts) and _command_name(item.base) == 'nabla'
+                    and item.sub is None and _is_square(item.sup)):
+                words.append('o laplaciano de')
+                i += 1
+                continue
+
+            words.append(self.render(item))
+
+            # Function application: f(x) -> "f de x", \sin x -> "seno de x"
+            if following is not None:
+                base = item.base if isinstance(item, Scripts) else item
+                base_name = _command_name(base)
+                if base_name in FUNCTIONS_PT and base_name not in ('max', 'min'):
+                    words.append('de')
+                elif (isinstance(base, Symbol) and len(base.token) == 1 and base.token.isalpha()
+                      and isinstance(following, Symbol) and following.token == '('):
+                    words.append('de')
+            i += 1
+        return ' '.join(word for word in words if word)
+
+    def _render_frac(self, node: Frac) -> str:
+        numerator = _leading_differential(node.numerator)
+        denominator = _leading_differential(node.denominator)
+        if numerator and denominator and numerator[0] == denominator[0]:
+            kind = 'a derivada parcial' if numerator[0] == 'partial' else 'a derivada'
+            variable = self.render(denominator[1])
+            if numerator[1].items:
+                return f"{kind} de {self.render(numerator[1])} em relação a {variable}"
+            return f"{kind} em relação a {variable} de"
+
+        num = self.render(node.numerator)
+        den = self.render(node.denominator)
+        if _is_simple(node.numerator) and _is_simple(node.denominator):
+            return f"{num} dividido por {den}"
+        return f"a fração com numerador {num} e denominador {den}"
+
+    def _render_sqrt(self, node: Sqrt) -> str:
+        radicand = self.render(node.radicand)
+        if node.index is None or not node.index.items:
+            return f"a raiz quadrada de {radicand}"
+        index = self.render(node.index)
+        if index == '2':
+            return f"a raiz quadrada de {radicand}"
+        if index == '3':
+            return f"a raiz cúbica de {radicand}"
+        return f"a raiz de índice {index} de {radicand}"
+
+    def _render_scripts(self, node: Scripts) -> str:
+        base_name = _command_name(node.base)
+        if base_name in BIG_OPERATORS_PT:
+            spoken = BIG_OPERATORS_PT[base_name]
+            if base_name == 'lim':
+                if node.sub is not None:
+                    spoken += f" quando {self.render(node.sub)}"
+                return f"{spoken} de"
+            if node.sub is not None:
+                spoken += f" de {self.render(node.sub)}"
+            if node.sup is not None:
+                spoken += f" até {self.render(node.sup)}"
+            return f"{spoken} de"
+
+        base = self.render(node.base)
+        if base.endswith(' de'):
+            base = base[:-3]
+        words = [base]
+        if node.sub is not None:
+            words.append(f"índice {self.render(node.sub)}")
+        if node.sup is not None:
+            words.append(self._render_exponent(node.sup))
+        return ' '.join(words)
+
+    def _render_exponent(self, sup: Node) -> str:
+        if _is_square(sup):
+            return 'ao quadrado'
+        if isinstance(sup, Group) and len(sup.items) == 1:
+            sup = sup.items[0]
+        if _command_name(sup) == 'circ':
+            return 'graus'
+        spoken = self.render(sup)
+        if spoken == '3':
+            return 'ao cubo'
+        if spoken == 'linha':
+            return spoken
+        if spoken == 'T':
+            return 'transposta'
+        return f"elevado a {spoken}"
+
+    def _render_environment(self, node: Environment) -> str:
+        rows = [[self.render(cell) for cell in row] for row in node.rows]
+        if node.name in MATRIX_ENVIRONMENTS or node.name in ('vmatrix', 'Vmatrix'):
+            body = '; '.join(', '.join(cell for cell in row if cell) for row in rows)
+            if node.name in ('vmatrix', 'Vmatrix'):
+                return f"o determinante da matriz com linhas {body}; fim da matriz"
+            return f"a matriz com linhas {body}; fim da matriz"
+        if node.name == 'cases':
+            parts = []
+            for row in rows:
+                if len(row) > 1 and row[1]:
+                    parts.append(f"{row[0]} se {row[1]}")
+                else:
+                    parts.append(row[0])
+            return '; '.join(parts)
+        # align, equation, gather, split, eqnarray, array...
+        return '. '.join(' '.join(cell for cell in row if cell) for row in rows)
+
+
+def _is_square(node: Optional[Node]) -> bool:
+    if isinstance(node, Group) and len(node.items) == 1:
+        node = node.items[0]
+    return isinstance(node, Symbol) and node.token == '2'
+
+
+def render_speech_pt(tree: Node) -> str:
+    """Render a parsed formula to spoken Portuguese."""
+    text = _Renderer().render(tree)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s+([,;.])', r'\1', text)
+    return text.strip(' ,;')
+
+
+def normalize_formula(formula: str) -> str:
+    """Normalize a formula string so trivially different spellings share a cache entry."""
+    return re.sub(r'\s+', ' ', formula).strip()
+
+
+def _speech_pt(formula: str) -> str:
+    try:
+        return render_speech_pt(parse_math(formula))
+    except RecursionError:
+        logger.warning(f"Formula too deeply nested to parse, reading it verbatim: {formula[:80]}...")
+        return re.sub(r'\\[a-zA-Z]+|[\\{}_^&$]', ' ', formula).strip()
+
+
+@lru_cache(maxsize=MAX_CACHED_FORMULAS)
+def _cached_speech_pt(formula: str) -> str:
+    # The in-memory LRU sits in front of the persistent cache shared between decks
+    return cached_formula_speech(SPEECH_CACHE_ENGINE, 'pt', formula, _speech_pt)
+
+
+def latex_to_speech_pt(formula: str) -> str:
+    """
+    Convert a LaTeX math formula (without $ or \\( \\) delimiters) to spoken Portuguese.
+    Results are memoized per normalized formula in a bounded LRU and, once a pipeline
+    has called speech_cache.configure_formula_cache, in the on-disk formula cache.
+    """
+    return _cached_speech_pt(normalize_formula(formula))
+
+
+def speech_cache_info():
+    """Hit/miss statistics of the in-memory formula LRU."""
+    return _cached_speech_pt.cache_info()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the OpenAI API this project uses: chat completions
+(streaming and non-streaming), file upload/download and batches. Meant for load
+testing concurrency, caching and retry logic without network access or API costs.
+
+Run it on its own and point the pipeline at it with `openai.base_url` in config:
+
+    python -m src.mock_openai_server --port 8765 --latency 0.5 --rate-limit-rate 0.1
+
+    openai:
+      base_url: http://127.0.0.1:8765/v1
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import email
+import email.policy
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# The real API only caches prompt prefixes from this length on, in steps of PROMPT_CACHE_INCREMENT
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_INCREMENT = 128
+# Recent prompts compared against for the simulated prompt cache
+PROMPT_CACHE_SIZE = 64
+STREAM_CHUNK_CHARS = 8
+
+
+def default_responder(body: Dict) -> str:
+    """
+    Answer derived from the prompt: "Narração de <slide title>." for one slide, or the
+    JSON object request_packing asks for when several "### Slide N" sections are sent.
+    """
+    prompt = body.get('messages', [{}])[-1].get('content') or ''
+    if (body.get('response_format') or {}).get('type') == 'json_object':
+        numbers = [int(n) for n in re.findall(r'^### Slide (\d+)$', prompt, re.MULTILINE)]
+        return json.dumps({"scripts": [{"slide_number": n, "script": f"Narração do slide {n}."} for n in numbers]},
+                          ensure_ascii=False)
+    title = re.search(r'^# (.+)$', prompt, re.MULTILINE)
+    return f"Narração de {title.group(1)}." if title else "Narração do slide."
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering like the OpenAI API.
+
+    Args:
+        latency: Seconds before each chat completion is answered (before the first chunk when streaming)
+        latency_jitter: Extra random latency, uniform between 0 and this many seconds
+        error_rate: Fraction of chat completions answered with a 500 error
+        rate_limit_rate: Fraction of chat completions answered with a 429
+        throttle_first: Answer the first N chat completions with a 429, whatever the rates
+        fail_first: Answer the first N chat completions after any throttled ones with a 500
+        retry_after: Seconds sent in the Retry-After header of 429 answers
+        chunk_delay: Seconds between chunks of a streamed answer
+        batch_delay: Seconds after creation before a batch is completed
+        responder: Function from request body to answer text (default_responder if None)
+        seed: Seed for the random error injection, for reproducible runs
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 throttle_first: int = 0, fail_first: int = 0, retry_after: float = 1.0, chunk_delay: float = 0.0,
+                 batch_delay: float = 0.0, responder: Optional[Callable[[Dict], str]] = None,
+                 seed: Optional[int] = None):
+        super().__init__((host, port), _MockOpenAIHandler)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.throttle_first = throttle_first
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.chunk_delay = chunk_delay
+        self.batch_delay = batch_delay
+        self.responder = responder or default_responder
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.files: Dict[str, Dict] = {}
+        self.batches: Dict[str, Dict] = {}
+        self.recent_prompts = []
+        self.stats = {"requests": 0, "completions": 0, "throttled": 0, "errors": 0,
+                      "in_flight": 0, "max_in_flight": 0}
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'MockOpenAIServer':
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def injected_failure(self) -> Optional[int]:
+        """HTTP status to answer the next chat completion with, or None to answer normally."""
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.stats["requests"] <= self.throttle_first or self.random.random() < self.rate_limit_rate:
+                self.stats["throttled"] += 1
+                return 429
+            if (self.stats["requests"] <= self.throttle_first + self.fail_first
+                    or self.random.random() < self.error_rate):
+                self.stats["errors"] += 1
+                return 500
+        return None
+
+    def wait_latency(self):
+        delay = self.latency
+        if self.latency_jitter:
+            with self.lock:
+                delay += self.random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def usage(self, body: Dict, answer: str) -> Dict:
+        """Token usage of an answer, with cached_tokens simulating the API's prompt prefix cache."""
+        prompt = ''.join(m.get('content') or '' for m in body.get('messages', []))
+        with self.lock:
+            shared = max((len(os.path.commonprefix([prompt, other])) for other in self.recent_prompts), default=0)
+            self.recent_prompts = (self.recent_prompts + [prompt])[-PROMPT_CACHE_SIZE:]
+        cached = shared // CHARS_PER_TOKEN // PROMPT_CACHE_INCREMENT * PROMPT_CACHE_INCREMENT
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        completion_tokens = len(answer) // CHARS_PER_TOKEN
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached if cached >= PROMPT_CACHE_MIN_TOKENS else 0}}
+
+    def completion(self, body: Dict) -> Dict:
+        """Non-streaming chat.completion object answering `body`."""
+        answer = self.responder(body)
+        with self.lock:
+            self.stats["completions"] += 1
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get('model', 'gpt-4o'),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": answer}}],
+            "usage": self.usage(body, answer),
+        }
+
+    def complete_batch(self, batch: Dict):
+        """Answer every request of a batch input file and store the output file."""
+        lines = []
+        for line in self.files[batch["input_file_id"]]["content"].decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            response = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": self.completion(request["body"])}
+            lines.append(json.dumps({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request.get("custom_id"),
+                                     "response": response, "error": None}, ensure_ascii=False))
+        output = self.add_file(("\n".join(lines) + "\n").encode('utf-8'), "batch_output.jsonl", "batch_output")
+        batch.update(status="completed", output_file_id=output["id"], completed_at=int(time.time()),
+                     request_counts={"total": len(lines), "completed": len(lines), "failed": 0})
+
+    def add_file(self, content: bytes, filename: str, purpose: str) -> Dict:
+        file_id = f"file-{uuid.uuid4().hex}"
+        record = {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                  "filename": filename, "purpose": purpose, "status": "processed", "content": content}
+        with self.lock:
+            self.files[file_id] = record
+        return record
+
+
+class _MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str, error_type: str, headers: Optional[Dict] = None):
+        self._send_json(status, {"error": {"message": message, "type": error_type, "code": None}}, headers)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        if path.endswith('/chat/completions'):
+            self._chat_completions(json.loads(self._read_body()))
+        elif path.endswith('/files'):
+            self._upload_file()
+        elif path.endswith('/batches'):
+            self._create_batch(json.loads(self._read_body()))
+        else:
+            self._read_body()
+            self._send_error(404, f"Unknown endpoint {path}", "invalid_request_error")
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        match = re.search(r'/files/([^/]+)/content$', path)
+        if match:
+            record = server.files.get(match.group(1))
+            if record is None:
+                return self._send_error(404, "No such file", "invalid_request_error")
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(record["content"])))
+            self.end_headers()
+            self.wfile.write(record["content"])
+            return
+        match = re.search(r'/batches/([^/]+)$', path)
+        if match:
+            batch = server.batches.get(match.group(1))
+            if batch is None:
+                return self._send_error(404, "No such batch", "invalid_request_error")
+            with server.lock:
+                due = batch["status"] == "in_progress" and time.time() - batch["created_at"] >= server.batch_delay
+            if due:
+                server.complete_batch(batch)
+            return self._send_json(200, batch)
+        self._send_error(404, f"Unknown endpoint {path}", "invalid_request_error")
+
+    def _chat_completions(self, body: Dict):
+        server = self.server
+        failure = server.injected_failure()
+        if failure == 429:
+            return self._send_error(429, "Rate limit reached for requests", "requests",
+                                    {'Retry-After': str(server.retry_after)})
+        if failure == 500:
+            return self._send_error(500, "The server had an error while processing your request.", "server_error")
+
+        with server.lock:
+            server.stats["in_flight"] += 1
+            server.stats["max_in_flight"] = max(server.stats["max_in_flight"], server.stats["in_flight"])
+        try:
+            server.wait_latency()
+            completion = server.completion(body)
+            if body.get('stream'):
+                self._stream(body, completion)
+            else:
+                self._send_json(200, completion)
+        finally:
+            with server.lock:
+                server.stats["in_flight"] -= 1
+
+    def _stream(self, body: Dict, completion: Dict):
+        """Send a completion as server-sent events, STREAM_CHUNK_CHARS characters per chunk."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        answer = completion["choices"][0]["message"]["content"]
+        base = {"id": completion["id"], "object": "chat.completion.chunk",
+                "created": completion["created"], "model": completion["model"]}
+
+        def event(payload: Dict) -> bytes:
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8')
+
+        self._write_chunk(event({**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""},
+                                                     "finish_reason": None}]}))
+        for start in range(0, len(answer), STREAM_CHUNK_CHARS):
+            if self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+            delta = {"content": answer[start:start + STREAM_CHUNK_CHARS]}
+            self._write_chunk(event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}))
+        self._write_chunk(event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            self._write_chunk(event({**base, "choices": [], "usage": completion["usage"]}))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _upload_file(self):
+        """Multipart upload as sent by client.files.create(file=..., purpose=...)."""
+        raw = self._read_body()
+        message = email.message_from_bytes(
+            b"Content-Type: " + self.headers['Content-Type'].encode() + b"\r\n\r\n" + raw,
+            policy=email.policy.default)
+        content, filename, purpose = b"", "upload.jsonl", "batch"
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if name == 'file':
+                content = part.get_payload(decode=True)
+                filename = part.get_filename() or filename
+            elif name == 'purpose':
+                purpose = part.get_payload(decode=True).decode('utf-8')
+        record = self.server.add_file(content, filename, purpose)
+        self._send_json(200, {k: v for k, v in record.items() if k != 'content'})
+
+    def _create_batch(self, body: Dict):
+        server = self.server
+        if body.get('input_file_id') not in server.files:
+            return self._send_error(400, "Unknown input_file_id", "invalid_request_error")
+        batch = {"id": f"batch_{uuid.uuid4().hex}", "object": "batch", "endpoint": body.get('endpoint'),
+                 "input_file_id": body['input_file_id'], "completion_window": body.get('completion_window', '24h'),
+                 "status": "in_progress", "created_at": int(time.time()), "output_file_id": None,
+                 "error_file_id": None, "errors": None,
+                 "request_counts": {"total": 0, "completed": 0, "failed": 0}}
+        with server.lock:
+            server.batches[batch["id"]] = batch
+        self._send_json(200, batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock server for testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before each answer")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of completions answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of completions answered with a 429")
+    parser.add_argument("--throttle-first", type=int, default=0, help="Answer the first N completions with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds of 429 answers")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Seconds between streamed chunks")
+    parser.add_argument("--batch-delay", type=float, default=5.0, help="Seconds before a batch completes")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = MockOpenAIServer(args.host, args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+                              error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                              throttle_first=args.throttle_first, retry_after=args.retry_after,
+                              chunk_delay=args.chunk_delay, batch_delay=args.batch_delay, seed=args.seed)
+    logger.info(f"Mock OpenAI API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Stats: {server.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the TTS services this project uses: the ElevenLabs text-to-speech
+(including /stream) and voices endpoints, and the Google Translate endpoint gTTS
+calls. Answers are deterministic silent MP3s whose length follows the text, so
+throughput, caching and retry logic can be measured without network access.
+
+Run it on its own and point the providers at it in config:
+
+    python -m src.mock_tts_server --port 8766 --latency 0.5 --rate-limit-rate 0.1
+
+    tts:
+      gtts_base_url: http://127.0.0.1:8766
+    elevenlabs:
+      base_url: http://127.0.0.1:8766/v1
+"""
+import re
+import sys
+import json
+import time
+import base64
+import random
+import logging
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Silent frames in the formats the real services return:
+# ElevenLabs mp3_44100_128 (MPEG-1, 44.1 kHz, 128 kbps, 1152 samples per frame)
+ELEVENLABS_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+ELEVENLABS_FRAME_SECONDS = 1152 / 44100
+# gTTS (MPEG-2, 24 kHz, 32 kbps mono, 576 samples per frame)
+GTTS_FRAME = b'\xff\xf3\x44\xc4' + b'\x00' * 92
+GTTS_FRAME_SECONDS = 576 / 24000
+# Speaking rate the audio length is derived from
+CHARS_PER_SECOND = 15
+STREAM_CHUNK_BYTES = 4096
+GTTS_PATH = '/_/TranslateWebserverUi/data/batchexecute'
+
+
+def mock_audio(text: str, frame: bytes, frame_seconds: float) -> bytes:
+    """Silent MP3 as long as `text` would take to read aloud (at least one frame)."""
+    return frame * max(1, round(len(text) / CHARS_PER_SECOND / frame_seconds))
+
+
+class MockTTSServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering like ElevenLabs and the gTTS endpoint.
+
+    Args:
+        latency: Seconds before each synthesis request is answered (before the first chunk when streaming)
+        latency_jitter: Extra random latency, uniform between 0 and this many seconds
+        error_rate: Fraction of synthesis requests answered with a 500 error
+        rate_limit_rate: Fraction of synthesis requests answered with a 429
+        throttle_first: Answer the first N synthesis requests with a 429, whatever the rates
+        max_concurrency: Answer a 429 to requests beyond this many in flight, like ElevenLabs' plan limits (None = no limit)
+        chunk_delay: Seconds between chunks of a streamed answer
+        seed: Seed for the random error injection, for reproducible runs
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 throttle_first: int = 0, max_concurrency: Optional[int] = None, chunk_delay: float = 0.0,
+                 seed: Optional[int] = None):
+        super().__init__((host, port), _MockTTSHandler)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.throttle_first = throttle_first
+        self.max_concurrency = max_concurrency
+        self.chunk_delay = chunk_delay
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "syntheses": 0, "characters": 0, "voice_checks": 0, "throttled": 0,
+                      "errors": 0, "connections": 0, "in_flight": 0, "max_in_flight": 0}
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """Root URL, the value of tts.gtts_base_url."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def elevenlabs_url(self) -> str:
+        """The value of elevenlabs.base_url."""
+        return f"{self.base_url}/v1"
+
+    def start(self) -> 'MockTTSServer':
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def begin_synthesis(self) -> Optional[int]:
+        """
+        Count a synthesis request and return the HTTP status to fail it with, or None to
+        answer normally; in the latter case synthesized and then end_synthesis must be
+        called.
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            if (self.stats["requests"] <= self.throttle_first or self.random.random() < self.rate_limit_rate
+                    or (self.max_concurrency is not None and self.stats["in_flight"] >= self.max_concurrency)):
+                self.stats["throttled"] += 1
+                return 429
+            if self.random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        return None
+
+    def synthesized(self, text: str):
+        """Count a synthesis before its answer is sent, so a client that got it sees it counted."""
+        with self.lock:
+            self.stats["syntheses"] += 1
+            self.stats["characters"] += len(text)
+
+    def end_synthesis(self):
+        with self.lock:
+            self.stats["in_flight"] -= 1
+
+    def wait_latency(self):
+        delay = self.latency
+        if self.latency_jitter:
+            with self.lock:
+                delay += self.random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _MockTTSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_detail(self, status: int, status_name: str, message: str):
+        # ElevenLabs' error body
+        detail = {"detail": {"status": status_name, "message": message}}
+        self._send(status, json.dumps(detail).encode(), 'application/json')
+
+    def _send_failure(self, status: int):
+        if status == 429:
+            self._send_detail(429, "too_many_concurrent_requests", "Too many concurrent requests")
+        else:
+            self._send_detail(500, "internal_server_error", "Mock server error")
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path.rstrip('/')
+        if not self.headers.get('xi-api-key'):
+            return self._send_detail(401, "invalid_api_key", "Missing xi-api-key header")
+        with self.server.lock:
+            self.server.stats["voice_checks"] += 1
+        # Any voice id exists, so configs written for the real service work unchanged
+        if path == '/v1/voices':
+            voices = {"voices": [{"voice_id": "mock", "name": "Mock"}]}
+            return self._send(200, json.dumps(voices).encode(), 'application/json')
+        match = re.fullmatch(r'/v1/voices/([^/]+)', path)
+        if match:
+            voice = {"voice_id": match.group(1), "name": f"Mock {match.group(1)}"}
+            return self._send(200, json.dumps(voice).encode(), 'application/json')
+        self._send_detail(404, "not_found", f"Unknown endpoint {path}")
+
+    def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path.rstrip('/')
+        body = self._read_body()
+        match = re.fullmatch(r'/v1/text-to-speech/([^/]+)(/stream)?', path)
+        if match:
+            return self._elevenlabs(body, stream=bool(match.group(2)))
+        if path == GTTS_PATH:
+            return self._gtts(body)
+        self._send_detail(404, "not_found", f"Unknown endpoint {path}")
+
+    def _elevenlabs(self, body: bytes, stream: bool):
+        if not self.headers.get('xi-api-key'):
+            return self._send_detail(401, "invalid_api_key", "Missing xi-api-key header")
+        try:
+            text = json.loads(body or b'{}')["text"]
+        except (ValueError, KeyError):
+            return self._send_detail(422, "invalid_request", "Body must be JSON with a 'text' field")
+        server = self.server
+        failure = server.begin_synthesis()
+        if failure:
+            return self._send_failure(failure)
+        try:
+            server.wait_latency()
+            audio = mock_audio(text, ELEVENLABS_FRAME, ELEVENLABS_FRAME_SECONDS)
+            server.synthesized(text)
+            if not stream:
+                return self._send(200, audio, 'audio/mpeg')
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for start in range(0, len(audio), STREAM_CHUNK_BYTES):
+                if start and server.chunk_delay:
+                    time.sleep(server.chunk_delay)
+                chunk = audio[start:start + STREAM_CHUNK_BYTES]
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            server.end_synthesis()
+
+    def _gtts(self, body: bytes):
+        # gTTS posts f.req=[[["jQ1olc", "[text, lang, speed, null]", null, "generic"]]]
+        try:
+            rpc = json.loads(urllib.parse.parse_qs(body.decode('utf-8'))['f.req'][0])
+            text = json.loads(rpc[0][0][1])[0]
+        except (ValueError, KeyError, IndexError, TypeError):
+            return self._send(400, b'Bad request', 'text/plain')
+        server = self.server
+        failure = server.begin_synthesis()
+        if failure:
+            return self._send(failure, b'Error', 'text/plain')
+        try:
+            server.wait_latency()
+            audio = base64.b64encode(mock_audio(text, GTTS_FRAME, GTTS_FRAME_SECONDS)).decode('ascii')
+            # Same framing as Google's answer; gTTS only looks for the jQ1olc line
+            line = json.dumps([["wrb.fr", "jQ1olc", json.dumps([audio]), None, None, None, "generic"]],
+                              separators=(',', ':'))
+            server.synthesized(text)
+            self._send(200, f")]}}'\n\n{len(line)}\n{line}\n".encode(), 'application/json; charset=utf-8')
+        finally:
+            server.end_synthesis()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ElevenLabs/gTTS mock server for testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before each answer")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--throttle-first", type=int, default=0, help="Answer the first N requests with a 429")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Answer a 429 beyond this many requests in flight")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = MockTTSServer(args.host, args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+                           error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                           throttle_first=args.throttle_first, max_concurrency=args.max_concurrency,
+                           chunk_delay=args.chunk_delay, seed=args.seed)
+    logger.info(f"Mock TTS listening on {server.base_url} (ElevenLabs API at {server.elevenlabs_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Stats: {server.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@ import re
 import logging
 from typing import List, Dict
 from .latex_parser import Slide  # Assuming latex_parser.py is in the same directory
+from .speech_cache import cached_formula_speech
 import yaml
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -132,9 +133,19 @@ COMPLEX_PATTERNS_PT = [
     (re.compile(r'\\i\b'), r'i'),
 ]
 
+# Bump whenever latex_math_to_speakable_text_pt changes its output, so that speech
+# stored in the persistent formula cache by an older version is not reused.
+SPEAKABLE_TEXT_VERSION = "1"
+
+
 def latex_math_to_speakable_text_pt(math_content: str) -> str:
     """Converts LaTeX math notation to speakable Portuguese text."""
-    
+    # The replacements below are whitespace sensitive, so the raw line is the cache key
+    return cached_formula_speech(f"narration_pt/{SPEAKABLE_TEXT_VERSION}", 'pt', math_content,
+                                 _latex_math_to_speakable_text_pt)
+
+
+def _latex_math_to_speakable_text_pt(math_content: str) -> str:
     # Remove $...$ or $$...$$ delimiters
     text = re.sub(r'\${1,2}(.*?)\${1,2}', r'\1', math_content).strip()
     
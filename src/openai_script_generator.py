@@ -4,8 +4,7 @@ import sys
 import logging
 import yaml
 import argparse
-from typing import List, Dict
-import time
+from typing import List, Dict, Optional
 from openai import OpenAI
 
 # Add the parent directory to the path so we can import from src
@@ -14,6 +13,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.latex_parser import parse_latex_file, Slide
 from src.chatgpt_script_generator import format_slide_for_chatgpt
 from src.simple_video_assembler import assemble_video
+from src.rate_limit import RateLimiter, rate_limiter_from_config, map_in_order, DEFAULT_CONCURRENCY
+from src.llm_cache import cached_completion_text, configure_llm_cache
+from src.run_report import log_run_report
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -71,6 +73,11 @@ def initialize_openai_client(config: Dict) -> OpenAI:
     has_api_key = bool(api_key)
     logging.info(f"API key found: {has_api_key}")
     
+    # Another OpenAI-compatible server, e.g. src/mock_openai_server.py
+    base_url = openai_config.get('base_url')
+    if not api_key and base_url:
+        api_key = "local"
+    
     if not api_key:
         logging.error("OpenAI API key not found in config. Please add your API key to config/config.yaml")
         return None
@@ -84,8 +91,8 @@ def initialize_openai_client(config: Dict) -> OpenAI:
     
     try:
         logging.info("Creating OpenAI client...")
-        client = OpenAI(api_key=api_key)
-        logging.info("OpenAI client created successfully")
+        client = OpenAI(api_key=api_key, base_url=base_url or None)
+        logging.info(f"OpenAI client created successfully{f' for {base_url}' if base_url else ''}")
         return client
     except Exception as e:
         logging.error(f"Error initializing OpenAI client: {e}")
@@ -94,8 +101,9 @@ def initialize_openai_client(config: Dict) -> OpenAI:
         logging.error(f"Traceback: {traceback.format_exc()}")
         return None
 
-def generate_script_with_openai(client: OpenAI, prompt: str, config: Dict) -> str:
-    """Generate a script for a slide using the OpenAI API."""
+def generate_script_with_openai(client: OpenAI, prompt: str, config: Dict,
+                                limiter: Optional[RateLimiter] = None) -> str:
+    """Generate a script for a slide using the OpenAI API, within the limits of `limiter` if given."""
     openai_config = config.get('openai', {})
     model = openai_config.get('model', 'gpt-4o')
     temperature = openai_config.get('temperature', 0.7)
@@ -110,7 +118,8 @@ def generate_script_with_openai(client: OpenAI, prompt: str, config: Dict) -> st
     
     try:
         logging.info("Sending request to OpenAI API...")
-        response = client.chat.completions.create(
+        script = cached_completion_text(
+            client, limiter, config,
             model=model,
             messages=[
                 {"role": "system", "content": "You are an expert educational content creator who specializes in creating clear, concise narration scripts for educational videos. You explain complex concepts in an accessible way, with special attention to mathematical formulas."},
@@ -118,10 +127,9 @@ def generate_script_with_openai(client: OpenAI, prompt: str, config: Dict) -> st
             ],
             temperature=temperature,
             max_tokens=max_tokens
-        )
+        ).strip()
         
         logging.info("Response received from OpenAI API")
-        script = response.choices[0].message.content.strip()
         logging.info(f"Script generated successfully (length: {len(script)} characters)")
         return script
     except Exception as e:
@@ -132,30 +140,28 @@ def generate_script_with_openai(client: OpenAI, prompt: str, config: Dict) -> st
         return ""
 
 def generate_all_scripts(slides: List[Slide], client: OpenAI, config: Dict) -> List[str]:
-    """Generate scripts for all slides using the OpenAI API."""
-    scripts = []
+    """Generate scripts for all slides concurrently using the OpenAI API, in slide order."""
+    limiter = rate_limiter_from_config(config)
     
-    for i, slide in enumerate(slides):
+    def generate(i: int) -> str:
+        slide = slides[i]
         logging.info(f"Generating script for slide {i+1}/{len(slides)}: {slide.title}")
         
         # Format the slide content for ChatGPT
         prompt = format_slide_for_chatgpt(slide)
         
         # Generate script with OpenAI
-        script = generate_script_with_openai(client, prompt, config)
+        script = generate_script_with_openai(client, prompt, config, limiter)
         
         if script:
-            scripts.append(script)
             logging.info(f"Successfully generated script for slide {i+1}")
-        else:
-            logging.error(f"Failed to generate script for slide {i+1}")
-            # Add a placeholder script to maintain alignment with slides
-            scripts.append(f"Script for slide {i+1} could not be generated.")
-        
-        # Add a small delay to avoid rate limiting
-        time.sleep(1)
+            return script
+        logging.error(f"Failed to generate script for slide {i+1}")
+        # Add a placeholder script to maintain alignment with slides
+        return f"Script for slide {i+1} could not be generated."
     
-    return scripts
+    concurrency = config.get('openai', {}).get('concurrency', DEFAULT_CONCURRENCY)
+    return map_in_order(generate, list(range(len(slides))), concurrency)
 
 def save_scripts_to_files(scripts: List[str], output_dir: str) -> List[str]:
     """Save generated scripts to files."""
@@ -179,6 +185,7 @@ def main():
     parser = argparse.ArgumentParser(description="Generate narration scripts for slides using the OpenAI API.")
     parser.add_argument("latex_file", help="Path to the input LaTeX (.tex) file.")
     parser.add_argument("-c", "--config", default="config/config.yaml", help="Path to the configuration YAML file.")
+    parser.add_argument("--reroll", action="store_true", help="Ask the model again even for slides with a cached response.")
     parser.add_argument("-o", "--output", default="output/chatgpt_responses", help="Path to the directory to save the generated scripts.")
     
     args = parser.parse_args()
@@ -200,6 +207,9 @@ def main():
     if not config:
         logging.error("Failed to load configuration. Exiting.")
         return
+    if args.reroll:
+        config.setdefault('openai', {})['reroll'] = True
+    configure_llm_cache(config)
     
     # Initialize OpenAI client
     client = initialize_openai_client(config)
@@ -223,6 +233,7 @@ def main():
     file_paths = save_scripts_to_files(scripts, output_dir)
     
     logging.info(f"Successfully generated and saved {len(file_paths)} scripts.")
+    log_run_report()
     print(f"\nScripts generated and saved to {output_dir}")
     print("\nYou can now run the following command to generate the video:")
     print(f"python -m src.use_chatgpt_scripts {latex_path}")
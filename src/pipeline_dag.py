@@ -0,0 +1,127 @@
+import time
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(Exception):
+    """Raised by a stage that cannot produce its result; stages depending on it are skipped."""
+
+
+class _Task:
+    def __init__(self, name: str, func: Callable, deps: Sequence[str]):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class TaskGraph:
+    """
+    Runs named stages as soon as the stages they depend on have finished, independent
+    stages in parallel threads. A stage is called with the results of its dependencies,
+    in the order they were declared, and its return value is its result.
+
+        graph = TaskGraph()
+        graph.add('parse', lambda: parse_latex_file(path))
+        graph.add('images', lambda slides: generate_slide_images(path, slides, config), ['parse'])
+        results = graph.run()
+    """
+
+    def __init__(self, max_workers: int = 4, executor: Optional[Executor] = None):
+        self.max_workers = max_workers
+        # A pool shared with other graphs, e.g. the pipelines of several decks; left running after run()
+        self.executor = executor
+        self.tasks: Dict[str, _Task] = {}
+        self.results: Dict[str, Any] = {}
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def add(self, name: str, func: Callable, deps: Sequence[str] = ()):
+        for dep in deps:
+            if dep not in self.tasks:
+                # Requiring dependencies first also rules out cycles
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.tasks[name] = _Task(name, func, deps)
+
+    def _run_task(self, task: _Task):
+        task.started = time.monotonic()
+        logger.info(f"[PIPELINE] Stage '{task.name}' started")
+        try:
+            return task.func(*[self.results[dep] for dep in task.deps])
+        finally:
+            task.finished = time.monotonic()
+            logger.info(f"[PIPELINE] Stage '{task.name}' finished in {task.duration:.1f}s")
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Run every stage and return their results by name. If a stage raises, no new
+        stage is started, running ones are allowed to finish, and the error is re-raised.
+        """
+        self.started = time.monotonic()
+        pending = dict(self.tasks)
+        running = {}
+        error: Optional[BaseException] = None
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                if error is None:
+                    ready = [task for task in pending.values() if all(dep in self.results for dep in task.deps)]
+                    for task in ready:
+                        del pending[task.name]
+                        running[executor.submit(self._run_task, task)] = task
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        self.results[task.name] = future.result()
+                    except BaseException as e:
+                        if error is None:
+                            error = e
+                            skipped = ', '.join(pending) or 'none'
+                            logger.error(f"[PIPELINE] Stage '{task.name}' failed: {e}. Skipping stages: {skipped}")
+        finally:
+            if executor is not self.executor:
+                executor.shutdown(wait=True)
+        self.finished = time.monotonic()
+        if error is not None:
+            raise error
+        return self.results
+
+    def critical_path(self) -> List[_Task]:
+        """
+        The chain of stages that determined the run time: from the stage that finished
+        last, back through the dependency that finished last at each step.
+        """
+        finished = [task for task in self.tasks.values() if task.finished is not None]
+        if not finished:
+            return []
+        path = [max(finished, key=lambda task: task.finished)]
+        while True:
+            deps = [self.tasks[dep] for dep in path[-1].deps if self.tasks[dep].finished is not None]
+            if not deps:
+                break
+            path.append(max(deps, key=lambda task: task.finished))
+        return list(reversed(path))
+
+    def report(self) -> str:
+        path = self.critical_path()
+        if not path or self.started is None or self.finished is None:
+            return "Pipeline: no stage ran"
+        wall = self.finished - self.started
+        busy = sum(task.duration for task in self.tasks.values())
+        chain = ' -> '.join(f"{task.name} {task.duration:.1f}s" for task in path)
+        return (f"Pipeline: {wall:.1f}s wall for {busy:.1f}s of stage work "
+                f"({busy / wall if wall else 1.0:.1f}x overlap); critical path: {chain}")
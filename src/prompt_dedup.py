@@ -0,0 +1,74 @@
+import re
+import logging
+from typing import Dict, List
+
+from src.latex_parser import Slide
+from src.narration_generator import generate_narration_for_slide
+from src.run_report import register_report_source
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Position and neighbour titles differ between otherwise identical slides
+# (e.g. the outline frame repeated before every section), so they are left out of the key
+SEQUENCE_BLOCK = re.compile(r'^## Informação de Sequência\n(?:- .*\n)*', re.MULTILINE)
+
+
+def is_trivial_slide(slide: Slide) -> bool:
+    """Outline and section slides, whose narration follows a fixed template."""
+    return (slide.title in ("Outline", "Agenda")
+            or slide.title.startswith("Section:") or slide.title.startswith("Seção:"))
+
+
+def normalized_prompt(prompt_data: Dict) -> str:
+    """Prompt text without the slide's position in the deck, with whitespace collapsed."""
+    text = SEQUENCE_BLOCK.sub('', prompt_data["prompt"])
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class ScriptPlan:
+    """
+    Which slides need a script from the model. Trivial slides get the local template
+    narration of narration_generator, and slides whose normalized prompts are identical
+    share one request; `requests` holds one prompt per remaining group.
+    """
+
+    def __init__(self, slides: List[Slide], prompts: List[Dict], config: Dict):
+        openai_config = config.get('openai', {})
+        use_templates = openai_config.get('template_trivial_slides', True)
+        dedupe = openai_config.get('dedupe_prompts', True)
+
+        self.requests: List[Dict] = []
+        self.templates: Dict[int, str] = {}
+        # Slide position -> index in self.requests
+        self.request_index: Dict[int, int] = {}
+        groups: Dict[str, int] = {}
+        for i, (slide, prompt_data) in enumerate(zip(slides, prompts)):
+            if use_templates and is_trivial_slide(slide):
+                self.templates[i] = generate_narration_for_slide(slide, config)
+                continue
+            key = normalized_prompt(prompt_data)
+            if dedupe and key in groups:
+                self.request_index[i] = groups[key]
+                continue
+            groups[key] = len(self.requests)
+            self.request_index[i] = len(self.requests)
+            self.requests.append(prompt_data)
+        self.slide_count = len(prompts)
+        self.duplicates = self.slide_count - len(self.templates) - len(self.requests)
+        logger.info(self.report())
+
+    def expand(self, request_scripts: List[str]) -> List[str]:
+        """Raw script of every slide, in order, from the scripts of self.requests."""
+        return [self.templates[i] if i in self.templates else request_scripts[self.request_index[i]]
+                for i in range(self.slide_count)]
+
+    def report(self) -> str:
+        return (f"Script requests: {len(self.requests)} for {self.slide_count} slides "
+                f"({len(self.templates)} from templates, {self.duplicates} duplicates)")
+
+
+def plan_script_requests(slides: List[Slide], prompts: List[Dict], config: Dict) -> ScriptPlan:
+    plan = ScriptPlan(slides, prompts, config)
+    register_report_source('script_requests', plan.report)
+    return plan
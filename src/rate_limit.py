@@ -0,0 +1,201 @@
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+import openai
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Defaults match a low OpenAI usage tier for gpt-4o; raise them in config for higher tiers
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 30000
+DEFAULT_MAX_RATE_LIMIT_RETRIES = 5
+# Backoff for server errors and dropped connections, which only the failing worker waits out
+TRANSIENT_RETRY_BASE_DELAY = 0.5
+TRANSIENT_RETRY_MAX_DELAY = 8.0
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+# Rough characters-per-token ratio used to budget prompts before sending them
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity` tokens, refilled at `rate` tokens per second."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float) -> float:
+        """Take `amount` tokens if available. Returns 0 on success, otherwise the seconds to wait."""
+        # A request larger than the whole bucket could never be served, so cap it
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def acquire(self, amount: float = 1):
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Requests/minute and tokens/minute limits for one API account, shared by all the
+    worker threads talking to it. A 429 from the server pauses every worker until the
+    Retry-After time has passed, instead of letting them all hammer the API.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries: int = DEFAULT_MAX_RATE_LIMIT_RETRIES):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.max_retries = max_retries
+        self.rate_limited = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.rate_limited += 1
+
+    def acquire(self, tokens: int):
+        while True:
+            with self._lock:
+                paused_for = self._paused_until - time.monotonic()
+            if paused_for > 0:
+                time.sleep(paused_for)
+                continue
+            self.requests.acquire(1)
+            self.tokens.acquire(tokens)
+            return
+
+    def call(self, fn: Callable[[], R], tokens: int) -> R:
+        """
+        Run `fn` once budget is available, retrying it after the server's Retry-After on
+        429s and with exponential backoff on 5xx errors, timeouts and dropped connections
+        (the SDK's own retries are off, see create_chat_completion).
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens)
+            try:
+                return fn()
+            except openai.RateLimitError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = retry_after_seconds(e, default=2 ** attempt)
+                logger.warning(f"Rate limited by the API, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                self.pause(delay)
+            except TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(TRANSIENT_RETRY_BASE_DELAY * 2 ** attempt, TRANSIENT_RETRY_MAX_DELAY)
+                logger.warning(f"API request failed ({e}), retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+
+def retry_after_seconds(error: Exception, default: float) -> float:
+    """Seconds to wait before retrying, from the Retry-After headers of an API error response."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        retry_after = headers.get('retry-after')
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                # HTTP-date form
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return default
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """Upper-bound token estimate for a chat completion, used to charge the tokens/minute bucket."""
+    prompt_chars = sum(len(message.get('content') or '') for message in messages)
+    return prompt_chars // CHARS_PER_TOKEN + max_tokens
+
+
+# One limiter per API account while shared (see share_rate_limiters); None = one per caller
+_shared_limiters: Optional[Dict[str, RateLimiter]] = None
+_shared_limiters_lock = threading.Lock()
+
+
+def share_rate_limiters(enabled: bool = True):
+    """
+    Make rate_limiter_from_config return the same limiter for every config naming the
+    same account, so work on several decks in one process stays within one quota.
+    """
+    global _shared_limiters
+    with _shared_limiters_lock:
+        _shared_limiters = {} if enabled else None
+
+
+def _account(openai_config: Dict) -> str:
+    api_key = openai_config.get('api_key') or ''
+    key_digest = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12] if api_key else ''
+    return f"{openai_config.get('base_url') or ''}:{key_digest}"
+
+
+def rate_limiter_from_config(config: Dict) -> RateLimiter:
+    openai_config = config.get('openai', {})
+    with _shared_limiters_lock:
+        if _shared_limiters is not None and _account(openai_config) in _shared_limiters:
+            return _shared_limiters[_account(openai_config)]
+        limiter = RateLimiter(
+            requests_per_minute=openai_config.get('requests_per_minute', DEFAULT_REQUESTS_PER_MINUTE),
+            tokens_per_minute=openai_config.get('tokens_per_minute', DEFAULT_TOKENS_PER_MINUTE),
+            max_retries=openai_config.get('max_rate_limit_retries', DEFAULT_MAX_RATE_LIMIT_RETRIES),
+        )
+        if _shared_limiters is not None:
+            _shared_limiters[_account(openai_config)] = limiter
+        return limiter
+
+
+def map_in_order(fn: Callable[[T], R], items: Sequence[T], concurrency: int) -> List[R]:
+    """Apply `fn` to every item on a thread pool and return the results in item order."""
+    if concurrency <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        return list(executor.map(fn, items))
+
+
+def create_chat_completion(client, limiter: Optional[RateLimiter], **request):
+    """
+    client.chat.completions.create, charged against `limiter` when one is given.
+    The SDK's own retries are disabled in that case so 429s reach the shared limiter,
+    which also retries server and connection errors.
+    """
+    if limiter is None:
+        return client.chat.completions.create(**request)
+    tokens = estimate_tokens(request.get('messages', []), request.get('max_tokens') or 0)
+    unretried = client.with_options(max_retries=0)
+    return limiter.call(lambda: unretried.chat.completions.create(**request), tokens)
@@ -0,0 +1,139 @@
+import json
+import logging
+from typing import Dict, List, Optional
+
+from src.automated_video_generation import (
+    EMPTY_SLIDE_INSTRUCTIONS, is_empty_slide_prompt, script_system_message,
+    generate_script_with_openai, finalize_script,
+)
+from src.llm_cache import cached_completion_text
+from src.rate_limit import RateLimiter, map_in_order, CHARS_PER_TOKEN, DEFAULT_CONCURRENCY
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Input plus expected output tokens allowed in one packed request
+DEFAULT_PACK_TOKEN_BUDGET = 6000
+# Typical length of one narration script, used to budget the output of a pack
+EXPECTED_SCRIPT_TOKENS = 400
+# Upper bound on completion tokens the model can return for one request
+MAX_PACK_OUTPUT_TOKENS = 16384
+
+PACK_INSTRUCTIONS = (
+    "You will receive several consecutive slides of the same presentation, each introduced by a "
+    "'### Slide N' header. Write one narration script per slide, following the instructions given "
+    "in each slide. Answer only with a JSON object of the form "
+    "{\"scripts\": [{\"slide_number\": N, \"script\": \"...\"}]}, with exactly one entry per slide, in order."
+)
+
+
+def slide_cost(prompt_data: Dict) -> int:
+    """Estimated tokens a slide adds to a packed request: its prompt plus its script."""
+    return len(prompt_data["prompt"]) // CHARS_PER_TOKEN + EXPECTED_SCRIPT_TOKENS
+
+
+def plan_packs(prompts: List[Dict], token_budget: int, max_tokens_per_slide: int) -> List[List[Dict]]:
+    """
+    Group consecutive slides into packs that fit the token budget. Short slides
+    (sections, transitions) end up packed together; a long slide may get a pack of its own.
+    """
+    max_pack_size = max(1, MAX_PACK_OUTPUT_TOKENS // max(1, max_tokens_per_slide))
+    packs = []
+    current: List[Dict] = []
+    current_cost = 0
+    for prompt_data in prompts:
+        cost = slide_cost(prompt_data)
+        if current and (current_cost + cost > token_budget or len(current) >= max_pack_size):
+            packs.append(current)
+            current, current_cost = [], 0
+        current.append(prompt_data)
+        current_cost += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_packed_request(pack: List[Dict], config: Dict) -> Dict:
+    openai_config = config.get('openai', {})
+    # Fixed for every pack, so packed requests share a cacheable prefix too
+    system_message = script_system_message(pack[0]) + "\n\n" + PACK_INSTRUCTIONS
+    sections = []
+    for p in pack:
+        section = f"### Slide {p['slide_number']}\n\n{p['prompt']}"
+        if is_empty_slide_prompt(p["prompt"]):
+            section += "\n\n" + EMPTY_SLIDE_INSTRUCTIONS
+        sections.append(section)
+    if pack[0].get('context'):
+        sections.insert(0, pack[0]['context'])
+    user_message = "\n\n".join(sections)
+    max_tokens = min(MAX_PACK_OUTPUT_TOKENS, openai_config.get('max_tokens', 1000) * len(pack))
+    return {
+        "model": openai_config.get('model', 'gpt-4o'),
+        "messages": [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message},
+        ],
+        "temperature": openai_config.get('temperature', 0.7),
+        "max_tokens": max_tokens,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def parse_packed_response(text: str, pack: List[Dict]) -> Optional[Dict[int, str]]:
+    """Scripts keyed by slide number, or None unless every slide of the pack got a non-empty script."""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    entries = data.get("scripts") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return None
+    scripts = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return None
+        try:
+            slide_number = int(entry.get("slide_number"))
+        except (TypeError, ValueError):
+            return None
+        script = entry.get("script")
+        if isinstance(script, str) and script.strip():
+            scripts[slide_number] = script
+    if any(p["slide_number"] not in scripts for p in pack):
+        return None
+    return scripts
+
+
+def generate_packed_scripts(prompts: List[Dict], client, config: Dict,
+                            limiter: Optional[RateLimiter] = None) -> List[str]:
+    """
+    Raw scripts for all prompts, in order, asking for several consecutive slides per
+    request. A pack whose answer cannot be parsed is retried one slide per request.
+    """
+    openai_config = config.get('openai', {})
+    packs = plan_packs(prompts, openai_config.get('pack_token_budget', DEFAULT_PACK_TOKEN_BUDGET),
+                       openai_config.get('max_tokens', 1000))
+    logger.info(f"Packed {len(prompts)} slides into {len(packs)} requests")
+
+    def per_slide(pack: List[Dict]) -> List[str]:
+        return [generate_script_with_openai(client, p, config, limiter) for p in pack]
+
+    def generate_pack(pack: List[Dict]) -> List[str]:
+        if len(pack) == 1:
+            return per_slide(pack)
+        numbers = [p["slide_number"] for p in pack]
+        try:
+            answer = cached_completion_text(client, limiter, config,
+                                            validate=lambda text: parse_packed_response(text, pack) is not None,
+                                            **build_packed_request(pack, config))
+        except Exception as e:
+            logger.warning(f"Packed request for slides {numbers} failed ({e}); generating them one by one")
+            return per_slide(pack)
+        scripts = parse_packed_response(answer, pack)
+        if scripts is None:
+            logger.warning(f"Could not parse the packed answer for slides {numbers}; generating them one by one")
+            return per_slide(pack)
+        return [finalize_script(scripts[p["slide_number"]], p) for p in pack]
+
+    concurrency = openai_config.get('concurrency', DEFAULT_CONCURRENCY)
+    return [script for pack_scripts in map_in_order(generate_pack, packs, concurrency) for script in pack_scripts]
@@ -0,0 +1,36 @@
+import logging
+from typing import Callable, Dict, List, Optional
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Named callables returning one summary line each, printed at the end of a run
+_report_sources: Dict[str, Callable[[], str]] = {}
+
+
+def register_report_source(name: str, source: Optional[Callable[[], str]]):
+    """Add (or with None, remove) a line to the end-of-run report."""
+    if source is None:
+        _report_sources.pop(name, None)
+    else:
+        _report_sources[name] = source
+
+
+def run_report_lines() -> List[str]:
+    lines = []
+    for name, source in _report_sources.items():
+        try:
+            lines.append(source())
+        except Exception as e:
+            lines.append(f"{name}: report unavailable ({e})")
+    return lines
+
+
+def log_run_report():
+    """Log the statistics collected by caches and schedulers during this run."""
+    lines = run_report_lines()
+    if not lines:
+        return
+    logger.info("--- Run Report ---")
+    for line in lines:
+        logger.info(line)
@@ -0,0 +1,212 @@
+import os
+import time
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional
+
+from src.simple_video_assembler import (prepare_slide_image, encode_slide_segment, mux_segments, audio_duration,
+                                        segment_frame_counts, build_narration_track)
+from src.build_manifest import BuildManifest, file_digest
+from src.content_cache import content_key
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_WORKERS = 2
+# Seconds between rewrites of the preview, which is rebuilt from every finished segment
+DEFAULT_PREVIEW_INTERVAL = 15.0
+
+
+class SegmentStreamer:
+    """
+    Encodes each slide's video-only segment as soon as its image exists and the audio
+    of it and every slide before it is known, instead of after every slide has
+    finished every stage. Frame counts come from the running timestamp of the joined
+    narration (segment_frame_counts), so slides stay in sync however many there are.
+    Progress and an ETA are logged per slide, and preview.mp4 in the output directory
+    holds the longest run of finished slides from the start. finish() only has to wait
+    for the last segments, join them without re-encoding and add the narration, which
+    is encoded once for the deck as in assemble_video.
+
+    With a manifest every finished segment is recorded as a checkpoint, and with
+    `reuse` a segment recorded for the same image, frame count and video settings is
+    kept instead of encoded again.
+    """
+
+    def __init__(self, config: Dict, max_workers: Optional[int] = None,
+                 manifest: Optional[BuildManifest] = None, reuse: bool = False):
+        self.config = config
+        self.manifest = manifest
+        self.reuse = reuse
+        pipeline_config = config.get('pipeline', {})
+        video_config = config.get('video', {})
+        self.output_dir = os.path.abspath(config.get('output_dir', 'output'))
+        self.segments_dir = os.path.join(self.output_dir, 'segments')
+        os.makedirs(self.segments_dir, exist_ok=True)
+        self.preview_path = os.path.join(self.output_dir, 'preview.mp4')
+        self.preview_interval = pipeline_config.get('preview_interval', DEFAULT_PREVIEW_INTERVAL)
+        self.fps = video_config.get('fps', 30)
+        self.width, self.height = map(int, video_config.get('resolution', '1920x1080').split('x'))
+        bg_color = video_config.get('background_color', '#FFFFFF')
+        self.bg_color_rgb = tuple(int(bg_color[i:i + 2], 16) for i in (1, 3, 5))
+
+        self.total: Optional[int] = None
+        self.images: Dict[int, str] = {}
+        self.audio: Dict[int, str] = {}
+        self.durations: Dict[int, float] = {}
+        self.segments: Dict[int, str] = {}
+        self.failed: Dict[int, str] = {}
+        self.futures: Dict[int, Future] = {}
+        self.started = time.monotonic()
+        self.last_preview = 0.0
+        self.preview_slides = 0
+        self._lock = threading.Lock()
+        self._preview_lock = threading.Lock()
+        workers = max_workers or pipeline_config.get('segment_workers', DEFAULT_SEGMENT_WORKERS)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def set_images(self, image_paths: List[str]):
+        """Slide images in order; their count is the number of slides in the video."""
+        with self._lock:
+            self.total = len(image_paths)
+            self.images.update(enumerate(image_paths))
+        self._submit_ready()
+
+    def audio_ready(self, index: int, audio_path: str):
+        """Callback for generate_all_audio: slide `index` (0-based) has its audio."""
+        try:
+            duration = audio_duration(audio_path)
+        except Exception as e:
+            logger.error(f"[STREAM] Could not read the duration of {audio_path}: {e}")
+            with self._lock:
+                self.failed[index] = str(e)
+            return
+        with self._lock:
+            self.audio[index] = audio_path
+            self.durations[index] = duration
+        self._submit_ready()
+
+    def _submit_ready(self):
+        """Submit every slide whose image is known and whose start and end times are."""
+        with self._lock:
+            known = 0
+            while known in self.durations:
+                known += 1
+            frame_counts = segment_frame_counts([self.durations[index] for index in range(known)], self.fps)
+            for index, frame_count in enumerate(frame_counts):
+                if index not in self.futures and index in self.images:
+                    self.futures[index] = self.executor.submit(self._encode, index, frame_count)
+
+    def _encode(self, index: int, frame_count: int):
+        processed_path = os.path.join(self.segments_dir, f"slide_{index + 1:03d}.png")
+        segment_path = os.path.join(self.segments_dir, f"segment_{index + 1:03d}.mp4")
+        node = f'segment/{index}'
+        try:
+            segment_key = None
+            if self.manifest:
+                segment_key = content_key('segment', file_digest(self.images[index]), frame_count,
+                                          self.config.get('video', {}))
+            if self.reuse and segment_key and self.manifest.is_fresh(node, segment_key):
+                segment_path = self.manifest.outputs(node)[0]
+                self.manifest.reuse(node)
+            else:
+                prepare_slide_image(self.images[index], processed_path, self.width, self.height, self.bg_color_rgb)
+                encode_slide_segment(processed_path, frame_count, segment_path, self.config)
+                if segment_key:
+                    self.manifest.record(node, segment_key, [segment_path])
+        except Exception as e:
+            logger.error(f"[STREAM] Segment of slide {index + 1} failed: {e}")
+            with self._lock:
+                self.failed[index] = str(e)
+            return
+        with self._lock:
+            self.segments[index] = segment_path
+        logger.info(f"[STREAM] {self.progress(index)}")
+        self._update_preview()
+
+    def progress(self, index: Optional[int] = None) -> str:
+        """One line with segments done, elapsed time and the estimated time left."""
+        with self._lock:
+            done = len(self.segments)
+            total = self.total
+        elapsed = time.monotonic() - self.started
+        prefix = f"Slide {index + 1} ready: " if index is not None else ""
+        if not total:
+            return f"{prefix}{done} segments done after {elapsed:.1f}s"
+        remaining = max(total - done, 0)
+        eta = elapsed / done * remaining if done else float('nan')
+        return (f"{prefix}{done}/{total} segments ({100 * done / total:.0f}%), "
+                f"{elapsed:.1f}s elapsed, ETA {eta:.0f}s")
+
+    def _finished_prefix(self) -> int:
+        with self._lock:
+            count = 0
+            while count in self.segments:
+                count += 1
+            return count
+
+    def _mux(self, slide_count: int, output_path: str) -> str:
+        """The segments of the first slide_count slides with their narration, encoded once."""
+        with self._lock:
+            segments = [self.segments[index] for index in range(slide_count)]
+            audio_files = [self.audio[index] for index in range(slide_count)]
+        with tempfile.TemporaryDirectory(dir=self.segments_dir) as temp_dir:
+            narration_path, audio_codec_args = build_narration_track(audio_files, temp_dir, self.config)
+            return mux_segments(segments, narration_path, audio_codec_args, output_path)
+
+    def _update_preview(self, force: bool = False):
+        # Only one rebuild at a time; a skipped one is covered by the next slide or by finish()
+        if not self._preview_lock.acquire(blocking=False):
+            return
+        try:
+            prefix = self._finished_prefix()
+            if prefix <= self.preview_slides:
+                return
+            if not force and time.monotonic() - self.last_preview < self.preview_interval:
+                return
+            self._mux(prefix, self.preview_path)
+            self.last_preview = time.monotonic()
+            self.preview_slides = prefix
+            logger.info(f"[STREAM] Preview with slides 1-{prefix} at {self.preview_path}")
+        except Exception as e:
+            logger.warning(f"[STREAM] Could not update preview: {e}")
+        finally:
+            self._preview_lock.release()
+
+    def finish(self, slide_count: int) -> str:
+        """
+        Wait for the segments of the first slide_count slides, join them into the final
+        video and add their narration; returns its path, or "" if a slide has no segment.
+        """
+        with self._lock:
+            futures = list(self.futures.values())
+        for future in futures:
+            future.result()
+        self.executor.shutdown(wait=True)
+        missing = [index + 1 for index in range(slide_count) if index not in self.segments]
+        if missing:
+            logger.error(f"[STREAM] No segment for slides {missing}; cannot assemble the video.")
+            return ""
+        output_filename = self.config.get('video', {}).get('output_filename', 'final_video.mp4')
+        output_path = os.path.join(self.output_dir, output_filename)
+        try:
+            self._mux(slide_count, output_path)
+        except Exception as e:
+            logger.error(f"[STREAM] Error assembling the video from its segments: {e}")
+            return ""
+        if os.path.exists(self.preview_path):
+            os.remove(self.preview_path)
+        logger.info(f"[STREAM] Video assembled from {slide_count} segments: {output_path}")
+        return output_path
+
+    def close(self, cancel: bool = False):
+        """
+        Wait for the segments already submitted, which are checkpoints for a resumed run
+        even if another stage failed; with `cancel` those not started yet are dropped.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+
+    def report(self) -> str:
+        return f"Segment streaming: {self.progress()}, {len(self.failed)} failed"
@@ -0,0 +1,47 @@
+import re
+from typing import List
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_BOUNDARY = re.compile(r'[.!?…]+["\')\]]*\s+')
+# Very short sentences are merged with the next one so TTS is not called for every "Sim."
+MIN_SENTENCE_CHARS = 40
+
+
+def _math_is_balanced(text: str) -> bool:
+    """True if no math span is left open, so a sentence never ends inside a formula."""
+    if text.count('\\(') != text.count('\\)') or text.count('\\[') != text.count('\\]'):
+        return False
+    return len(re.findall(r'(?<!\\)\$', text)) % 2 == 0
+
+
+class SentenceSplitter:
+    """Cuts a stream of text deltas into complete sentences as soon as they end."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ''
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return the sentences it completed."""
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()]
+            if len(candidate.strip()) < self.min_chars or not _math_is_balanced(candidate):
+                continue
+            sentences.append(candidate.strip())
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever is left once the stream has ended."""
+        rest = self.buffer.strip()
+        self.buffer = ''
+        return [rest] if rest else []
+
+
+def split_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS) -> List[str]:
+    splitter = SentenceSplitter(min_chars)
+    return splitter.feed(text) + splitter.flush()
@@ -3,10 +3,13 @@ import os
 import logging
 import subprocess
 import tempfile
-from typing import List, Dict
+from typing import List, Dict, Optional
 import yaml
 import re
 
+from src.audio_utils import concatenate_mp3, mp3_duration, mp3_stream_format
+from src.atomic_write import atomic_output
+
 # Try to import natsort, but provide a fallback if it's not available
 try:
     from natsort import natsorted
@@ -42,6 +45,154 @@ def load_config(config_path: str = '../config/config.yaml') -> Dict:
         logging.error(f"Error parsing configuration file {config_path}: {e}")
         return {}
 
+def prepare_slide_image(img_path: str, processed_path: str, width: int, height: int, bg_color_rgb: tuple) -> str:
+    """Scale a slide image into a width x height frame of the background colour, centred."""
+    try:
+        # Open and convert to RGB
+        img = Image.open(img_path).convert('RGB')
+        
+        # Calculate scaling to maintain aspect ratio
+        img_width, img_height = img.size
+        ratio = min(width/img_width, height/img_height)
+        new_size = (int(img_width*ratio), int(img_height*ratio))
+        
+        # Resize image
+        img = img.resize(new_size, Image.LANCZOS)
+        
+        # Create a new image with background color
+        new_img = Image.new('RGB', (width, height), bg_color_rgb)
+        
+        # Paste the resized image in the center
+        x_offset = (width - new_size[0]) // 2
+        y_offset = (height - new_size[1]) // 2
+        new_img.paste(img, (x_offset, y_offset))
+        
+        # Save processed image
+        with atomic_output(processed_path) as temp_path:
+            new_img.save(temp_path)
+    except Exception as e:
+        logging.error(f"Error processing image {img_path}: {e}")
+        # Create a fallback solid color image
+        fallback = Image.new('RGB', (width, height), bg_color_rgb)
+        with atomic_output(processed_path) as temp_path:
+            fallback.save(temp_path)
+        logging.info(f"Created fallback image for {os.path.basename(img_path)}")
+    return processed_path
+
+
+def encode_slide_segment(img_path: str, frame_count: int, segment_path: str, config: Dict) -> str:
+    """
+    One slide's video-only segment of frame_count frames (see segment_frame_counts).
+    The narration is added once for the whole deck by mux_segments.
+    """
+    fps = config.get('video', {}).get('fps', 30)
+    cmd = [
+        'ffmpeg', '-y',
+        '-loop', '1',
+        '-framerate', str(fps),
+        '-i', img_path,
+        '-frames:v', str(frame_count),
+        '-c:v', 'libx264',
+        '-tune', 'stillimage',
+        '-pix_fmt', 'yuv420p',
+        '-an',
+    ]
+    with atomic_output(segment_path) as temp_path:
+        subprocess.run(cmd + [temp_path], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return segment_path
+
+
+def mux_segments(segment_paths: List[str], narration_path: str, audio_codec_args: List[str], output_path: str) -> str:
+    """
+    Join video-only segments without re-encoding them and add the narration track from
+    build_narration_track (replacing output_path atomically).
+    """
+    list_path = f"{os.path.splitext(output_path)[0]}.segments.txt"
+    with open(list_path, 'w') as f:
+        for segment in segment_paths:
+            f.write(f"file '{segment}'\n")
+    try:
+        cmd = [
+            'ffmpeg', '-y',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', list_path,
+            '-i', narration_path,
+            '-map', '0:v',
+            '-map', '1:a',
+            '-c:v', 'copy',
+            *audio_codec_args,
+        ]
+        with atomic_output(output_path) as temp_path:
+            subprocess.run(cmd + [temp_path], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def audio_duration(audio_path: str) -> float:
+    """Length of an audio file in seconds: from the frame headers for MP3, else from ffprobe."""
+    duration = mp3_duration(audio_path)
+    if duration > 0:
+        return duration
+    result = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                             '-of', 'default=noprint_wrappers=1:nokey=1', audio_path],
+                            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return float(result.stdout.decode().strip())
+
+
+def segment_frame_counts(durations: List[float], fps: float) -> List[int]:
+    """
+    Video frames of each slide so that slide i starts on the frame nearest to where its
+    audio starts in the joined narration; rounding never accumulates into drift.
+    """
+    counts = []
+    elapsed = 0.0
+    for duration in durations:
+        start_frame = round(elapsed * fps)
+        elapsed += duration
+        counts.append(max(1, round(elapsed * fps) - start_frame))
+    return counts
+
+
+def build_narration_track(audio_files: List[str], temp_dir: str, config: Dict) -> Optional[tuple]:
+    """
+    The narration of the whole deck as one file, encoded at most once, and the ffmpeg
+    audio codec arguments for muxing it: (path, codec_args).
+
+    MP3s that share sample rate and channels are joined frame by frame without decoding.
+    With video.audio_codec "copy" that file goes into the MP4 untouched, so the TTS
+    encode is the only lossy one; with "aac" (default) it is encoded once per deck.
+    Other inputs are resampled to one format and encoded once with the concat filter.
+    """
+    video_config = config.get('video', {})
+    codec = video_config.get('audio_codec', 'aac')
+    bitrate = video_config.get('audio_bitrate', '192k')
+    formats = {mp3_stream_format(path) for path in audio_files}
+    if None not in formats and len(formats) == 1:
+        narration_path = concatenate_mp3(audio_files, os.path.join(temp_dir, "narration.mp3"))
+        if codec == 'copy':
+            logging.info("Narration MP3s share one format, stream-copying them into the video")
+            return narration_path, ['-c:a', 'copy']
+        return narration_path, ['-c:a', 'aac', '-b:a', bitrate]
+
+    # Mixed formats (e.g. cached clips of another provider): one resample and encode for the deck
+    if codec == 'copy':
+        logging.warning(f"Narration files differ in format ({formats}), encoding them once to AAC instead of copying")
+    sample_rate = video_config.get('audio_sample_rate', 44100)
+    narration_path = os.path.join(temp_dir, "narration.m4a")
+    cmd = ['ffmpeg', '-y']
+    for audio_path in audio_files:
+        cmd += ['-i', audio_path]
+    resampled = ''.join(f"[{i}:a]aresample={sample_rate},aformat=channel_layouts=stereo[a{i}];"
+                        for i in range(len(audio_files)))
+    joined = ''.join(f"[a{i}]" for i in range(len(audio_files)))
+    cmd += ['-filter_complex', f"{resampled}{joined}concat=n={len(audio_files)}:v=0:a=1[out]",
+            '-map', '[out]', '-c:a', 'aac', '-b:a', bitrate, narration_path]
+    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return narration_path, ['-c:a', 'copy']
+
+
 def assemble_video(image_files: List[str], audio_files: List[str], config: Dict) -> str:
     """
     Assembles the video from images and audio using FFmpeg directly.
@@ -87,98 +238,47 @@ def assemble_video(image_files: List[str], audio_files: List[str], config: Dict)
     logging.info("[DEBUG] Starting image processing loop.")
     for i, img_path in enumerate(image_files):
         logging.info(f"[DEBUG] Processing image {i+1}/{total_slides}: {img_path}")
-        try:
-            # Open and convert to RGB
-            img = Image.open(img_path).convert('RGB')
-            
-            # Calculate scaling to maintain aspect ratio
-            img_width, img_height = img.size
-            ratio = min(width/img_width, height/img_height)
-            new_size = (int(img_width*ratio), int(img_height*ratio))
-            
-            # Resize image
-            img = img.resize(new_size, Image.LANCZOS)
-            
-            # Create a new image with background color
-            new_img = Image.new('RGB', (width, height), bg_color_rgb)
-            
-            # Paste the resized image in the center
-            x_offset = (width - new_size[0]) // 2
-            y_offset = (height - new_size[1]) // 2
-            new_img.paste(img, (x_offset, y_offset))
-            
-            # Save processed image
-            processed_path = os.path.join(temp_dir, f"slide_{i+1:03d}.png")
-            new_img.save(processed_path)
-            processed_images.append(processed_path)
-            
-            logging.info(f"Processed image {i+1}/{total_slides}: {os.path.basename(img_path)}")
-        except Exception as e:
-            logging.error(f"Error processing image {img_path}: {e}")
-            # Create a fallback solid color image
-            fallback = Image.new('RGB', (width, height), bg_color_rgb)
-            processed_path = os.path.join(temp_dir, f"slide_{i+1:03d}.png")
-            fallback.save(processed_path)
-            processed_images.append(processed_path)
-            logging.info(f"Created fallback image for {os.path.basename(img_path)}")
+        processed_path = os.path.join(temp_dir, f"slide_{i+1:03d}.png")
+        processed_images.append(prepare_slide_image(img_path, processed_path, width, height, bg_color_rgb))
+        logging.info(f"Processed image {i+1}/{total_slides}: {os.path.basename(img_path)}")
     logging.info("[DEBUG] Image processing loop finished.")
     
-    # Create individual video segments for each slide with its audio
+    # Slide lengths come from the audio; the narration is joined into one track and
+    # encoded at most once, instead of once per segment
+    try:
+        durations = [audio_duration(audio_path) for audio_path in audio_files]
+        narration_path, audio_codec_args = build_narration_track(audio_files, temp_dir, config)
+    except Exception as e:
+        logging.error(f"Error preparing the narration track: {e}")
+        return ""
+    frame_counts = segment_frame_counts(durations, fps)
+    
+    # Create individual video-only segments for each slide, as long as its audio
     video_segments = []
     total_segments = len(processed_images)
     logging.info("[DEBUG] Starting video segment creation loop.")
-    for i, (img_path, audio_path) in enumerate(zip(processed_images, audio_files)):
+    for i, (img_path, frame_count) in enumerate(zip(processed_images, frame_counts)):
         segment_path = os.path.join(temp_dir, f"segment_{i+1:03d}.mp4")
-        logging.info(f"[DEBUG] Creating segment {i+1}/{total_segments} for image {img_path} and audio {audio_path}")
-        try:
-            # Use ffmpeg to create a video segment from the image and audio
-            cmd = [
-                'ffmpeg', '-y',
-                '-loop', '1',
-                '-i', img_path,
-                '-i', audio_path,
-                '-c:v', 'libx264',
-                '-tune', 'stillimage',
-                '-c:a', 'aac',
-                '-b:a', '192k',
-                '-pix_fmt', 'yuv420p',
-                '-shortest',
-                segment_path
-            ]
-            
+        logging.info(f"[DEBUG] Creating segment {i+1}/{total_segments} for image {img_path} ({frame_count} frames)")
+        try:
+            # Use ffmpeg to create a video segment from the image
             logging.info(f"Creating video segment {i+1}/{total_segments}")
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            
-            video_segments.append(segment_path)
-        except Exception as e:
-            logging.error(f"Error creating video segment {i+1}: {e}")
+            video_segments.append(encode_slide_segment(img_path, frame_count, segment_path, config))
+        except Exception as e:
+            logging.error(f"Error creating video segment {i+1}: {e}")
     logging.info("[DEBUG] Video segment creation loop finished.")
     
-    if not video_segments:
-        logging.error("[DEBUG] No video segments were created. Aborting.")
-        logging.error("No video segments were created.")
+    if len(video_segments) != total_segments:
+        # A missing segment would shift every later slide against the narration
+        logging.error("[DEBUG] Not every video segment was created. Aborting.")
+        logging.error(f"Only {len(video_segments)} of {total_segments} video segments were created.")
         return ""
     
-    # Create a file listing all video segments
-    segments_list_path = os.path.join(temp_dir, "segments.txt")
-    with open(segments_list_path, 'w') as f:
-        for segment in video_segments:
-            f.write(f"file '{segment}'\n")
-    
-    # Concatenate all segments into the final video
+    # Concatenate all segments into the final video and add the narration track
     logging.info("[DEBUG] Starting concatenation of video segments.")
     try:
-        cmd = [
-            'ffmpeg', '-y',
-            '-f', 'concat',
-            '-safe', '0',
-            '-i', segments_list_path,
-            '-c', 'copy',
-            output_path
-        ]
-        
         logging.info(f"Concatenating {len(video_segments)} video segments")
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        mux_segments(video_segments, narration_path, audio_codec_args, output_path)
         
         logging.info(f"Video successfully assembled: {output_path}")
         logging.info("[DEBUG] assemble_video finished successfully.")
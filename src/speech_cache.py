@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from src.run_report import register_report_source
+from src.content_cache import cache_root
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 64
+CACHE_FILENAME = 'formula_speech.sqlite3'
+
+# Eviction needs a SUM over the table, so it only runs every so many writes
+EVICTION_CHECK_INTERVAL = 64
+# When over budget, evict down to this fraction of the limit to avoid evicting on every write
+EVICTION_TARGET_RATIO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS formula_speech (
+    engine TEXT NOT NULL,
+    language TEXT NOT NULL,
+    formula TEXT NOT NULL,
+    speech TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (engine, language, formula)
+)
+"""
+
+
+class FormulaSpeechCache:
+    """
+    On-disk map from a LaTeX formula to its spoken text, shared across decks, pipelines
+    and worker processes. Entries are keyed by speech engine version and language, so
+    changing the engine never serves stale speech. The least recently used entries are
+    evicted once the stored text exceeds max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection must not be shared with a forked worker process, so each process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            # WAL lets several processes read while one of them writes
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(_SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, engine: str, language: str, formula: str) -> Optional[str]:
+        """Return the cached speech for a formula, or None on a miss."""
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    'SELECT speech FROM formula_speech WHERE engine = ? AND language = ? AND formula = ?',
+                    (engine, language, formula)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                connection.execute(
+                    'UPDATE formula_speech SET last_used = ? WHERE engine = ? AND language = ? AND formula = ?',
+                    (time.time(), engine, language, formula))
+                self.hits += 1
+                return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Formula speech cache lookup failed: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, engine: str, language: str, formula: str, speech: str):
+        """Store the speech for a formula, evicting old entries if the cache grew too large."""
+        size = len(formula.encode('utf-8')) + len(speech.encode('utf-8'))
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    'INSERT OR REPLACE INTO formula_speech (engine, language, formula, speech, size, last_used) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (engine, language, formula, speech, size, time.time()))
+                self._writes += 1
+                if self._writes % EVICTION_CHECK_INTERVAL == 0:
+                    self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not store formula speech in cache: {e}")
+
+    def _evict(self, connection: sqlite3.Connection):
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM formula_speech').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * EVICTION_TARGET_RATIO)
+        freed = 0
+        victims = []
+        for rowid, size in connection.execute('SELECT rowid, size FROM formula_speech ORDER BY last_used'):
+            victims.append((rowid,))
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany('DELETE FROM formula_speech WHERE rowid = ?', victims)
+        logger.info(f"Evicted {len(victims)} formulas ({freed} bytes) from the formula speech cache")
+
+    def entry_count(self) -> int:
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM formula_speech').fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': self.entry_count()}
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = f"{100 * self.hits / lookups:.0f}%" if lookups else "n/a"
+        return (f"Formula speech cache: {self.hits} hits, {self.misses} misses "
+                f"(hit rate {hit_rate}), {self.entry_count()} entries in {self.path}")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+# The cache used by the speech engines; None until a pipeline enables it
+_active_cache: Optional[FormulaSpeechCache] = None
+
+
+def configure_formula_cache(config: Dict) -> Optional[FormulaSpeechCache]:
+    """
+    Enable the persistent formula speech cache described by the 'cache' config section.
+    The cache lives outside the deck's output directory so every deck and pipeline shares it.
+    """
+    cache_config = config.get('cache', {}) or {}
+    if not cache_config.get('formula_speech', True):
+        logger.info("Persistent formula speech cache disabled in config")
+        set_formula_cache(None)
+        return None
+
+    path = os.path.join(cache_root(config), CACHE_FILENAME)
+    if _active_cache is not None and _active_cache.path == path:
+        return _active_cache
+    max_bytes = int(cache_config.get('formula_speech_max_mb', DEFAULT_MAX_MB) * 1024 * 1024)
+    try:
+        set_formula_cache(FormulaSpeechCache(path, max_bytes))
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Could not open formula speech cache at {path}, continuing without it: {e}")
+        set_formula_cache(None)
+        return None
+    logger.info(f"Using formula speech cache at {path}")
+    return _active_cache
+
+
+def set_formula_cache(cache: Optional[FormulaSpeechCache]):
+    """Install (or with None, disable) the cache used by the speech engines."""
+    global _active_cache
+    if _active_cache is not None and _active_cache is not cache:
+        _active_cache.close()
+    _active_cache = cache
+    register_report_source('formula_speech', cache.report if cache else None)
+
+
+def get_formula_cache() -> Optional[FormulaSpeechCache]:
+    return _active_cache
+
+
+def cached_formula_speech(engine: str, language: str, formula: str, compute: Callable[[str], str]) -> str:
+    """Look a formula up in the persistent cache, computing and storing it on a miss."""
+    cache = _active_cache
+    if cache is None:
+        return compute(formula)
+    speech = cache.get(engine, language, formula)
+    if speech is None:
+        speech = compute(formula)
+        cache.put(engine, language, formula, speech)
+    return speech
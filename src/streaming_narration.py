@@ -0,0 +1,180 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from src.chatgpt_script_generator import clean_chatgpt_response
+from src.text_normalizer import normalize_for_narration
+from src.automated_video_generation import build_chat_request, finalize_script
+from src.rate_limit import RateLimiter, create_chat_completion, rate_limiter_from_config, map_in_order, DEFAULT_CONCURRENCY
+from src.llm_cache import lookup_cached_completion, store_completion
+from src.api_usage import record_usage
+from src.audio_utils import concatenate_mp3
+from src.tts_provider import TTSProvider, create_tts_provider
+from src.tts_pool import TTSPool
+from src.run_report import register_report_source
+from src.sentence_splitter import SentenceSplitter, split_sentences
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+
+def speakable_sentence(sentence: str) -> str:
+    """Clean and normalize one sentence of a raw ChatGPT script for TTS."""
+    return normalize_for_narration(clean_chatgpt_response(sentence)).strip()
+
+
+class StreamingNarrator:
+    """
+    Streams each slide's script from the chat API and hands every finished sentence to
+    the TTS provider right away, so the audio of a slide is ready shortly after its
+    last token instead of after the whole deck has been written.
+    """
+
+    def __init__(self, client, provider: TTSProvider, config: Dict, limiter: Optional[RateLimiter] = None):
+        self.client = client
+        self.provider = provider
+        self.config = config
+        self.limiter = limiter or rate_limiter_from_config(config)
+        self.audio_dir = os.path.abspath(os.path.join(config.get('output_dir', 'output'), 'audio'))
+        self.parts_dir = os.path.join(self.audio_dir, 'parts')
+        os.makedirs(self.parts_dir, exist_ok=True)
+        # Retries and the request rate limit of the TTS pool, applied to each sentence
+        self.tts = TTSPool.from_config(provider, config)
+        self.tts_pool = ThreadPoolExecutor(max_workers=self.tts.concurrency)
+        self.started = time.monotonic()
+        self.ready_times: List[float] = []
+        self._lock = threading.Lock()
+
+    def _stream_sentences(self, request: Dict):
+        """Yield sentences of the answer to `request` as they arrive, then the full raw text."""
+        cached = lookup_cached_completion(request, self.config)
+        if cached is not None:
+            for sentence in split_sentences(cached):
+                yield sentence
+            yield None, cached
+            return
+        stream = create_chat_completion(self.client, self.limiter, stream=True,
+                                        stream_options={"include_usage": True}, **request)
+        splitter = SentenceSplitter()
+        chunks = []
+        for chunk in stream:
+            # With include_usage the last chunk has no choices, only the token usage
+            record_usage(getattr(chunk, 'usage', None))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            chunks.append(delta)
+            for sentence in splitter.feed(delta):
+                yield sentence
+        for sentence in splitter.flush():
+            yield sentence
+        raw = ''.join(chunks)
+        store_completion(request, raw)
+        yield None, raw
+
+    def narrate(self, index: int, prompt_data: Dict) -> Tuple[str, Optional[str]]:
+        """Script and audio file of one slide; the audio path is None if any part failed."""
+        slide_number = prompt_data["slide_number"]
+        logger.info(f"Streaming script for slide {slide_number}: {prompt_data['title']}")
+        spoken = []
+        parts = []
+        # Every part handed to TTS, including ones dropped for a default transition
+        submitted = []
+
+        def submit(text: str):
+            text = speakable_sentence(text)
+            if not text:
+                return
+            spoken.append(text)
+            part_path = os.path.join(self.parts_dir, f"audio_{index}_part{len(submitted) + 1}.mp3")
+            parts.append((part_path, self.tts_pool.submit(self.tts.synthesize, text, part_path)))
+            submitted.append(parts[-1])
+
+        try:
+            raw = ''
+            for item in self._stream_sentences(build_chat_request(prompt_data, self.config)):
+                if isinstance(item, tuple):
+                    raw = item[1]
+                else:
+                    submit(item)
+            script = finalize_script(raw, prompt_data)
+            if script != raw.strip():
+                # An empty slide got a default transition instead of the (too short) answer
+                for _, future in parts:
+                    future.cancel()
+                spoken.clear()
+                parts.clear()
+                submit(script)
+        except Exception as e:
+            logger.error(f"Error streaming script for slide {slide_number}: {e}")
+            self._discard_parts(submitted)
+            return f"Script for slide {slide_number} could not be generated.", None
+
+        if not parts:
+            logger.error(f"Script for slide {slide_number} was empty after cleaning.")
+            self._discard_parts(submitted)
+            return f"Script for slide {slide_number} could not be generated properly.", None
+
+        part_paths = [path for path, future in parts if future.result()]
+        if len(part_paths) != len(parts):
+            logger.error(f"TTS failed for {len(parts) - len(part_paths)} sentences of slide {slide_number}")
+            self._discard_parts(submitted)
+            return ' '.join(spoken), None
+
+        output_file = os.path.join(self.audio_dir, f"audio_{index}.mp3")
+        try:
+            concatenate_mp3(part_paths, output_file)
+        finally:
+            self._discard_parts(submitted)
+        elapsed = time.monotonic() - self.started
+        with self._lock:
+            self.ready_times.append(elapsed)
+        logger.info(f"Audio for slide {slide_number} ready after {elapsed:.1f}s ({len(part_paths)} sentences)")
+        return ' '.join(spoken), output_file
+
+    @staticmethod
+    def _discard_parts(parts: List[Tuple[str, object]]):
+        """Remove the part files of a slide once every synthesis writing one has finished."""
+        wait([future for _, future in parts])
+        for path, _ in parts:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def report(self) -> str:
+        if not self.ready_times:
+            return "Streaming narration: no slide finished"
+        return (f"Streaming narration: first slide ready after {min(self.ready_times):.1f}s, "
+                f"{len(self.ready_times)} slides after {max(self.ready_times):.1f}s")
+
+    def close(self):
+        self.tts_pool.shutdown(wait=True)
+
+
+def stream_scripts_to_audio(prompts: List[Dict], client, config: Dict,
+                            provider: Optional[TTSProvider] = None) -> Tuple[List[str], List[str]]:
+    """
+    Generate the script and audio of every slide with streaming, slides in parallel.
+    Returns (scripts, audio_paths) in slide order. audio_paths is empty if any slide
+    failed, like generate_all_audio.
+    """
+    provider = provider or create_tts_provider(config)
+    if provider is None:
+        logger.error("No TTS provider available for streaming narration.")
+        return [], []
+    narrator = StreamingNarrator(client, provider, config)
+    register_report_source('streaming', narrator.report)
+    try:
+        concurrency = config.get('openai', {}).get('concurrency', DEFAULT_CONCURRENCY)
+        results = map_in_order(lambda item: narrator.narrate(*item), list(enumerate(prompts, 1)), concurrency)
+    finally:
+        narrator.close()
+    scripts = [script for script, _ in results]
+    audio_paths = [audio for _, audio in results]
+    if any(audio is None for audio in audio_paths):
+        return scripts, []
+    return scripts, audio_paths
@@ -0,0 +1,234 @@
+import re
+import logging
+from typing import Callable, List, NamedTuple, Sequence, Tuple
+
+from src.math_speech import GREEK_PT, GREEK_UPPER_PT
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+
+class Rule(NamedTuple):
+    """A single rewrite: regex pattern, replacement template and regex flags."""
+    pattern: str
+    replacement: str
+    flags: int = 0
+
+
+# A stage is a named list of rules that do not feed into each other, so they can be
+# applied together in one left-to-right scan. At a given position the first rule of
+# the stage that matches wins, so more specific rules must come before general ones.
+Stage = Tuple[str, List[Rule]]
+
+_FLAG_LETTERS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'))
+_GROUP_REFERENCE = re.compile(r'\\(\d+)')
+
+
+def _command(name: str) -> str:
+    """Pattern for a LaTeX command that is not the prefix of a longer command."""
+    return r'\\' + name + r'(?![a-zA-Z])'
+
+
+class _CompiledStage:
+    """All rules of a stage merged into a single alternation regex."""
+
+    def __init__(self, name: str, rules: List[Rule]):
+        self.name = name
+        alternatives = []
+        self._templates = []
+        group_offset = 0
+        for index, rule in enumerate(rules):
+            if re.search(r'\\\d|\(\?P', rule.pattern):
+                raise ValueError(f"Rule {rule.pattern!r} in stage '{name}' uses back-references or named groups, which cannot be merged")
+            letters = ''.join(letter for flag, letter in _FLAG_LETTERS if rule.flags & flag)
+            body = f"(?{letters}:{rule.pattern})" if letters else rule.pattern
+            alternatives.append(f"(?P<r{index}>{body})")
+            # Group numbers of this rule inside the merged regex start after the wrapper
+            self._templates.append((group_offset + 1, rule.replacement))
+            group_offset += 1 + re.compile(rule.pattern, rule.flags).groups
+        self.regex = re.compile('|'.join(alternatives))
+
+    def _replace(self, match) -> str:
+        offset, template = self._templates[int(match.lastgroup[1:])]
+        if '\\' not in template:
+            return template
+        return _GROUP_REFERENCE.sub(lambda ref: match.group(offset + int(ref.group(1))) or '', template)
+
+    def apply(self, text: str) -> str:
+        return self.regex.sub(self._replace, text)
+
+
+class TextNormalizer:
+    """Applies a table of rewrite stages in order, one regex pass per stage."""
+
+    def __init__(self, stages: Sequence[Stage], finalize: Callable[[str], str] = str.strip):
+        self.stages = [_CompiledStage(name, rules) for name, rules in stages]
+        self.finalize = finalize
+        rule_count = sum(len(rules) for _, rules in stages)
+        logger.debug(f"Compiled {rule_count} normalization rules into {len(self.stages)} passes")
+
+    def __call__(self, text: str) -> str:
+        for stage in self.stages:
+            text = stage.apply(text)
+        return self.finalize(text) if self.finalize else text
+
+
+# --- Rule tables ---
+
+MATH_DELIMITER_STAGE: Stage = ('math_delimiters', [
+    Rule(r'\$\$(.*?)\$\$', r'\1', re.DOTALL),
+    Rule(r'\\\((.*?)\\\)', r'\1', re.DOTALL),
+    Rule(r'\\\[(.*?)\\\]', r'\1', re.DOTALL),
+    Rule(r'\$(.*?)\$', r'\1', re.DOTALL),
+])
+
+LEFTOVER_LATEX_STAGE: Stage = ('leftover_latex', [
+    Rule(r'\\[a-zA-Z]+', ''),
+    Rule(r'\\[^a-zA-Z]', ''),
+])
+
+# Markdown and LaTeX cleanup for raw ChatGPT responses (formerly the sequential
+# re.sub chain in chatgpt_script_generator.clean_chatgpt_response). A rule that keeps
+# part of its match (\1) hides that part from the other rules of its stage, so rules
+# whose matches can nest, or that rewrite what another rule produces, get a stage of
+# their own, in the order of the old chain.
+RESPONSE_CLEANUP_RULES: List[Stage] = [
+    ('markdown_headers', [Rule(r'^#+ .*$', '', re.MULTILINE)]),
+    ('markdown_bold', [Rule(r'\*\*(.*?)\*\*', r'\1')]),
+    ('markdown_italic', [Rule(r'\*(.*?)\*', r'\1')]),
+    ('markdown_underscore_bold', [Rule(r'__(.*?)__', r'\1')]),
+    ('markdown_underscore_italic', [Rule(r'_(.*?)_', r'\1')]),
+    ('markdown_code', [
+        Rule(r'```.*?```', '', re.DOTALL),
+        Rule(r'`(.*?)`', r'\1'),
+    ]),
+    ('markdown_lists', [
+        Rule(r'^\s*[-*+]\s+', '', re.MULTILINE),
+        Rule(r'^\s*\d+\.\s+', '', re.MULTILINE),
+    ]),
+    ('fractions', [
+        Rule(r'\\frac\s*\{\s*([^{}]*?)\s*\}\s*\{\s*([^{}]*?)\s*\}', r'\1 dividido por \2'),
+    ]),
+    ('latex_symbols', [
+        Rule(r'\\nabla\s*\\times', ' rotacional '),
+        Rule(r'\\nabla\s*\\cdot', ' divergente '),
+        Rule(_command('nabla'), ' gradiente '),
+        *[Rule(_command(latex), spoken) for latex, spoken in GREEK_PT.items()],
+        *[Rule(_command(latex), f"{spoken.capitalize()} maiúsculo") for latex, spoken in GREEK_UPPER_PT.items()],
+        Rule(_command('cdot'), ' vezes '),
+        Rule(_command('times'), ' vezes '),
+        Rule(_command('pm'), ' mais ou menos '),
+        Rule(_command('mp'), ' menos ou mais '),
+        Rule(_command('leq'), ' menor ou igual a '),
+        Rule(_command('geq'), ' maior ou igual a '),
+        Rule(_command('neq'), ' diferente de '),
+        Rule(_command('approx'), ' aproximadamente igual a '),
+        Rule(_command('infty'), ' infinito '),
+        Rule(_command('sum'), ' somatório '),
+        Rule(_command('prod'), ' produtório '),
+        Rule(_command('cup'), ' união '),
+        Rule(_command('cap'), ' interseção '),
+        Rule(_command('partial'), ' derivada parcial '),
+        Rule(_command('int'), ' integral '),
+        Rule(_command('oint'), ' integral de linha '),
+        Rule(r'\\begin\{[bp]?matrix\}', 'início da matriz'),
+        Rule(r'\\end\{[bp]?matrix\}', 'fim da matriz'),
+        Rule(r'\\\\', ';'),
+        Rule(r'&', ' e '),
+    ]),
+    # After the symbols, so that \sqrt{\pi} reads the spoken letter
+    ('roots', [
+        Rule(r'\\sqrt\[3\]\{([^{}]*)\}', r'raiz cúbica de \1'),
+        Rule(r'\\sqrt\{([^{}]*)\}', r'raiz quadrada de \1'),
+    ]),
+    ('subscripts_braced', [Rule(r'(?<=[A-Za-z])_\{([^{}]*)\}', r' subscrito \1')]),
+    ('subscripts', [Rule(r'(?<=[A-Za-z])_([A-Za-z0-9])', r' subscrito \1')]),
+    ('superscripts_braced', [Rule(r'(?<=[A-Za-z0-9])\^\{([^{}]*)\}', r' sobrescrito \1')]),
+    ('superscripts', [Rule(r'(?<=[A-Za-z0-9])\^([A-Za-z0-9])', r' sobrescrito \1')]),
+    MATH_DELIMITER_STAGE,
+    ('whitespace', [
+        Rule(r'^\s+', ''),
+        Rule(r'\s+$', ''),
+        Rule(r'\s+(?=[;,.])', ''),
+        Rule(r'\s+', ' '),
+    ]),
+    ('physics_symbols', [
+        Rule(r'k subscrito e', 'k_e'),
+        Rule(r'm subscrito 1', 'm_1'),
+        Rule(r'm subscrito 2', 'm_2'),
+        Rule(r'q subscrito 1', 'q_1'),
+        Rule(r'q subscrito 2', 'q_2'),
+        Rule(r'E subscrito k', 'E_k'),
+        Rule(_command('hbar'), 'hbar'),
+    ]),
+    LEFTOVER_LATEX_STAGE,
+    # The whitespace stage has already joined everything into a single line, so the
+    # line-anchored rules below only look at the start and end of the whole script.
+    ('chatgpt_phrases', [
+        *[Rule(phrase, '', re.MULTILINE | re.IGNORECASE) for phrase in (
+            r"^Aqui está um script de narração.*?:",
+            r"^Aqui está uma narração.*?:",
+            r"^Script de narração.*?:",
+            r"^Narração.*?:",
+            r"^Claro.*?:",
+            r"^Certamente.*?:",
+            r"^Vamos criar.*?:",
+            r"^Segue abaixo.*?:",
+            r"^Segue o script.*?:",
+            r"^Segue a narração.*?:",
+            r"^Espero que isso ajude.*$",
+            r"^Espero que esta narração.*$",
+            r"^Espero que este script.*$",
+            r"^Espero ter atendido.*$",
+            r"^Se precisar de alguma alteração.*$",
+            r"^Se precisar de ajustes.*$",
+            r"\[Início do Script de Narração\]",
+            r"\[Fim do Script de Narração\]",
+            r"\{Início do Video\]",
+            r"\{Fim do Video\]",
+            r"\[Início da Narração\]",
+            r"\[Fim da Narração\]",
+            r"\[Início\]",
+            r"\[Fim\]",
+            r"\{Início\]",
+            r"\{Fim\]",
+        )],
+        Rule(r'^>.*$', '', re.MULTILINE),
+        Rule(r'^[=-]+$', '', re.MULTILINE),
+    ]),
+]
+
+# Strip whatever LaTeX markup is still left in a script (formerly step 1 of
+# automated_video_generation.process_scripts_for_narration)
+LATEX_CONTROL_RULES: List[Stage] = [MATH_DELIMITER_STAGE, LEFTOVER_LATEX_STAGE]
+
+# Portuguese pronunciation of the variable y (formerly replace_y_with_ipsilon.py)
+IPSILON_RULES: List[Stage] = [
+    ('ipsilon', [
+        Rule(r'(?<!\w)y(?!\w)', 'ipsilon'),
+        Rule(r'xy', 'x·ipsilon'),
+        Rule(r'2y', '2·ipsilon'),
+    ]),
+]
+
+normalize_chatgpt_response = TextNormalizer(RESPONSE_CLEANUP_RULES)
+normalize_for_narration = TextNormalizer(LATEX_CONTROL_RULES + IPSILON_RULES, finalize=None)
+replace_y_with_ipsilon = TextNormalizer(IPSILON_RULES, finalize=None)
+
+# Patterns that indicate a script is not ready to be read aloud
+NARRATION_ISSUE_PATTERNS = [
+    (re.compile(r'\\[a-zA-Z]+|\\[\(\)\[\]]|\\\{|\\\}|\\[,;]|\$\$.*?\$\$|\$.*?\$'), "Found LaTeX control characters"),
+    (re.compile(r'(?<!\w)y(?!\w)'), "Found standalone 'y' characters"),
+    (re.compile(r'xy'), "Found 'xy' patterns"),
+    (re.compile(r'2y'), "Found '2y' patterns"),
+]
+
+
+def find_narration_issues(text: str) -> List[str]:
+    """Return human-readable descriptions of markup left in a normalized script."""
+    issues = []
+    for pattern, description in NARRATION_ISSUE_PATTERNS:
+        matches = pattern.findall(text)
+        if matches:
+            issues.append(f"{description}: {matches[:3]}")
+    return issues
@@ -0,0 +1,238 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from src.rate_limit import TokenBucket
+from src.tts_provider import TTSProvider
+from src.audio_cache import audio_key, fetch_cached_audio, store_audio
+from src.atomic_write import commit_partial, partial_path
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTS_CONCURRENCY = 2
+DEFAULT_TTS_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5
+
+T = TypeVar('T')
+
+
+def _int_setting(value) -> Optional[int]:
+    # Providers may be test doubles whose attributes are not numbers
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def tts_concurrency(provider: TTSProvider, config: Dict) -> int:
+    """Parallel requests allowed: tts.concurrency, else the provider's own limit."""
+    configured = config.get('tts', {}).get('concurrency')
+    if configured:
+        return max(1, int(configured))
+    return max(1, int(_int_setting(getattr(provider, 'max_concurrency', None)) or DEFAULT_TTS_CONCURRENCY))
+
+
+def tts_requests_per_minute(provider: TTSProvider, config: Dict) -> Optional[float]:
+    """
+    Request rate limit: tts.requests_per_minute, else the one implied by the old
+    tts.delay_between_calls setting, else the provider's own limit (None = unlimited).
+    """
+    tts_config = config.get('tts', {})
+    if tts_config.get('requests_per_minute'):
+        return float(tts_config['requests_per_minute'])
+    if tts_config.get('delay_between_calls'):
+        return 60.0 / float(tts_config['delay_between_calls'])
+    return _int_setting(getattr(provider, 'requests_per_minute', None))
+
+
+class AccountLimits:
+    """
+    Concurrency and request-rate limits of one TTS account, for sharing between the
+    pools of several decks synthesized in the same process.
+    """
+
+    def __init__(self, concurrency: int, requests_per_minute: Optional[float] = None):
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.slots = threading.BoundedSemaphore(concurrency)
+        # Start with one request's worth of tokens so the first calls are not all sent at once
+        self.bucket = TokenBucket(1, requests_per_minute / 60.0) if requests_per_minute else None
+
+
+# Limits per TTS account while shared (see share_tts_limits); None = every pool has its own
+_shared_limits: Optional[Dict[str, AccountLimits]] = None
+_shared_limits_lock = threading.Lock()
+
+
+def share_tts_limits(enabled: bool = True):
+    """
+    Make every TTSPool.from_config in this process draw on one set of limits per
+    account, so decks synthesized at the same time stay within the quota together.
+    """
+    global _shared_limits
+    with _shared_limits_lock:
+        _shared_limits = {} if enabled else None
+
+
+def tts_account(provider: TTSProvider) -> str:
+    """Which quota a provider's requests count against: its class, endpoint and API key."""
+    endpoint = getattr(provider, 'api_base', None) or getattr(provider, 'base_url', None) or ''
+    api_key = getattr(provider, 'api_key', None) or ''
+    key_digest = hashlib.sha256(str(api_key).encode('utf-8')).hexdigest()[:12] if api_key else ''
+    return f"{type(provider).__name__}:{endpoint}:{key_digest}"
+
+
+def shared_account_limits(provider: TTSProvider, config: Dict) -> Optional[AccountLimits]:
+    """The shared limits of the provider's account, created from `config` on first use."""
+    with _shared_limits_lock:
+        if _shared_limits is None:
+            return None
+        account = tts_account(provider)
+        if account not in _shared_limits:
+            _shared_limits[account] = AccountLimits(tts_concurrency(provider, config),
+                                                    tts_requests_per_minute(provider, config))
+        return _shared_limits[account]
+
+
+class TTSPool:
+    """
+    Synthesizes many texts with one provider, up to `concurrency` at a time and within
+    `requests_per_minute`. A failed text is retried with exponential backoff before it
+    is reported as failed; a provider exception counts as a failure. With `limits` the
+    concurrency and rate are those of an account shared with other pools.
+    """
+
+    def __init__(self, provider: TTSProvider, concurrency: int = DEFAULT_TTS_CONCURRENCY,
+                 requests_per_minute: Optional[float] = None, max_retries: int = DEFAULT_TTS_RETRIES,
+                 retry_backoff: float = DEFAULT_RETRY_BACKOFF, limits: Optional[AccountLimits] = None):
+        self.provider = provider
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        if limits:
+            self.concurrency = limits.concurrency
+            self.bucket = limits.bucket
+            self.slots = limits.slots
+        else:
+            self.concurrency = concurrency
+            # Start with one request's worth of tokens so the first calls are not all sent at once
+            self.bucket = TokenBucket(1, requests_per_minute / 60.0) if requests_per_minute else None
+            self.slots = None
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, provider: TTSProvider, config: Dict) -> 'TTSPool':
+        tts_config = config.get('tts', {})
+        return cls(provider, tts_concurrency(provider, config), tts_requests_per_minute(provider, config),
+                   tts_config.get('max_retries', DEFAULT_TTS_RETRIES),
+                   tts_config.get('retry_backoff', DEFAULT_RETRY_BACKOFF),
+                   limits=shared_account_limits(provider, config))
+
+    def _call_provider(self, call: Callable[[], T]) -> T:
+        # Only requests count against the account: cache hits and retry backoff hold no slot
+        if self.slots:
+            with self.slots:
+                if self.bucket:
+                    self.bucket.acquire(1)
+                return call()
+        if self.bucket:
+            self.bucket.acquire(1)
+        return call()
+
+    def _attempt(self, text: str, output_path: str) -> bool:
+        with self._lock:
+            self.calls += 1
+        # The provider writes beside the file, which is replaced only once the audio is complete
+        try:
+            success = bool(self._call_provider(lambda: self.provider.generate_audio(text, partial_path(output_path))))
+        except Exception as e:
+            logger.error(f"TTS provider raised while generating {output_path}: {e}")
+            success = False
+        return commit_partial(output_path, success)
+
+    def synthesize(self, text: str, output_path: str, attempts_made: int = 0) -> bool:
+        """
+        Generate one file, from the audio cache if the same text was synthesized before,
+        else with retries; attempts_made counts tries that already failed elsewhere.
+        """
+        key = audio_key(self.provider, text)
+        if fetch_cached_audio(key, output_path):
+            logger.debug(f"Audio for {output_path} served from cache")
+            return True
+        try:
+            if os.stat(output_path).st_nlink > 1:
+                # Hard-linked to a cache entry: never let the provider rewrite it in place
+                os.remove(output_path)
+        except OSError:
+            pass
+        for attempt in range(attempts_made, self.max_retries + 1):
+            if attempt:
+                delay = self.retry_backoff * 2 ** (attempt - 1)
+                logger.warning(f"Retrying TTS for {output_path} in {delay:.1f}s (attempt {attempt + 1})")
+                time.sleep(delay)
+            if self._attempt(text, output_path):
+                store_audio(key, output_path)
+                return True
+        return False
+
+    def _synthesize_batch(self, jobs: Sequence[Tuple[str, str]],
+                          on_done: Optional[Callable[[int, bool], None]] = None) -> List[bool]:
+        """
+        One generate_audio_batch call for every job the audio cache cannot serve, for
+        providers that synthesize many texts at once; failures are retried one by one.
+        """
+        results = [False] * len(jobs)
+        misses = []
+        for index, (text, output_path) in enumerate(jobs):
+            key = audio_key(self.provider, text)
+            if fetch_cached_audio(key, output_path):
+                results[index] = True
+                continue
+            if os.path.lexists(output_path) and os.stat(output_path).st_nlink > 1:
+                # Hard-linked to a cache entry: never let the provider rewrite it in place
+                os.remove(output_path)
+            misses.append((index, key))
+        if misses:
+            with self._lock:
+                self.calls += 1
+            batch = [(jobs[index][0], partial_path(jobs[index][1])) for index, _ in misses]
+            try:
+                flags = self._call_provider(lambda: self.provider.generate_audio_batch(batch))
+            except Exception as e:
+                logger.error(f"TTS provider raised during a batch of {len(misses)} texts: {e}")
+                flags = [False] * len(misses)
+            for (index, key), success in zip(misses, flags):
+                if commit_partial(jobs[index][1], bool(success)):
+                    store_audio(key, jobs[index][1])
+                    results[index] = True
+        failed = [index for index, success in enumerate(results) if not success]
+        if failed and self.max_retries:
+            logger.warning(f"Batch synthesis failed for {len(failed)} texts, retrying them one by one")
+            for index in failed:
+                results[index] = self.synthesize(*jobs[index], attempts_made=1)
+        if on_done:
+            for index, success in enumerate(results):
+                on_done(index, success)
+        return results
+
+    def synthesize_all(self, jobs: Sequence[Tuple[str, str]],
+                       on_done: Optional[Callable[[int, bool], None]] = None) -> List[bool]:
+        """
+        Run (text, output_path) jobs in parallel; success flags in job order. on_done, if
+        given, is called with (job index, success) as each job finishes, in any order.
+        """
+        if not jobs:
+            return []
+        if getattr(self.provider, 'supports_batch', False) is True:
+            return self._synthesize_batch(jobs, on_done)
+        results = [False] * len(jobs)
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(jobs))) as executor:
+            futures = {executor.submit(self.synthesize, *job): index for index, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if on_done:
+                    on_done(index, results[index])
+        return results
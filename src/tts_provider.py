@@ -1,8 +1,15 @@
 import os
 import logging
 from abc import ABC, abstractmethod
-from typing import Optional, Any # Added Any for ElevenLabs client type hint
+from typing import Dict, List, Optional, Any, Sequence, Tuple # Added Any for ElevenLabs client type hint
 import re
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 # Get a logger for this module
 logger = logging.getLogger(__name__)
@@ -33,6 +40,7 @@ try:
     
     # Use requests library instead of elevenlabs package
     import requests
+    from requests.adapters import HTTPAdapter
     
     ELEVENLABS_AVAILABLE = True
     print("[TTS_PROVIDER_PRINT] Requests imported successfully for ElevenLabs API.")
@@ -51,20 +59,53 @@ except Exception as e_eleven_other: # Catch other potential errors during import
 class TTSProvider(ABC):
     """Abstract base class for TTS providers."""
     
+    # Parallel requests the service accepts; tts.concurrency in config overrides it
+    max_concurrency: int = 2
+    # Requests per minute allowed by the service (None = no known limit)
+    requests_per_minute: Optional[int] = None
+    # True if generate_audio_batch does better than one generate_audio call per text
+    supports_batch: bool = False
+    
     @abstractmethod
     def generate_audio(self, text: str, output_path: str) -> bool:
         """Generate audio for the given text and save to output_path."""
         pass
     
+    def generate_audio_batch(self, jobs: Sequence[Tuple[str, str]]) -> List[bool]:
+        """Generate audio for many (text, output_path) pairs; success flags in job order."""
+        return [self.generate_audio(text, output_path) for text, output_path in jobs]
+    
     def preprocess_text(self, text: str) -> str:
         """Preprocess text to handle SSML tags and other provider-specific requirements."""
         logger.debug(f"Preprocessing text (original): {text[:100]}...")
         return text
+    
+    def cache_identity(self) -> Optional[dict]:
+        """
+        Everything besides the text that determines the audio (provider, voice, model,
+        settings), used to key the audio cache. None means the output is not cacheable.
+        """
+        return None
+
+def _gtts_at(base_url: str):
+    """gTTS class sending its requests to base_url instead of translate.google.com."""
+    class RedirectedGTTS(gTTS):
+        def _prepare_requests(self):
+            prepared_requests = super()._prepare_requests()
+            for prepared in prepared_requests:
+                path = prepared.url.split('/', 3)[3]
+                prepared.prepare_url(f"{base_url.rstrip('/')}/{path}", None)
+            return prepared_requests
+    return RedirectedGTTS
+
 
 class GTTSProvider(TTSProvider):
     """Google Text-to-Speech provider implementation."""
     
-    def __init__(self, language: str = 'pt', slow: bool = False):
+    # Unofficial endpoint: a few parallel requests are fine, bursts get HTTP 429
+    max_concurrency = 4
+    
+    def __init__(self, language: str = 'pt', slow: bool = False, base_url: Optional[str] = None):
         print(f"[TTS_PROVIDER_PRINT] GTTSProvider.__init__ called. Language: {language}, Slow: {slow}")
         logger.info(f"[GTTSProvider] Initializing with language: {language}, slow: {slow}")
         for handler in logging.getLogger().handlers: handler.flush()
@@ -75,6 +116,9 @@ class GTTSProvider(TTSProvider):
             raise ImportError("gTTS library failed to import. GTTSProvider cannot be used.")
         self.language = language
         self.slow = slow
+        self.base_url = base_url
+        # Another server speaking Google Translate's TTS protocol, e.g. src.mock_tts_server
+        self.gtts_class = _gtts_at(base_url) if base_url else gTTS
         print(f"[TTS_PROVIDER_PRINT] GTTSProvider initialized. Language: {self.language}")
         logger.info(f"[GTTSProvider] Initialized gTTS provider with language: {language}")
         for handler in logging.getLogger().handlers: handler.flush()
@@ -89,6 +133,9 @@ class GTTSProvider(TTSProvider):
         logger.debug(f"[GTTSProvider] Preprocessed text for gTTS (processed): {processed_text[:100]}...")
         return processed_text
     
+    def cache_identity(self) -> Optional[dict]:
+        return {"provider": "gtts", "language": self.language, "slow": self.slow}
+    
     def generate_audio(self, text: str, output_path: str) -> bool:
         """Generate audio using Google Text-to-Speech."""
         print(f"[TTS_PROVIDER_PRINT] GTTSProvider.generate_audio called for: {output_path}")
@@ -106,7 +153,7 @@ class GTTSProvider(TTSProvider):
             print("[TTS_PROVIDER_PRINT] GTTSProvider.generate_audio: Creating gTTS object...")
             logger.info("[GTTSProvider] Creating gTTS object...")
             for handler in logging.getLogger().handlers: handler.flush()
-            tts_obj = gTTS(text=processed_text, lang=self.language, slow=self.slow) # Renamed tts to tts_obj
+            tts_obj = self.gtts_class(text=processed_text, lang=self.language, slow=self.slow) # Renamed tts to tts_obj
             print("[TTS_PROVIDER_PRINT] GTTSProvider.generate_audio: gTTS object created.")
             
             output_dir = os.path.dirname(os.path.abspath(output_path))
@@ -131,10 +178,48 @@ class GTTSProvider(TTSProvider):
             print(f"[TTS_PROVIDER_PRINT] GTTSProvider.generate_audio finished for: {output_path}")
             for handler in logging.getLogger().handlers: handler.flush()
 
+ELEVENLABS_API_BASE = "https://api.elevenlabs.io/v1"
+# Audio is written to disk as it arrives, in pieces of this size
+STREAM_CHUNK_SIZE = 64 * 1024
+# How long a successful voice check is trusted before the next provider checks again
+VOICE_VALIDATION_TTL = 3600
+# (connect, read) timeouts of ElevenLabs requests, in seconds
+ELEVENLABS_TIMEOUT = (10, 120)
+
+# One keep-alive session per API key, shared by every provider instance and worker thread
+_sessions: Dict[tuple, Any] = {}
+# (api_base, api_key, voice_id) -> time the voice was last confirmed to exist
+_validated_voices: Dict[tuple, float] = {}
+_elevenlabs_lock = threading.Lock()
+
+
+def _elevenlabs_session(api_base: str, api_key: str, pool_size: int):
+    """Pooled session for `api_key`, so slides reuse open TCP/TLS connections."""
+    with _elevenlabs_lock:
+        session = _sessions.get((api_base, api_key))
+        if session is None:
+            session = requests.Session()
+            session.headers.update({"xi-api-key": api_key})
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[(api_base, api_key)] = session
+        return session
+
+
+def _voice_recently_validated(key: tuple) -> bool:
+    with _elevenlabs_lock:
+        checked_at = _validated_voices.get(key)
+    return checked_at is not None and time.monotonic() - checked_at < VOICE_VALIDATION_TTL
+
+
 class ElevenLabsProvider(TTSProvider):
     """ElevenLabs provider implementation using direct API calls."""
     
-    def __init__(self, api_key: str, voice_id: str, model_id: str):
+    # Concurrent request limit of the entry-level plans
+    max_concurrency = 2
+    
+    def __init__(self, api_key: str, voice_id: str, model_id: str, api_base: str = ELEVENLABS_API_BASE):
         print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.__init__ called. Voice ID: {voice_id}, Model ID: {model_id}")
         logger.info(f"[ElevenLabsProvider] Initializing with voice_id: {voice_id}, model_id: {model_id}")
         for handler in logging.getLogger().handlers: handler.flush()
@@ -147,26 +232,39 @@ class ElevenLabsProvider(TTSProvider):
         self.api_key = api_key
         self.voice_id = voice_id
         self.model_id = model_id
-        self.api_url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+        self.api_base = api_base.rstrip('/')
+        self.api_url = f"{self.api_base}/text-to-speech/{voice_id}"
+        # The streaming endpoint sends audio as it is generated instead of after the whole clip
+        self.stream_url = f"{self.api_url}/stream"
+        self.voice_settings = {
+            "stability": 0.5,
+            "similarity_boost": 0.75
+        }
         self.headers = {
             "Accept": "audio/mpeg",
             "Content-Type": "application/json",
             "xi-api-key": api_key
         }
+        self.session = _elevenlabs_session(self.api_base, api_key, self.max_concurrency * 2)
 
-        # Test connection by making a simple request to the voices endpoint
+        # Test the key and voice with a request for this one voice, unless a provider did recently
+        validation_key = (self.api_base, api_key, voice_id)
+        if _voice_recently_validated(validation_key):
+            logger.info(f"[ElevenLabsProvider] Voice {voice_id} validated recently, skipping API check")
+            return
         try:
             print("[TTS_PROVIDER_PRINT] ElevenLabsProvider.__init__: Testing connection to ElevenLabs API...")
             logger.info("[ElevenLabsProvider] Testing connection to ElevenLabs API...")
             for handler in logging.getLogger().handlers: handler.flush()
             
-            test_url = "https://api.elevenlabs.io/v1/voices"
-            response = requests.get(test_url, headers={"xi-api-key": api_key})
+            response = self.session.get(f"{self.api_base}/voices/{voice_id}", timeout=ELEVENLABS_TIMEOUT)
             
             if response.status_code == 200:
-                voices_data = response.json()
-                print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.__init__: Connection successful. Found {len(voices_data.get('voices', []))} voices.")
-                logger.info(f"[ElevenLabsProvider] Connection successful. Found {len(voices_data.get('voices', []))} voices.")
+                voice_name = response.json().get('name', voice_id)
+                print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.__init__: Connection successful. Voice: {voice_name}")
+                logger.info(f"[ElevenLabsProvider] Connection successful. Voice: {voice_name}")
+                with _elevenlabs_lock:
+                    _validated_voices[validation_key] = time.monotonic()
             else:
                 print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.__init__: API test failed with status code {response.status_code}: {response.text}")
                 logger.error(f"[ElevenLabsProvider] API test failed with status code {response.status_code}: {response.text}")
@@ -181,6 +279,10 @@ class ElevenLabsProvider(TTSProvider):
             for handler in logging.getLogger().handlers: handler.flush()
             raise # Re-raise the exception to be caught by create_tts_provider
     
+    def cache_identity(self) -> Optional[dict]:
+        return {"provider": "elevenlabs", "voice_id": self.voice_id, "model_id": self.model_id,
+                "voice_settings": self.voice_settings}
+    
     def generate_audio(self, text: str, output_path: str) -> bool:
         """Generate audio using ElevenLabs API."""
         print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.generate_audio called for: {output_path}")
@@ -199,24 +301,9 @@ class ElevenLabsProvider(TTSProvider):
             payload = {
                 "text": text,
                 "model_id": self.model_id,
-                "voice_settings": {
-                    "stability": 0.5,
-                    "similarity_boost": 0.75
-                }
+                "voice_settings": self.voice_settings
             }
             
-            # Make the API request
-            response = requests.post(self.api_url, json=payload, headers=self.headers)
-            
-            if response.status_code != 200:
-                print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.generate_audio: API request failed with status code {response.status_code}: {response.text}")
-                logger.error(f"[ElevenLabsProvider] API request failed with status code {response.status_code}: {response.text}")
-                return False
-            
-            print("[TTS_PROVIDER_PRINT] ElevenLabsProvider.generate_audio: API request successful.")
-            logger.info("[ElevenLabsProvider] API request successful.")
-            for handler in logging.getLogger().handlers: handler.flush()
-            
             # Create output directory if it doesn't exist
             output_dir = os.path.dirname(os.path.abspath(output_path))
             if not os.path.exists(output_dir):
@@ -224,13 +311,26 @@ class ElevenLabsProvider(TTSProvider):
                 logger.info(f"[ElevenLabsProvider] Creating output directory: {output_dir}")
                 os.makedirs(output_dir, exist_ok=True)
             
-            # Save the audio data to the output file
-            print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.generate_audio: Saving audio to {output_path}...")
-            logger.info(f"[ElevenLabsProvider] Saving audio to {output_path}...")
-            for handler in logging.getLogger().handlers: handler.flush()
-            
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+            # Make the API request and write the audio as it arrives; the file only
+            # replaces output_path once complete, so a dropped stream leaves no partial MP3
+            partial_path = output_path + '.part'
+            with self.session.post(self.stream_url, json=payload, headers=self.headers,
+                                   stream=True, timeout=ELEVENLABS_TIMEOUT) as response:
+                if response.status_code != 200:
+                    print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.generate_audio: API request failed with status code {response.status_code}: {response.text}")
+                    logger.error(f"[ElevenLabsProvider] API request failed with status code {response.status_code}: {response.text}")
+                    return False
+                
+                logger.info(f"[ElevenLabsProvider] Streaming audio to {output_path}...")
+                try:
+                    with open(partial_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                            f.write(chunk)
+                    os.replace(partial_path, output_path)
+                except BaseException:
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+                    raise
             
             print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.generate_audio: Audio successfully saved to {output_path}")
             logger.info(f"[ElevenLabsProvider] Audio successfully saved to {output_path}")
@@ -244,6 +344,117 @@ class ElevenLabsProvider(TTSProvider):
             print(f"[TTS_PROVIDER_PRINT] ElevenLabsProvider.generate_audio finished for: {output_path}")
             for handler in logging.getLogger().handlers: handler.flush()
 
+LOCAL_TTS_ENGINES = ('espeak-ng', 'piper')
+
+
+def _encode_mp3(jobs: Sequence[Tuple[str, str]]) -> List[bool]:
+    """
+    Encode (wav_path, mp3_path) pairs with a single ffmpeg process, so every file in
+    the pipeline stays MP3. Falls back to one process per file if the batch fails.
+    """
+    command = ['ffmpeg', '-y', '-loglevel', 'error']
+    for wav_path, _ in jobs:
+        command += ['-i', wav_path]
+    for index, (_, mp3_path) in enumerate(jobs):
+        command += ['-map', f'{index}:a', '-codec:a', 'libmp3lame', '-q:a', '4', mp3_path]
+    if subprocess.run(command, capture_output=True).returncode == 0:
+        return [True] * len(jobs)
+    results = []
+    for wav_path, mp3_path in jobs:
+        single = ['ffmpeg', '-y', '-loglevel', 'error', '-i', wav_path, '-codec:a', 'libmp3lame', '-q:a', '4', mp3_path]
+        completed = subprocess.run(single, capture_output=True)
+        if completed.returncode != 0:
+            logger.error(f"[LocalTTSProvider] ffmpeg could not encode {mp3_path}: {completed.stderr.decode(errors='replace')}")
+        results.append(completed.returncode == 0)
+    return results
+
+
+class LocalTTSProvider(TTSProvider):
+    """
+    Offline synthesis with a local engine, for draft renders and CI: espeak-ng (one
+    fast process per text) or piper (every text of a batch in one process, the
+    voice model loaded once). Engines write WAV, which ffmpeg encodes to MP3.
+    """
+    
+    supports_batch = True
+    
+    def __init__(self, engine: str = 'espeak-ng', voice: str = 'pt-br', speed: float = 1.0,
+                 executable: Optional[str] = None):
+        logger.info(f"[LocalTTSProvider] Initializing with engine: {engine}, voice: {voice}, speed: {speed}")
+        if engine not in LOCAL_TTS_ENGINES:
+            raise ValueError(f"Unknown local TTS engine '{engine}' (expected one of {', '.join(LOCAL_TTS_ENGINES)})")
+        self.engine = engine
+        self.voice = voice
+        self.speed = speed
+        self.executable = shutil.which(executable or engine)
+        if self.executable is None:
+            raise FileNotFoundError(f"Local TTS engine '{executable or engine}' not found on PATH")
+        if shutil.which('ffmpeg') is None:
+            raise FileNotFoundError("ffmpeg not found on PATH; it is needed to encode local TTS output to MP3")
+        # No network service to overload: as many parallel processes as cores
+        self.max_concurrency = os.cpu_count() or 2
+        logger.info(f"[LocalTTSProvider] Initialized local provider using {self.executable}")
+    
+    def preprocess_text(self, text: str) -> str:
+        """espeak-ng reads SSML, so breaks are kept; piper gets plain text with commas for pauses."""
+        if self.engine == 'espeak-ng':
+            # Escape stray markup characters but keep the <break> tags
+            parts = re.split(r'(<break[^>]*/>)', text)
+            return ''.join(part if part.startswith('<break') else
+                           part.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;') for part in parts)
+        processed_text = re.sub(r'<break[^>]*/>', ', ', text)
+        return re.sub(r'<[^>]+>', '', processed_text).replace('\n', ' ')
+    
+    def cache_identity(self) -> Optional[dict]:
+        return {"provider": "local", "engine": self.engine, "voice": self.voice, "speed": self.speed}
+    
+    def _espeak_wav(self, text: str, wav_path: str) -> bool:
+        # espeak-ng speaks ~175 words per minute at its default rate
+        command = [self.executable, '-v', self.voice, '-s', str(int(175 * self.speed)), '-m', '-w', wav_path, '--stdin']
+        completed = subprocess.run(command, input=self.preprocess_text(text).encode('utf-8'), capture_output=True)
+        if completed.returncode != 0:
+            logger.error(f"[LocalTTSProvider] espeak-ng failed: {completed.stderr.decode(errors='replace')}")
+        return completed.returncode == 0 and os.path.exists(wav_path)
+    
+    def _piper_wavs(self, jobs: Sequence[Tuple[str, str]]) -> List[bool]:
+        # One JSON line per text; piper writes each to its own output_file
+        lines = ''.join(json.dumps({"text": self.preprocess_text(text), "output_file": wav_path}, ensure_ascii=False) + '\n'
+                        for text, wav_path in jobs)
+        command = [self.executable, '--model', self.voice, '--json-input', '--length_scale', str(1.0 / self.speed)]
+        completed = subprocess.run(command, input=lines.encode('utf-8'), capture_output=True)
+        if completed.returncode != 0:
+            logger.error(f"[LocalTTSProvider] piper failed: {completed.stderr.decode(errors='replace')}")
+        return [os.path.exists(wav_path) for _, wav_path in jobs]
+    
+    def generate_audio(self, text: str, output_path: str) -> bool:
+        """Generate audio with the local engine."""
+        return self.generate_audio_batch([(text, output_path)])[0]
+    
+    def generate_audio_batch(self, jobs: Sequence[Tuple[str, str]]) -> List[bool]:
+        """Synthesize every text to WAV, then encode all of them to MP3 in one ffmpeg run."""
+        if not jobs:
+            return []
+        logger.info(f"[LocalTTSProvider] Synthesizing {len(jobs)} texts with {self.engine}")
+        with tempfile.TemporaryDirectory(prefix='local_tts_') as work_dir:
+            wav_jobs = [(text, os.path.join(work_dir, f"{index}.wav")) for index, (text, _) in enumerate(jobs)]
+            try:
+                if self.engine == 'piper':
+                    synthesized = self._piper_wavs(wav_jobs)
+                else:
+                    with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                        synthesized = list(executor.map(lambda job: self._espeak_wav(*job), wav_jobs))
+            except OSError as e:
+                logger.error(f"[LocalTTSProvider] Could not run {self.executable}: {e}")
+                return [False] * len(jobs)
+            encode_jobs = []
+            for (_, wav_path), (_, output_path), ok in zip(wav_jobs, jobs, synthesized):
+                if ok:
+                    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+                    encode_jobs.append((wav_path, output_path))
+            encoded = iter(_encode_mp3(encode_jobs) if encode_jobs else [])
+            return [next(encoded) if ok else False for ok in synthesized]
+
+
 def create_tts_provider(config: dict) -> Optional[TTSProvider]: # Return Optional[TTSProvider]
     """Factory function to create the appropriate TTS provider based on configuration."""
     print("[TTS_PROVIDER_PRINT] create_tts_provider called.")
@@ -287,7 +498,8 @@ def create_tts_provider(config: dict) -> Optional[TTSProvider]: # Return Optiona
                     print("[TTS_PROVIDER_PRINT] create_tts_provider: Attempting to instantiate ElevenLabsProvider.")
                     logger.info("[create_tts_provider] Attempting to instantiate ElevenLabsProvider.")
                     for handler in logging.getLogger().handlers: handler.flush()
-                    return ElevenLabsProvider(api_key, voice_id, model_id)
+                    return ElevenLabsProvider(api_key, voice_id, model_id,
+                                              api_base=elevenlabs_config.get('base_url') or ELEVENLABS_API_BASE)
                 except ImportError: 
                     print("[TTS_PROVIDER_PRINT] create_tts_provider: ImportError during ElevenLabsProvider instantiation. Falling back to gTTS.")
                     logger.error("[create_tts_provider] ImportError during ElevenLabsProvider instantiation. Falling back to gTTS.", exc_info=True)
@@ -297,6 +509,19 @@ def create_tts_provider(config: dict) -> Optional[TTSProvider]: # Return Optiona
                     logger.error(f"[create_tts_provider] Failed to initialize ElevenLabsProvider: {e}. Falling back to gTTS.", exc_info=True)
                     provider_name = 'gtts' 
     
+    if provider_name == 'local':
+        local_config = config.get('local_tts', {})
+        try:
+            return LocalTTSProvider(
+                engine=local_config.get('engine', 'espeak-ng'),
+                voice=local_config.get('voice', 'pt-br'),
+                speed=local_config.get('speed', 1.0),
+                executable=local_config.get('executable')
+            )
+        except Exception as e:
+            logger.error(f"[create_tts_provider] Failed to initialize LocalTTSProvider: {e}. Falling back to gTTS.")
+            provider_name = 'gtts'
+    
     if provider_name == 'gtts':
         print("[TTS_PROVIDER_PRINT] create_tts_provider: gTTS path selected (either directly or as fallback).")
         if gTTS is None:
@@ -310,7 +535,8 @@ def create_tts_provider(config: dict) -> Optional[TTSProvider]: # Return Optiona
             for handler in logging.getLogger().handlers: handler.flush()
             return GTTSProvider(
                 language=tts_config.get('language', 'pt'),
-                slow=tts_config.get('slow', False)
+                slow=tts_config.get('slow', False),
+                base_url=tts_config.get('gtts_base_url')
             )
         except ImportError: 
              print("[TTS_PROVIDER_PRINT] create_tts_provider: ImportError during GTTSProvider instantiation (gTTS lib likely missing).")
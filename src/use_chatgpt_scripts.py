@@ -12,6 +12,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.latex_parser import parse_latex_file, Slide
 from src.image_generator import generate_slide_images
 from src.chatgpt_script_generator import clean_chatgpt_response
+from src.speech_cache import configure_formula_cache
+from src.audio_cache import configure_audio_cache
+from src.run_report import log_run_report
 
 # Audio and video modules are imported only when needed
 AUDIO_VIDEO_AVAILABLE = False
@@ -118,6 +121,8 @@ def main():
     if not config:
         logging.error("Failed to load configuration. Exiting.")
         return
+    configure_formula_cache(config)
+    configure_audio_cache(config)
     
     # Ensure output directories exist
     output_dir = config.get('output_dir', 'output')
@@ -220,6 +225,7 @@ def main():
         
         logging.info(f"--- Video Generation Complete ---")
         logging.info(f"Final video saved to: {final_video_path}")
+        log_run_report()
         print(f"\nSuccess! Final video available at: {final_video_path}")
     except ImportError as e:
         logging.error(f"Failed to import audio/video modules: {e}")
@@ -8,6 +8,8 @@ import yaml
 from natsort import natsorted
 from PIL import Image
 
+from src.atomic_write import atomic_output
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def load_config(config_path: str = '../config/config.yaml') -> Dict:
@@ -158,16 +160,17 @@ def assemble_video(image_files: List[str], audio_files: List[str], config: Dict)
 
     logging.info(f"Writing final video to: {output_path}")
     try:
-        final_clip.write_videofile(
-            output_path,
-            fps=fps,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile='temp-audio.m4a',
-            remove_temp=True,
-            threads=4,
-            logger='bar'
-        )
+        with atomic_output(output_path) as temp_path:
+            final_clip.write_videofile(
+                temp_path,
+                fps=fps,
+                codec='libx264',
+                audio_codec='aac',
+                temp_audiofile='temp-audio.m4a',
+                remove_temp=True,
+                threads=4,
+                logger='bar'
+            )
         logging.info("Video assembly completed successfully.")
         return output_path
     except Exception as e:
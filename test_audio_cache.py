@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from src.tts_provider import TTSProvider
+from src.tts_pool import TTSPool
+from src.audio_cache import configure_audio_cache, set_audio_cache, audio_key
+from src import audio_generator
+
+
+class RecordingProvider(TTSProvider):
+    def __init__(self, voice="ney"):
+        self.voice = voice
+        self.texts = []
+
+    def cache_identity(self):
+        return {"provider": "recording", "voice_id": self.voice}
+
+    def generate_audio(self, text, output_path):
+        self.texts.append(text)
+        with open(output_path, 'wb') as f:
+            f.write(f"{self.voice}:{text}".encode('utf-8'))
+        return True
+
+
+@pytest.fixture
+def audio_cache(tmp_path):
+    cache = configure_audio_cache({'cache': {'dir': str(tmp_path / "cache")}})
+    yield cache
+    set_audio_cache(None)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_key_depends_on_voice_and_normalized_text():
+    assert audio_key(RecordingProvider(), "Olá  mundo\n") == audio_key(RecordingProvider(), "Olá mundo")
+    assert audio_key(RecordingProvider(), "Olá mundo") != audio_key(RecordingProvider(voice="sarah"), "Olá mundo")
+    assert audio_key(RecordingProvider(), "Olá mundo") != audio_key(RecordingProvider(), "Olá, mundo")
+
+
+def test_unchanged_narration_is_not_synthesized_again(audio_cache, tmp_path):
+    provider = RecordingProvider()
+    config = {'output_dir': str(tmp_path / "deck")}
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(audio_generator, 'create_tts_provider', lambda config: provider)
+        audio_generator.generate_all_audio(["Um", "Dois"], config)
+        second = audio_generator.generate_all_audio(["Um", "Dois alterado"], config)
+    assert sorted(provider.texts) == ["Dois", "Dois alterado", "Um"]
+    assert _read(second[0]) == b"ney:Um"
+    assert _read(second[1]) == b"ney:Dois alterado"
+    assert audio_cache.hits == 1
+
+
+def test_workers_share_the_cache_directory(audio_cache, tmp_path):
+    TTSPool(RecordingProvider()).synthesize("Texto compartilhado", str(tmp_path / "a.mp3"))
+    # A second worker process would open its own ContentCache on the same directory
+    set_audio_cache(None)
+    configure_audio_cache({'cache': {'dir': str(tmp_path / "cache")}})
+    other = RecordingProvider()
+    assert TTSPool(other).synthesize("Texto compartilhado", str(tmp_path / "b.mp3"))
+    assert other.texts == []
+    assert _read(tmp_path / "b.mp3") == b"ney:Texto compartilhado"
+
+
+def test_hardlinked_output_is_not_rewritten_in_place(tmp_path):
+    cache = configure_audio_cache({'cache': {'dir': str(tmp_path / "cache"), 'audio_hardlinks': True}})
+    try:
+        output = str(tmp_path / "audio_1.mp3")
+        TTSPool(RecordingProvider()).synthesize("Texto", output)
+        TTSPool(RecordingProvider()).synthesize("Texto", output)
+        assert os.stat(output).st_nlink == 2
+        TTSPool(RecordingProvider(voice="sarah")).synthesize("Texto", output)
+        assert _read(output) == b"sarah:Texto"
+        assert _read(cache.path_for(audio_key(RecordingProvider(), "Texto"))) == b"ney:Texto"
+    finally:
+        set_audio_cache(None)
+
+
+def test_least_recently_used_audio_is_evicted(tmp_path):
+    cache = configure_audio_cache({'cache': {'dir': str(tmp_path / "cache"), 'audio_max_mb': 30 / (1024 * 1024)}})
+    try:
+        provider = RecordingProvider()
+        pool = TTSPool(provider)
+        for text in ["primeiro", "segundo", "terceiro"]:
+            pool.synthesize(text, str(tmp_path / f"{text}.mp3"))
+        assert not cache.contains(audio_key(provider, "primeiro"))
+        assert cache.contains(audio_key(provider, "terceiro"))
+    finally:
+        set_audio_cache(None)
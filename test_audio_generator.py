@@ -72,3 +72,14 @@ def test_generate_all_audio_empty_narrations(sample_config):
     with patch('src.audio_generator.create_tts_provider', return_value=mock_provider):
         audio_paths = audio_generator.generate_all_audio(narrations, sample_config)
     assert audio_paths == []
+
+def test_generate_all_audio_only_synthesizes_given_slides(sample_config):
+    narrations = ["Texto 1", "Texto 2", "Texto 3"]
+    mock_provider = MagicMock()
+    mock_provider.generate_audio.return_value = True
+
+    with patch('src.audio_generator.create_tts_provider', return_value=mock_provider):
+        audio_paths = audio_generator.generate_all_audio(narrations, sample_config, only=[1])
+
+    assert [call.args[0] for call in mock_provider.generate_audio.call_args_list] == ["Texto 2"]
+    assert [os.path.basename(path) for path in audio_paths] == ["audio_1.mp3", "audio_2.mp3", "audio_3.mp3"]
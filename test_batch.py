@@ -0,0 +1,53 @@
+import os
+import threading
+
+from src import batch
+
+
+def _deck(path, body="\\documentclass{beamer}\n\\begin{document}\\end{document}\n"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(body)
+    return str(path)
+
+
+def test_decks_are_found_and_named(tmp_path):
+    first = _deck(tmp_path / "calculo" / "aula.tex")
+    second = _deck(tmp_path / "fisica" / "aula.tex")
+    _deck(tmp_path / "fisica" / "secao.tex", body="\\section{Parte}\n")
+    decks = batch.find_decks([str(tmp_path)])
+    assert decks == [first, second]
+    assert batch.deck_names(decks) == ["calculo-aula", "fisica-aula"]
+    assert batch.find_decks([str(tmp_path / "*" / "aula.tex"), first]) == [first, second]
+
+
+def test_decks_share_the_stage_pool_and_get_their_own_output(tmp_path, monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_pipeline(latex_file, config, executor=None, **options):
+        with lock:
+            calls.append((os.path.basename(os.path.dirname(latex_file)), config['output_dir'], executor, options))
+        if 'quebrado' in latex_file:
+            raise RuntimeError("pdflatex failed")
+        return {'latex_file': latex_file, 'video': os.path.join(config['output_dir'], 'final_video.mp4'),
+                'error': None, 'seconds': 0.1, 'reports': {'pipeline': 'Pipeline: ok'}}
+
+    monkeypatch.setattr(batch, 'run_pipeline', fake_pipeline)
+    decks = [_deck(tmp_path / name / f"{name}.tex") for name in ("a", "b", "quebrado")]
+    config = {'output_dir': str(tmp_path / "out"), 'cache': {'dir': str(tmp_path / "cache"), 'formula_speech': False, 'audio': False}}
+    results = batch.run_batch(decks, config, parallel_decks=2, incremental=True)
+
+    assert [result['name'] for result in results] == ["a", "b", "quebrado"]
+    assert [bool(result['video']) for result in results] == [True, True, False]
+    assert results[2]['error'] == "pdflatex failed"
+    assert sorted(call[1] for call in calls) == [str(tmp_path / "out" / name) for name in ("a", "b", "quebrado")]
+    assert len({id(call[2]) for call in calls}) == 1
+    assert all(call[3] == {'incremental': True} for call in calls)
+    # The caller's config is left alone
+    assert config['output_dir'] == str(tmp_path / "out")
+
+    lines = batch.summary_lines(results, 1.0)
+    assert lines[-1].startswith("2/3 decks done, 1 failed")
+    batch.write_summary(results, str(tmp_path / "out" / batch.SUMMARY_FILENAME))
+    assert os.path.exists(tmp_path / "out" / batch.SUMMARY_FILENAME)
@@ -0,0 +1,66 @@
+import os
+import json
+import pytest
+
+from src.batch_generation import LocalBatchBackend, run_batch, write_batch_file, load_batch_state
+from src.llm_cache import configure_llm_cache, set_llm_cache
+
+CONFIG = {'openai': {'model': 'gpt-4o', 'temperature': 0.7, 'max_tokens': 500}}
+
+
+def _prompts(count):
+    return [{"slide_number": i, "title": f"Slide {i}", "prompt": f"# Slide {i}\n\nConteúdo {i}"}
+            for i in range(1, count + 1)]
+
+
+def _responder(body):
+    return "Narração: " + body["messages"][-1]["content"].splitlines()[0]
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    return {name: str(tmp_path / name) for name in ("endpoint", "batch", "responses", "cache")}
+
+
+def test_batch_file_has_one_request_per_slide(tmp_path):
+    path = str(tmp_path / "batch.jsonl")
+    write_batch_file(_prompts(3), CONFIG, path)
+    with open(path, encoding='utf-8') as f:
+        requests = [json.loads(line) for line in f]
+    assert [r["custom_id"] for r in requests] == ["slide-1", "slide-2", "slide-3"]
+    assert requests[0]["url"] == "/v1/chat/completions"
+    assert requests[0]["body"]["max_tokens"] == 500
+
+
+def test_batch_results_are_imported_into_responses(dirs):
+    backend = LocalBatchBackend(dirs["endpoint"], _responder, polls_until_complete=2)
+    answered = run_batch(_prompts(3), backend, CONFIG, dirs["batch"], dirs["responses"], poll_interval=0)
+    assert answered == [1, 2, 3]
+    with open(os.path.join(dirs["responses"], "slide_2_response.txt"), encoding='utf-8') as f:
+        assert f.read() == "Narração: # Slide 2"
+    assert load_batch_state(dirs["batch"])["status"] == "imported"
+
+
+def test_interrupted_job_is_resumed_by_id(dirs):
+    backend = LocalBatchBackend(dirs["endpoint"], _responder, polls_until_complete=3)
+    assert run_batch(_prompts(2), backend, CONFIG, dirs["batch"], dirs["responses"], timeout=0) is None
+    batch_id = load_batch_state(dirs["batch"])["batch_id"]
+
+    # A later run picks up the same job instead of submitting a new one
+    backend = LocalBatchBackend(dirs["endpoint"], _responder, polls_until_complete=3)
+    assert run_batch(_prompts(2), backend, CONFIG, dirs["batch"], dirs["responses"], poll_interval=0) == [1, 2]
+    assert load_batch_state(dirs["batch"])["batch_id"] == batch_id
+    assert os.listdir(os.path.join(dirs["endpoint"], "batches")) == [batch_id + ".json"]
+
+
+def test_cached_slides_are_left_out_of_the_batch(dirs):
+    configure_llm_cache({'cache': {'dir': dirs["cache"]}})
+    try:
+        backend = LocalBatchBackend(dirs["endpoint"], _responder)
+        run_batch(_prompts(2), backend, CONFIG, dirs["batch"], dirs["responses"], poll_interval=0)
+
+        answered = run_batch(_prompts(3), backend, CONFIG, dirs["batch"], dirs["responses"], poll_interval=0)
+        assert sorted(answered) == [1, 2, 3]
+        assert load_batch_state(dirs["batch"])["slide_numbers"] == [3]
+    finally:
+        set_llm_cache(None)
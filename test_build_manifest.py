@@ -0,0 +1,120 @@
+import os
+
+from src import main as pipeline
+from src.build_manifest import BuildManifest, MANIFEST_FILENAME, tts_params, recorded_latex_inputs
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_node_is_fresh_until_inputs_or_outputs_change(tmp_path):
+    manifest = BuildManifest(str(tmp_path / MANIFEST_FILENAME))
+    audio = _write(tmp_path / "audio_1.mp3", b'abc')
+    manifest.record('audio/0', 'key-1', [audio])
+
+    assert manifest.is_fresh('audio/0', 'key-1')
+    assert not manifest.is_fresh('audio/0', 'key-2')
+    assert not manifest.is_fresh('audio/1', 'key-1')
+
+    # Rewritten with the same bytes: still fresh, the hash decides
+    _write(audio, b'abc')
+    os.utime(audio, ns=(1, 1))
+    assert manifest.is_fresh('audio/0', 'key-1')
+    _write(audio, b'abd')
+    assert not manifest.is_fresh('audio/0', 'key-1')
+    os.remove(audio)
+    assert not manifest.is_fresh('audio/0', 'key-1')
+
+
+def test_manifest_survives_a_new_run(tmp_path):
+    path = str(tmp_path / MANIFEST_FILENAME)
+    images = [_write(tmp_path / f"slide_{k}.png", b'png%d' % k) for k in (1, 2, 3)]
+    audio = [_write(tmp_path / f"audio_{k}.mp3", b'mp3%d' % k) for k in (1, 2)]
+    first = BuildManifest(path)
+    first.record('images', 'images-key', images, {'slides': 2})
+    for index, audio_path in enumerate(audio):
+        first.record(f'audio/{index}', f'audio-key-{index}', [audio_path])
+
+    second = BuildManifest(path)
+    assert second.is_fresh('images', 'images-key')
+    assert second.outputs('images') == images
+    # Only the content slides, in order, without guessing from file names
+    assert second.slide_artifacts() == {'images': images[:2], 'audio': audio}
+    assert 'images' in open(path, encoding='utf-8').read()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_incomplete_deck_has_no_artifacts(tmp_path):
+    manifest = BuildManifest(str(tmp_path / MANIFEST_FILENAME))
+    manifest.record('images', 'images-key', [_write(tmp_path / "slide_1.png", b'png')], {'slides': 1})
+    assert manifest.slide_artifacts() is None
+
+
+def test_tts_params_ignore_scheduling_and_secrets():
+    config = {'tts': {'provider': 'elevenlabs', 'concurrency': 4, 'language': 'pt', 'gtts_base_url': 'http://127.0.0.1:1'},
+              'elevenlabs': {'api_key': 'secret', 'voice_id': 'v1', 'base_url': 'http://127.0.0.1:1/v1'}}
+    assert tts_params(config) == {'tts': {'provider': 'elevenlabs', 'language': 'pt'},
+                                  'elevenlabs': {'voice_id': 'v1'}}
+
+
+def test_recorded_inputs_skip_generated_and_distribution_files(tmp_path):
+    fls = _write(tmp_path / "aula.fls", (
+        f"PWD {tmp_path}\n"
+        "INPUT /usr/share/texmf/tex/latex/beamer/beamer.cls\n"
+        "INPUT aula.tex\n"
+        "INPUT ./partes/intro.tex\n"
+        "INPUT aula.aux\n"
+        "OUTPUT aula.aux\n"
+        "INPUT figuras/grafico.png\n"
+        "INPUT aula.tex\n").encode())
+    assert recorded_latex_inputs(fls, str(tmp_path)) == [
+        "aula.tex", os.path.join("figuras", "grafico.png"), os.path.join("partes", "intro.tex")]
+    assert recorded_latex_inputs(str(tmp_path / "missing.fls"), str(tmp_path)) is None
+
+
+def test_incremental_rebuilds_images_when_an_input_file_changes(tmp_path, monkeypatch):
+    deck_dir = tmp_path / "deck"
+    deck_dir.mkdir()
+    deck = _write(deck_dir / "aula.tex", b"\\documentclass{beamer}\\input{parte}")
+    part = _write(deck_dir / "parte.tex", b"\\begin{frame}Um\\end{frame}")
+    notes = _write(deck_dir / "notas.tex", b"rascunho")
+    compiles = []
+
+    def fake_images(latex_file, slides, config):
+        compiles.append(latex_file)
+        # What pdflatex -recorder leaves next to the deck
+        _write(deck_dir / "aula.fls", f"PWD {deck_dir}\nINPUT aula.tex\nINPUT parte.tex\n".encode())
+        slides_dir = os.path.join(config['output_dir'], 'slides')
+        return [_write(os.path.join(slides_dir, f"slide_{i + 1}.png"), f"png {len(compiles)}".encode())
+                for i in range(len(slides))]
+
+    def fake_audio(narrations, config, on_audio_ready=None, only=None):
+        paths = []
+        for index, narration in enumerate(narrations):
+            paths.append(_write(os.path.join(config['output_dir'], 'audio', f"audio_{index + 1}.mp3"), narration.encode()))
+            if on_audio_ready and (only is None or index in only):
+                on_audio_ready(index, paths[-1])
+        return paths
+
+    monkeypatch.setattr(pipeline, 'parse_latex_file', lambda latex_file: ['slide'])
+    monkeypatch.setattr(pipeline, 'generate_slide_images', fake_images)
+    monkeypatch.setattr(pipeline, 'generate_all_narrations', lambda slides, config: ['Olá'])
+    monkeypatch.setattr(pipeline, 'generate_all_audio', fake_audio)
+    monkeypatch.setattr(pipeline, 'assemble_video', lambda images, audio, config: _write(
+        os.path.join(config['output_dir'], 'final_video.mp4'), b"mp4"))
+
+    def run():
+        config = {'output_dir': str(tmp_path / "output"),
+                  'cache': {'dir': str(tmp_path / "cache"), 'formula_speech': False, 'audio': False}}
+        return pipeline.run_pipeline(deck, config, incremental=True)
+
+    assert run()['video']
+    assert run()['video'] and len(compiles) == 1
+    # A file the deck never read does not matter
+    _write(notes, b"outro rascunho")
+    assert run()['video'] and len(compiles) == 1
+    _write(part, b"\\begin{frame}Dois\\end{frame}")
+    assert run()['video'] and len(compiles) == 2
@@ -0,0 +1,135 @@
+import json
+import os
+
+from src.tts_provider import TTSProvider
+from src.tts_pool import TTSPool
+from src.chunked_tts import split_tts_chunks, plan_tts_chunks, synthesize_chunked, timing_path
+from src.audio_utils import mp3_duration, silence_like
+from src import audio_cache
+
+# One MPEG-1 Layer III frame at 44.1 kHz: 1152 samples
+FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+class FrameProvider(TTSProvider):
+    """Writes one silent frame per word, so the duration of a clip follows its text."""
+
+    def __init__(self):
+        self.texts = []
+
+    def cache_identity(self):
+        return {"provider": "frames"}
+
+    def generate_audio(self, text, output_path):
+        self.texts.append(text)
+        with open(output_path, 'wb') as f:
+            f.write(FRAME * len(text.split()))
+        return True
+
+
+def test_split_keeps_breaks_at_chunk_ends():
+    text = ('Considere a função f definida no intervalo fechado. <break time="0.5s"/> '
+            'Ela é contínua em todo o domínio considerado aqui. E também é derivável em todos os pontos.')
+    assert split_tts_chunks(text) == [
+        'Considere a função f definida no intervalo fechado. <break time="0.5s"/>',
+        'Ela é contínua em todo o domínio considerado aqui.',
+        'E também é derivável em todos os pontos.',
+    ]
+
+
+def test_rendered_breaks_become_pauses():
+    text = 'A derivada de x ao quadrado <break time="0.5s"/> é dois x <break time="250ms"/>.'
+    assert plan_tts_chunks(text, sentences=False, render_breaks=True) == (0.0, [
+        ('A derivada de x ao quadrado', 0.5),
+        ('é dois x', 0.25),
+        ('.', 0.0),
+    ])
+    # A narration that opens with a formula starts with a pause, kept ahead of the first chunk
+    text = '<break time="0.3s"/> x ao quadrado <break time="0.5s"/> é a área.'
+    assert plan_tts_chunks(text, sentences=False, render_breaks=True) == (0.3, [
+        ('x ao quadrado', 0.5),
+        ('é a área.', 0.0),
+    ])
+    assert plan_tts_chunks(text, sentences=False) == (0.0, [
+        ('<break time="0.3s"/> x ao quadrado <break time="0.5s"/>', 0.0),
+        ('é a área.', 0.0),
+    ])
+
+
+def test_mp3_duration_counts_frames(tmp_path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b'ID3\x03\x00\x00\x00\x00\x00\x02ab' + FRAME * 10)
+    assert abs(mp3_duration(str(path)) - 10 * 1152 / 44100) < 1e-9
+
+
+def test_chunks_are_joined_with_timing(tmp_path):
+    text = ('Primeira frase com exatamente oito palavras aqui dentro. '
+            'Segunda frase bem mais curta que a outra.')
+    output = str(tmp_path / "audio_1.mp3")
+    assert synthesize_chunked(TTSPool(FrameProvider(), concurrency=2), [(text, output)]) == [True]
+
+    with open(output, 'rb') as f:
+        assert f.read() == FRAME * 16
+    with open(timing_path(output), encoding='utf-8') as f:
+        timing = json.load(f)
+    frame = 1152 / 44100
+    assert [c["text"] for c in timing["chunks"]] == split_tts_chunks(text)
+    assert timing["chunks"][1]["start"] == round(8 * frame, 3)
+    assert timing["duration"] == round(16 * frame, 3)
+    assert sorted(os.listdir(tmp_path)) == ["audio_1.mp3", "audio_1.timing.json"]
+
+
+def test_edited_sentence_is_the_only_one_resynthesized(tmp_path):
+    audio_cache.configure_audio_cache({'cache': {'dir': str(tmp_path / 'cache')}})
+    try:
+        provider = FrameProvider()
+        pool = TTSPool(provider)
+        first = 'Esta frase não muda entre as duas versões do roteiro. Esta frase vai ser editada depois.'
+        second = 'Esta frase não muda entre as duas versões do roteiro. Esta frase foi editada agora mesmo.'
+        synthesize_chunked(pool, [(first, str(tmp_path / "audio_1.mp3"))])
+        provider.texts.clear()
+        synthesize_chunked(pool, [(second, str(tmp_path / "audio_1.mp3"))])
+        assert provider.texts == ['Esta frase foi editada agora mesmo.']
+    finally:
+        audio_cache.set_audio_cache(None)
+
+
+def test_breaks_are_spliced_as_silence(tmp_path):
+    provider = FrameProvider()
+    output = str(tmp_path / "audio_1.mp3")
+    text = 'Um dois três <break time="0.5s"/> quatro cinco'
+    assert synthesize_chunked(TTSPool(provider), [(text, output)], sentences=False, render_breaks=True) == [True]
+    assert sorted(provider.texts) == ['Um dois três', 'quatro cinco']
+
+    silence = silence_like(FRAME, 0.5)
+    frame = 1152 / 44100
+    assert len(silence) == 417 * round(0.5 / frame)
+    with open(output, 'rb') as f:
+        assert f.read() == FRAME * 3 + silence + FRAME * 2
+    with open(timing_path(output), encoding='utf-8') as f:
+        chunks = json.load(f)["chunks"]
+    assert chunks[1]["start"] == round(3 * frame + 0.5, 3)
+
+
+def test_leading_break_is_spliced_before_the_first_chunk(tmp_path):
+    output = str(tmp_path / "audio_1.mp3")
+    text = '<break time="0.5s"/> Um dois três'
+    assert synthesize_chunked(TTSPool(FrameProvider()), [(text, output)], sentences=False, render_breaks=True) == [True]
+
+    with open(output, 'rb') as f:
+        assert f.read() == silence_like(FRAME, 0.5) + FRAME * 3
+    with open(timing_path(output), encoding='utf-8') as f:
+        assert json.load(f)["chunks"][0]["start"] == 0.5
+
+
+def test_each_text_is_reported_once_its_chunks_are_joined(tmp_path):
+    jobs = [('Uma frase curta para o primeiro slide. E mais uma frase para ele.', str(tmp_path / "audio_1.mp3")),
+            ('O segundo slide tem apenas esta frase aqui.', str(tmp_path / "audio_2.mp3"))]
+    ready = []
+
+    def on_done(index, success):
+        # The joined file must already exist when a text is reported
+        ready.append((index, success, os.path.exists(jobs[index][1])))
+
+    assert synthesize_chunked(TTSPool(FrameProvider(), concurrency=3), jobs, on_done=on_done) == [True, True]
+    assert sorted(ready) == [(0, True, True), (1, True, True)]
@@ -0,0 +1,91 @@
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import tts_provider
+from src.tts_provider import ElevenLabsProvider
+
+AUDIO = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.voice_checks += 1
+        if self.path.endswith('/voices/good'):
+            self._send(200, json.dumps({"voice_id": "good", "name": "Test"}).encode(), 'application/json')
+        else:
+            self._send(404, b'{"detail": "voice_not_found"}', 'application/json')
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.paths.append(self.path)
+        if self.server.fail_stream:
+            self._send(500, b'{"detail": "boom"}', 'application/json')
+        else:
+            self._send(200, AUDIO * 50, 'audio/mpeg')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.voice_checks = 0
+    server.paths = []
+    server.fail_stream = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.base = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    yield server
+    server.shutdown()
+    tts_provider._sessions.clear()
+    tts_provider._validated_voices.clear()
+
+
+def test_voice_is_validated_once_per_key(api):
+    ElevenLabsProvider("key", "good", "model", api_base=api.base)
+    ElevenLabsProvider("key", "good", "model", api_base=api.base)
+    assert api.voice_checks == 1
+
+
+def test_unknown_voice_is_rejected(api):
+    with pytest.raises(Exception):
+        ElevenLabsProvider("key", "missing", "model", api_base=api.base)
+
+
+def test_streams_to_disk_over_one_connection(api, tmp_path):
+    provider = ElevenLabsProvider("key", "good", "model", api_base=api.base)
+    for i in range(3):
+        assert provider.generate_audio(f"Slide {i}", str(tmp_path / f"audio_{i}.mp3"))
+    assert (tmp_path / "audio_2.mp3").read_bytes() == AUDIO * 50
+    assert api.paths == ["/v1/text-to-speech/good/stream"] * 3
+    assert api.connections == 1
+
+
+def test_failed_request_leaves_no_file(api, tmp_path):
+    provider = ElevenLabsProvider("key", "good", "model", api_base=api.base)
+    api.fail_stream = True
+    output = tmp_path / "audio_0.mp3"
+    assert not provider.generate_audio("Slide", str(output))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,66 @@
+import os
+import pytest
+
+from src.content_cache import ContentCache, content_key
+from src.llm_cache import configure_llm_cache, set_llm_cache, get_llm_cache, request_key
+from src.automated_video_generation import generate_all_scripts
+from test_rate_limit import mock_api, _client_and_config, _slides
+
+
+@pytest.fixture
+def llm_cache(tmp_path):
+    cache = configure_llm_cache({'cache': {'dir': str(tmp_path / "cache")}})
+    yield cache
+    set_llm_cache(None)
+
+
+def test_content_cache_round_trip(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=1024)
+    key = content_key("gpt-4o", 0.7, "prompt")
+    assert cache.get(key) is None
+    path = cache.put(key, b"resposta")
+    assert path == os.path.join(str(tmp_path), key[:2], key)
+    assert cache.get(key) == b"resposta"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_content_cache_evicts_least_recently_used(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=250)
+    keys = [content_key(i) for i in range(5)]
+    for age, key in enumerate(keys):
+        path = cache.put(key, b"x" * 60)
+        os.utime(path, (age, age))
+    assert not cache.contains(keys[0])
+    assert cache.contains(keys[-1])
+
+
+def test_request_key_covers_sampling_settings():
+    request = {'model': 'gpt-4o', 'temperature': 0.7, 'max_tokens': 1000,
+               'messages': [{'role': 'system', 'content': 's'}, {'role': 'user', 'content': 'p'}]}
+    assert request_key(request) == request_key(dict(request))
+    assert request_key(request) != request_key({**request, 'temperature': 0.2})
+    assert request_key(request) != request_key({**request, 'messages': request['messages'][1:]})
+
+
+def test_unchanged_slides_are_not_sent_again(mock_api, tmp_path, llm_cache):
+    client, config = _client_and_config(mock_api, tmp_path, concurrency=4)
+    first = generate_all_scripts(_slides(3), client, config)
+    assert mock_api.stats["requests"] == 3
+
+    assert generate_all_scripts(_slides(3), client, config) == first
+    assert mock_api.stats["requests"] == 3
+    assert get_llm_cache().hits == 3
+
+    # Editing one slide only sends that slide
+    slides = _slides(3)
+    slides[1].content = "Conteúdo editado"
+    generate_all_scripts(slides, client, config)
+    assert mock_api.stats["requests"] == 4
+
+
+def test_reroll_bypasses_cached_responses(mock_api, tmp_path, llm_cache):
+    client, config = _client_and_config(mock_api, tmp_path)
+    generate_all_scripts(_slides(2), client, config)
+    config['openai']['reroll'] = True
+    generate_all_scripts(_slides(2), client, config)
+    assert mock_api.stats["requests"] == 4
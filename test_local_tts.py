@@ -0,0 +1,73 @@
+import os
+import sys
+import shutil
+import stat
+
+import pytest
+
+from src.tts_provider import TTSProvider, LocalTTSProvider, GTTSProvider, create_tts_provider
+from src.tts_pool import TTSPool
+
+
+class BatchProvider(TTSProvider):
+    """Batch-capable double that fails the texts in `fail` on the first batch only."""
+
+    supports_batch = True
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.batches = []
+        self.single = []
+
+    def cache_identity(self):
+        return None
+
+    def generate_audio(self, text, output_path):
+        self.single.append(text)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return True
+
+    def generate_audio_batch(self, jobs):
+        self.batches.append([text for text, _ in jobs])
+        results = []
+        for text, output_path in jobs:
+            if text in self.fail:
+                results.append(False)
+                continue
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            results.append(True)
+        return results
+
+
+def test_pool_sends_one_batch_and_retries_failures_singly(tmp_path):
+    provider = BatchProvider(fail={"b"})
+    jobs = [(text, str(tmp_path / f"{text}.mp3")) for text in "abc"]
+    assert TTSPool(provider).synthesize_all(jobs) == [True, True, True]
+    assert provider.batches == [["a", "b", "c"]]
+    assert provider.single == ["b"]
+
+
+def test_missing_engine_falls_back_to_gtts():
+    config = {'tts': {'provider': 'local'}, 'local_tts': {'executable': 'no-such-tts-engine'}}
+    assert isinstance(create_tts_provider(config), GTTSProvider)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg is needed to encode MP3")
+def test_espeak_batch_produces_mp3(tmp_path):
+    # Stand-in for espeak-ng that writes a short silent WAV to the -w path
+    fake = tmp_path / "fake-espeak"
+    fake.write_text(
+        f"#!{sys.executable}\n"
+        "import sys, wave\n"
+        "path = sys.argv[sys.argv.index('-w') + 1]\n"
+        "sys.stdin.read()\n"
+        "with wave.open(path, 'wb') as w:\n"
+        "    w.setnchannels(1); w.setsampwidth(2); w.setframerate(22050)\n"
+        "    w.writeframes(b'\\x00\\x00' * 2205)\n")
+    fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+    provider = LocalTTSProvider(executable=str(fake))
+    jobs = [(f"Slide {i}", str(tmp_path / f"audio_{i}.mp3")) for i in range(1, 4)]
+    assert provider.generate_audio_batch(jobs) == [True, True, True]
+    assert all(os.path.getsize(path) > 0 for _, path in jobs)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import unittest
+import sys
+import os
+
+# Add the parent directory to the path so we can import from src
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.math_speech import latex_to_speech_pt, parse_math, speech_cache_info, Frac, Environment
+from src.chatgpt_script_generator import clean_chatgpt_response, math_spans_to_speech
+
+
+class TestMathSpeech(unittest.TestCase):
+    """Test cases for the AST-based math speech engine."""
+
+    def test_simple_formulas(self):
+        test_cases = [
+            (r"E = mc^2", "E igual a m c ao quadrado"),
+            (r"\sqrt[3]{x}", "a raiz cúbica de x"),
+            (r"\frac{a}{b}", "a dividido por b"),
+            (r"x \leq y", "x menor ou igual a ipsilon"),
+            (r"\alpha + \Omega", "alfa mais ômega maiúsculo"),
+            (r"\sum_{i=1}^{n} x_i", "o somatório de i igual a 1 até n de x índice i"),
+        ]
+        for latex, expected in test_cases:
+            self.assertEqual(latex_to_speech_pt(latex), expected)
+
+    def test_nested_fractions(self):
+        tree = parse_math(r"\frac{\frac{a}{b}}{c + 1}")
+        self.assertIsInstance(tree.items[0], Frac)
+        self.assertIsInstance(tree.items[0].numerator.items[0], Frac)
+        self.assertEqual(
+            latex_to_speech_pt(r"\frac{\frac{a}{b}}{c + 1}"),
+            "a fração com numerador a dividido por b e denominador c mais 1",
+        )
+
+    def test_deeply_nested_fraction_has_no_leftover_markup(self):
+        formula = "x"
+        for _ in range(50):
+            formula = rf"\frac{{{formula}}}{{2}}"
+        result = latex_to_speech_pt(formula)
+        self.assertEqual(result.count("denominador 2"), 49)
+        self.assertNotRegex(result, r"[\\{}]")
+
+    def test_derivatives(self):
+        self.assertEqual(latex_to_speech_pt(r"\frac{\partial L}{\partial x} = 0"),
+                         "a derivada parcial de L em relação a x igual a 0")
+        self.assertEqual(latex_to_speech_pt(r"\frac{dy}{dx}"),
+                         "a derivada de ipsilon em relação a x")
+
+    def test_vector_operators(self):
+        self.assertEqual(latex_to_speech_pt(r"\nabla \times \vec{E}"), "o rotacional de o vetor E")
+        self.assertEqual(latex_to_speech_pt(r"\nabla \cdot \vec{E}"), "o divergente de o vetor E")
+        self.assertEqual(latex_to_speech_pt(r"\nabla^2 \psi"), "o laplaciano de psi")
+
+    def test_environments(self):
+        tree = parse_math(r"\begin{bmatrix} a & b \\ c & d \end{bmatrix}")
+        self.assertIsInstance(tree.items[0], Environment)
+        self.assertEqual(len(tree.items[0].rows), 2)
+        self.assertEqual(latex_to_speech_pt(r"\begin{bmatrix} a & b \\ c & d \end{bmatrix}"),
+                         "a matriz com linhas a, b; c, d; fim da matriz")
+        self.assertEqual(latex_to_speech_pt(r"\begin{align} E &= mc^2 \\ F &= ma \end{align}"),
+                         "E igual a m c ao quadrado. F igual a m a")
+
+    def test_results_are_memoized(self):
+        latex_to_speech_pt(r"p = m v_{memo}")
+        hits_before = speech_cache_info().hits
+        # Whitespace differences normalize to the same cache entry
+        latex_to_speech_pt(r"p  =  m v_{memo}")
+        self.assertEqual(speech_cache_info().hits, hits_before + 1)
+
+    def test_cleaner_uses_engine_for_delimited_math(self):
+        cleaned = clean_chatgpt_response(r"A razão é \( \frac{\frac{1}{2}}{x} \), como vimos.")
+        self.assertEqual(cleaned, "A razão é a fração com numerador 1 dividido por 2 e denominador x, como vimos.")
+
+    def test_currency_signs_are_not_math_delimiters(self):
+        text = "O livro custa R$ 20 e o caderno R$ 5."
+        self.assertEqual(math_spans_to_speech(text), text)
+        self.assertEqual(clean_chatgpt_response(text), "O livro custa R 20 e o caderno R 5.")
+
+    def test_inline_math_does_not_cross_lines(self):
+        self.assertEqual(math_spans_to_speech("Custa $5 hoje.\nSeja $x^2$."),
+                         "Custa $5 hoje.\nSeja  x ao quadrado .")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from src.mock_openai_server import MockOpenAIServer
+from src.automated_video_generation import initialize_openai_client, generate_script_with_openai
+from src.batch_generation import OpenAIBatchBackend, run_batch
+from src.rate_limit import RateLimiter
+
+
+def _config(server, tmp_path):
+    return {'output_dir': str(tmp_path), 'openai': {'model': 'gpt-4o', 'base_url': server.base_url}}
+
+
+def _prompt(number):
+    return {"slide_number": number, "title": f"Slide {number}", "prompt": f"# Slide {number}\n\nConteúdo"}
+
+
+def test_client_without_api_key_can_use_a_local_server(tmp_path):
+    assert initialize_openai_client({'openai': {}}) is None
+    with MockOpenAIServer() as server:
+        client = initialize_openai_client(_config(server, tmp_path))
+        response = client.chat.completions.create(
+            model='gpt-4o', messages=[{"role": "user", "content": "# Derivadas\n\nTexto"}])
+    assert response.choices[0].message.content == "Narração de Derivadas."
+    assert response.usage.prompt_tokens > 0
+
+
+def test_streamed_answer_ends_with_usage(tmp_path):
+    with MockOpenAIServer() as server:
+        client = initialize_openai_client(_config(server, tmp_path))
+        stream = client.chat.completions.create(
+            model='gpt-4o', stream=True, stream_options={"include_usage": True},
+            messages=[{"role": "user", "content": "# Integrais por partes\n\nTexto"}])
+        chunks = list(stream)
+    text = ''.join(c.choices[0].delta.content or '' for c in chunks if c.choices)
+    assert text == "Narração de Integrais por partes."
+    assert len(chunks) > 3
+    assert chunks[-1].usage.completion_tokens > 0
+
+
+def test_injected_errors_and_rate_limits(tmp_path):
+    with MockOpenAIServer(error_rate=1.0) as server:
+        config = _config(server, tmp_path)
+        client = initialize_openai_client(config)
+        # Server errors are retried, then the slide gets no script
+        assert generate_script_with_openai(client, _prompt(1), config, RateLimiter(max_retries=1)) == ""
+        assert server.stats["errors"] == 2
+
+    with MockOpenAIServer(throttle_first=2, retry_after=0) as server:
+        config = _config(server, tmp_path)
+        client = initialize_openai_client(config)
+        assert generate_script_with_openai(client, _prompt(1), config, RateLimiter()) == "Narração de Slide 1."
+        assert (server.stats["throttled"], server.stats["completions"]) == (2, 1)
+
+
+def test_batch_endpoints(tmp_path):
+    with MockOpenAIServer(batch_delay=0) as server:
+        config = _config(server, tmp_path)
+        backend = OpenAIBatchBackend(initialize_openai_client(config))
+        responses_dir = str(tmp_path / "responses")
+        answered = run_batch([_prompt(1), _prompt(2)], backend, config, str(tmp_path / "batch"),
+                             responses_dir, poll_interval=0)
+    assert sorted(answered) == [1, 2]
+    with open(os.path.join(responses_dir, "slide_2_response.txt"), encoding='utf-8') as f:
+        assert f.read() == "Narração de Slide 2."
@@ -0,0 +1,59 @@
+import pytest
+import requests
+
+from src import tts_provider
+from src.tts_provider import create_tts_provider, GTTSProvider, ElevenLabsProvider
+from src.tts_pool import TTSPool
+from src.audio_utils import mp3_duration
+from src.mock_tts_server import MockTTSServer, CHARS_PER_SECOND
+
+TEXT = "A integral de uma função contínua num intervalo fechado existe."
+
+
+@pytest.fixture
+def server():
+    with MockTTSServer() as mock:
+        yield mock
+    tts_provider._sessions.clear()
+    tts_provider._validated_voices.clear()
+
+
+def _config(server):
+    return {'tts': {'provider': 'elevenlabs', 'gtts_base_url': server.base_url},
+            'elevenlabs': {'api_key': 'test', 'voice_id': 'voz', 'base_url': server.elevenlabs_url}}
+
+
+def test_gtts_shim(server, tmp_path):
+    config = _config(server)
+    config['tts']['provider'] = 'gtts'
+    provider = create_tts_provider(config)
+    assert isinstance(provider, GTTSProvider)
+    assert provider.generate_audio(TEXT, str(tmp_path / "a.mp3"))
+    assert abs(mp3_duration(str(tmp_path / "a.mp3")) - len(TEXT) / CHARS_PER_SECOND) < 0.05
+    assert server.stats["syntheses"] == 1
+
+
+def test_elevenlabs_streaming_is_deterministic(server, tmp_path):
+    provider = create_tts_provider(_config(server))
+    assert isinstance(provider, ElevenLabsProvider)
+    assert provider.generate_audio(TEXT, str(tmp_path / "a.mp3"))
+    assert provider.generate_audio(TEXT, str(tmp_path / "b.mp3"))
+    assert (tmp_path / "a.mp3").read_bytes() == (tmp_path / "b.mp3").read_bytes()
+    assert server.stats["voice_checks"] == 1
+
+
+def test_throttled_requests_are_retried(server, tmp_path):
+    server.throttle_first = 2
+    provider = create_tts_provider(_config(server))
+    pool = TTSPool(provider, concurrency=1, max_retries=2, retry_backoff=0.01)
+    assert pool.synthesize(TEXT, str(tmp_path / "a.mp3"))
+    assert server.stats["throttled"] == 2
+    assert pool.calls == 3
+
+
+def test_requests_beyond_the_limit_get_429(tmp_path):
+    with MockTTSServer(latency=0.3, max_concurrency=0) as mock:
+        response = requests.post(f"{mock.elevenlabs_url}/text-to-speech/voz", json={"text": TEXT},
+                                 headers={"xi-api-key": "test"})
+    assert response.status_code == 429
+    assert response.json()["detail"]["status"] == "too_many_concurrent_requests"
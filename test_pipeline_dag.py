@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.pipeline_dag import TaskGraph, PipelineError
+
+
+def _sleeper(seconds, value=None):
+    def stage(*_):
+        time.sleep(seconds)
+        return value
+    return stage
+
+
+def test_independent_stages_overlap():
+    graph = TaskGraph()
+    graph.add('parse', lambda: [1, 2, 3])
+    graph.add('images', lambda slides: time.sleep(0.3) or len(slides), ['parse'])
+    graph.add('audio', lambda slides: time.sleep(0.3) or sum(slides), ['parse'])
+    graph.add('video', lambda images, audio: (images, audio), ['images', 'audio'])
+    start = time.monotonic()
+    results = graph.run()
+    assert time.monotonic() - start < 0.5
+    assert results['video'] == (3, 6)
+
+
+def test_critical_path_follows_the_slowest_chain():
+    graph = TaskGraph()
+    graph.add('parse', _sleeper(0.01))
+    graph.add('images', _sleeper(0.05), ['parse'])
+    graph.add('narration', _sleeper(0.1), ['parse'])
+    graph.add('audio', _sleeper(0.1), ['narration'])
+    graph.add('video', _sleeper(0.01), ['images', 'audio'])
+    graph.run()
+    assert [task.name for task in graph.critical_path()] == ['parse', 'narration', 'audio', 'video']
+    assert "critical path: parse" in graph.report()
+
+
+def test_failure_skips_dependents_and_is_raised():
+    ran = []
+    graph = TaskGraph()
+    graph.add('parse', lambda: 1)
+    graph.add('images', lambda _: ran.append('images'), ['parse'])
+    graph.add('narration', lambda _: (_ for _ in ()).throw(PipelineError("no scripts")), ['parse'])
+    graph.add('audio', lambda _: ran.append('audio'), ['narration'])
+    with pytest.raises(PipelineError):
+        graph.run()
+    assert 'audio' not in ran
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        TaskGraph().add('video', lambda audio: audio, ['audio'])
+
+
+def test_graphs_can_share_an_executor():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for deck in range(2):
+            graph = TaskGraph(executor=executor)
+            graph.add('parse', lambda deck=deck: deck)
+            graph.add('video', lambda slides: slides * 10, ['parse'])
+            assert graph.run()['video'] == deck * 10
+        # Still usable: the graphs leave the shared pool running
+        assert executor.submit(lambda: 1).result() == 1
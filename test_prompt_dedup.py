@@ -0,0 +1,64 @@
+import threading
+from types import SimpleNamespace
+
+from src.latex_parser import Slide
+from src.automated_video_generation import generate_all_scripts, prepare_prompts
+from src.prompt_dedup import ScriptPlan, normalized_prompt
+
+
+class CountingClient:
+    def __init__(self):
+        self.titles = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, **options):
+        return self
+
+    def _create(self, **request):
+        user = request['messages'][-1]['content']
+        title = next(line[2:] for line in user.splitlines() if line.startswith('# '))
+        with self.lock:
+            self.titles.append(title)
+        message = SimpleNamespace(content=f"Narração de {title}.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _deck():
+    return [
+        Slide(1, "Outline", "Tópicos"),
+        Slide(2, "Section: Derivadas", ""),
+        Slide(3, "Definição", "A derivada mede a taxa de variação."),
+        Slide(4, "Resumo", "Pontos principais da aula."),
+        Slide(5, "Section: Integrais", ""),
+        Slide(6, "Resumo", "Pontos principais da aula."),
+    ]
+
+
+def test_duplicates_ignore_slide_position(tmp_path):
+    slides = _deck()
+    prompts = prepare_prompts(slides, {'output_dir': str(tmp_path)})
+    assert prompts[3]['prompt'] != prompts[5]['prompt']
+    assert normalized_prompt(prompts[3]) == normalized_prompt(prompts[5])
+    plan = ScriptPlan(slides, prompts, {})
+    assert [p['slide_number'] for p in plan.requests] == [3, 4]
+    assert sorted(plan.templates) == [0, 1, 4]
+    assert plan.report() == "Script requests: 2 for 6 slides (3 from templates, 1 duplicates)"
+
+
+def test_one_request_per_group_and_templates_for_trivial_slides(tmp_path):
+    client = CountingClient()
+    scripts = generate_all_scripts(_deck(), client, {'output_dir': str(tmp_path)})
+    assert sorted(client.titles) == ["Definição", "Resumo"]
+    assert scripts[0] == "Vamos ver os principais tópicos que serão abordados nesta apresentação."
+    assert scripts[1] == "Seção Derivadas."
+    assert scripts[3] == scripts[5] == "Narração de Resumo."
+
+
+def test_dedup_and_templates_can_be_turned_off(tmp_path):
+    client = CountingClient()
+    config = {'output_dir': str(tmp_path), 'openai': {'template_trivial_slides': False, 'dedupe_prompts': False}}
+    scripts = generate_all_scripts(_deck(), client, config)
+    assert len(client.titles) == 6
+    assert "Section: Derivadas" in client.titles
+    assert scripts[1] != "Seção Derivadas."
@@ -0,0 +1,114 @@
+import os
+import threading
+from types import SimpleNamespace
+
+from src.latex_parser import Slide
+from src import chatgpt_script_generator
+from src.chatgpt_script_generator import (
+    NARRATION_GUIDELINES, DeckContext, build_slide_prompts, format_slide_for_chatgpt, save_prompts_to_files,
+)
+from src.automated_video_generation import build_chat_request, generate_all_scripts, prepare_prompts
+from src.api_usage import PromptCacheStats, reset_usage_stats
+from src.run_report import run_report_lines
+
+CACHE_MIN_TOKENS = 1024
+CACHE_INCREMENT = 128
+
+
+def _request_text(request):
+    return "".join(message['content'] for message in request['messages'])
+
+
+class PrefixCachingClient:
+    """
+    Mimics the API's prompt caching: the longest prefix shared with an earlier prompt
+    is reported as cached, in 128-token steps and only from 1024 tokens on.
+    """
+
+    def __init__(self):
+        self.seen = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, **options):
+        return self
+
+    def _create(self, **request):
+        text = _request_text(request)
+        with self.lock:
+            shared = max((len(os.path.commonprefix([text, other])) for other in self.seen), default=0)
+            self.seen.append(text)
+        prompt_tokens = len(text) // 4
+        cached = shared // 4 // CACHE_INCREMENT * CACHE_INCREMENT
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=20,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=cached if cached >= CACHE_MIN_TOKENS else 0))
+        message = SimpleNamespace(content="Narração do slide.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def _deck(count):
+    return [Slide(i, f"Tópico {i}: propriedades da função exponencial", f"Conteúdo do slide {i}: \\( x_{i} = {i} \\)") for i in range(1, count + 1)]
+
+
+def test_requests_share_everything_up_to_the_slide():
+    slides = _deck(3)
+    requests = [build_chat_request(p, {}) for p in build_slide_prompts(slides)]
+    assert len({r['messages'][0]['content'] for r in requests}) == 1
+    assert NARRATION_GUIDELINES in requests[0]['messages'][0]['content']
+    users = [r['messages'][1]['content'] for r in requests]
+    prefix = os.path.commonprefix(users)
+    assert all(f"{i}. Tópico {i}:" in prefix for i in (1, 2, 3))
+    # Sequence information is per slide and comes after the shared outline
+    assert "Este é o slide 2 de 3" in users[1][len(prefix):]
+
+
+def test_saved_prompt_files_stay_self_contained(tmp_path):
+    prompts = build_slide_prompts(_deck(2))
+    path = save_prompts_to_files(prompts, str(tmp_path))[0]
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert text.startswith("## Apresentação")
+    assert "# Tópico 1:" in text
+    assert text.endswith(NARRATION_GUIDELINES)
+
+
+def test_prefix_cache_hits_are_reported(tmp_path):
+    stats = reset_usage_stats()
+    # A long outline, so the shared prefix passes the API's 1024-token minimum
+    slides = _deck(120)
+    config = {'output_dir': str(tmp_path),
+              'openai': {'concurrency': 1, 'requests_per_minute': 10 ** 6, 'tokens_per_minute': 10 ** 9}}
+    generate_all_scripts(slides, PrefixCachingClient(), config)
+    # Only the first request of the deck misses
+    assert (stats.requests, stats.cache_hits) == (120, 119)
+    assert stats.hit_rate() > 0.5
+    assert any(line.startswith("Prompt cache: 119/120 requests hit") for line in run_report_lines())
+
+
+def test_usage_from_batch_results_is_counted():
+    stats = PromptCacheStats()
+    stats.record({"prompt_tokens": 2000, "completion_tokens": 300, "prompt_tokens_details": {"cached_tokens": 1536}})
+    stats.record({"prompt_tokens": 1000, "completion_tokens": 100})
+    stats.record(None)
+    assert (stats.requests, stats.cache_hits, stats.cached_tokens) == (2, 1, 1536)
+    assert stats.report() == "Prompt cache: 1/2 requests hit, 1536 of 3000 prompt tokens cached (51%), 400 completion tokens"
+
+
+def test_deck_context_matches_formatting_without_it():
+    slides = _deck(3) + [Slide(4, "Tópico 3: propriedades da função exponencial", "Mais conteúdo"), Slide(5, "Fim", "")]
+    deck = DeckContext(slides)
+    assert [deck.continues_previous(i) for i in range(5)] == [False, False, False, True, False]
+    assert deck.continued_by_next(2) and not deck.continued_by_next(4)
+    assert deck.previous(0) is None and deck.next(4) is None
+    for i, slide in enumerate(slides):
+        assert format_slide_for_chatgpt(slide, slides, i, deck=deck) == format_slide_for_chatgpt(slide, slides, i)
+
+
+def test_script_prompts_do_not_parse_the_latex_again(tmp_path, monkeypatch):
+    def parse_again(path):
+        raise AssertionError("slides were parsed again")
+    monkeypatch.setattr(chatgpt_script_generator, 'parse_latex_file', parse_again)
+    config = {'output_dir': str(tmp_path), 'latex_file_path': str(tmp_path / "deck.tex")}
+    prompts = prepare_prompts(_deck(2), config)
+    assert [p['slide_number'] for p in prompts] == [1, 2]
+    assert "Este é o slide 2 de 2" in prompts[1]['prompt']
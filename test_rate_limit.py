@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from src.latex_parser import Slide
+from src.rate_limit import (TokenBucket, RateLimiter, retry_after_seconds, map_in_order, rate_limiter_from_config,
+                            share_rate_limiters)
+from src.automated_video_generation import generate_all_scripts, initialize_openai_client
+from src.mock_openai_server import MockOpenAIServer
+
+RESPONSE_DELAY = 0.2
+
+
+@pytest.fixture
+def mock_api():
+    with MockOpenAIServer(latency=RESPONSE_DELAY) as server:
+        yield server
+
+
+def _client_and_config(server, tmp_path, **openai_options):
+    config = {'output_dir': str(tmp_path),
+              'openai': {'model': 'gpt-4o', 'api_key': 'test', 'base_url': server.base_url, **openai_options}}
+    return initialize_openai_client(config), config
+
+
+def _slides(count):
+    return [Slide(i + 1, f"Slide {i + 1}", f"Conteúdo do slide {i + 1}") for i in range(count)]
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(capacity=2, rate=20)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire(1)
+    # Two tokens are available up front, the other four arrive at 20 per second
+    assert time.monotonic() - start >= 0.18
+
+
+def test_retry_after_header_parsing():
+    class Response:
+        headers = {'retry-after': '1.5'}
+
+    class Error(Exception):
+        response = Response()
+
+    assert retry_after_seconds(Error(), default=9) == 1.5
+    Response.headers = {'retry-after-ms': '250'}
+    assert retry_after_seconds(Error(), default=9) == 0.25
+    Response.headers = {}
+    assert retry_after_seconds(Error(), default=9) == 9
+
+
+def test_map_in_order_keeps_item_order():
+    def slow_identity(n):
+        time.sleep(0.01 * (5 - n))
+        return n
+    assert map_in_order(slow_identity, list(range(5)), concurrency=5) == [0, 1, 2, 3, 4]
+
+
+def test_limiters_are_shared_per_account_only_when_enabled():
+    config = {'openai': {'api_key': 'k1', 'requests_per_minute': 60}}
+    assert rate_limiter_from_config(config) is not rate_limiter_from_config(config)
+    share_rate_limiters(True)
+    try:
+        shared = rate_limiter_from_config(config)
+        assert rate_limiter_from_config({'openai': {'api_key': 'k1'}}) is shared
+        assert rate_limiter_from_config({'openai': {'api_key': 'k2'}}) is not shared
+    finally:
+        share_rate_limiters(False)
+
+
+def test_scripts_are_generated_concurrently_in_slide_order(mock_api, tmp_path):
+    client, config = _client_and_config(mock_api, tmp_path, concurrency=8)
+    start = time.monotonic()
+    scripts = generate_all_scripts(_slides(8), client, config)
+    elapsed = time.monotonic() - start
+
+    assert scripts == [f"Narração de Slide {i}." for i in range(1, 9)]
+    # Eight serial calls would take at least 8 * RESPONSE_DELAY
+    assert elapsed < 4 * RESPONSE_DELAY
+
+
+def test_rate_limited_requests_wait_for_retry_after(mock_api, tmp_path):
+    mock_api.throttle_first = 1
+    mock_api.retry_after = 1
+    client, config = _client_and_config(mock_api, tmp_path, concurrency=1)
+    start = time.monotonic()
+    scripts = generate_all_scripts(_slides(2), client, config)
+
+    assert scripts == ["Narração de Slide 1.", "Narração de Slide 2."]
+    assert time.monotonic() - start >= 1
+    assert mock_api.stats["requests"] == 3
+
+
+def test_server_errors_are_retried(mock_api, tmp_path):
+    mock_api.fail_first = 1
+    client, config = _client_and_config(mock_api, tmp_path, concurrency=1)
+    scripts = generate_all_scripts(_slides(1), client, config)
+
+    assert scripts == ["Narração de Slide 1."]
+    assert mock_api.stats["errors"] == 1
+    assert mock_api.stats["requests"] == 2
+
+
+def test_requests_per_minute_limit_is_applied():
+    limiter = RateLimiter(requests_per_minute=120, tokens_per_minute=100000)
+    start = time.monotonic()
+    results = [limiter.call(lambda: 'ok', tokens=10) for _ in range(122)]
+    # The bucket starts full with 120 requests, the next two arrive at 2 per second
+    assert results.count('ok') == 122
+    assert time.monotonic() - start >= 0.9
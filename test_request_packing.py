@@ -0,0 +1,99 @@
+import re
+import json
+import threading
+from types import SimpleNamespace
+
+from src.request_packing import plan_packs, parse_packed_response, build_packed_request, generate_packed_scripts
+from src.automated_video_generation import generate_all_scripts
+from src.latex_parser import Slide
+from src.llm_cache import configure_llm_cache, set_llm_cache
+
+
+class FakeChatClient:
+    """Answers packed requests with JSON and single-slide requests with plain text."""
+
+    def __init__(self, broken_packs=False):
+        self.requests = []
+        self.broken_packs = broken_packs
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, **options):
+        return self
+
+    def _create(self, **request):
+        with self.lock:
+            self.requests.append(request)
+        user = request['messages'][-1]['content']
+        if 'response_format' in request:
+            numbers = [int(n) for n in re.findall(r'^### Slide (\d+)$', user, re.MULTILINE)]
+            content = "not json" if self.broken_packs else json.dumps(
+                {"scripts": [{"slide_number": n, "script": f"Roteiro do slide {n}."} for n in numbers]})
+        else:
+            content = "Roteiro individual de " + re.search(r'^# (.+)$', user, re.MULTILINE).group(1) + "."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _prompt(number, length=100):
+    return {"slide_number": number, "title": f"Slide {number}", "prompt": f"# Slide {number}\n\n" + "x" * length}
+
+
+def test_pack_size_follows_token_budget():
+    prompts = [_prompt(1), _prompt(2), _prompt(3), _prompt(4, length=8000), _prompt(5)]
+    packs = plan_packs(prompts, token_budget=1500, max_tokens_per_slide=1000)
+    assert [[p["slide_number"] for p in pack] for pack in packs] == [[1, 2, 3], [4], [5]]
+    # The model cannot return more than MAX_PACK_OUTPUT_TOKENS in one answer
+    packs = plan_packs([_prompt(i) for i in range(40)], token_budget=10 ** 6, max_tokens_per_slide=4000)
+    assert max(len(pack) for pack in packs) == 4
+
+
+def test_packed_request_shares_one_system_message():
+    request = build_packed_request([_prompt(1), _prompt(2)], {'openai': {'max_tokens': 500}})
+    assert len(request['messages']) == 2
+    assert request['max_tokens'] == 1000
+    assert "### Slide 1" in request['messages'][1]['content']
+    assert "### Slide 2" in request['messages'][1]['content']
+
+
+def test_parse_requires_every_slide():
+    pack = [_prompt(1), _prompt(2)]
+    assert parse_packed_response('{"scripts": [{"slide_number": 1, "script": "a"}, {"slide_number": "2", "script": "b"}]}', pack) == {1: "a", 2: "b"}
+    assert parse_packed_response('[{"slide_number": 1, "script": "a"}]', pack) is None
+    assert parse_packed_response('{"scripts": [{"slide_number": 1, "script": "a"}, {"slide_number": 2, "script": " "}]}', pack) is None
+    assert parse_packed_response('```json', pack) is None
+
+
+def test_packed_generation_uses_fewer_requests():
+    client = FakeChatClient()
+    scripts = generate_packed_scripts([_prompt(i) for i in range(1, 6)], client, {'openai': {}})
+    assert scripts == [f"Roteiro do slide {i}." for i in range(1, 6)]
+    assert len(client.requests) == 1
+
+
+def test_unparseable_pack_falls_back_to_single_slides(tmp_path):
+    client = FakeChatClient(broken_packs=True)
+    slides = [Slide(i, f"Slide {i}", f"Conteúdo {i}") for i in range(1, 4)]
+    config = {'output_dir': str(tmp_path), 'openai': {'pack_slides': True}}
+    scripts = generate_all_scripts(slides, client, config)
+    assert scripts == [f"Roteiro individual de Slide {i}." for i in range(1, 4)]
+    assert len(client.requests) == 4
+
+
+def test_unparseable_pack_is_not_cached(tmp_path):
+    config = {'openai': {}, 'cache': {'dir': str(tmp_path / "cache")}}
+    configure_llm_cache(config)
+    try:
+        prompts = [_prompt(i) for i in range(1, 4)]
+        broken = FakeChatClient(broken_packs=True)
+        generate_packed_scripts(prompts, broken, config)
+        assert len(broken.requests) == 4
+
+        # The next run asks for the pack again instead of replaying the broken answer
+        client = FakeChatClient()
+        scripts = generate_packed_scripts(prompts, client, config)
+        assert scripts == [f"Roteiro do slide {i}." for i in range(1, 4)]
+        assert ['response_format' in request for request in client.requests] == [True]
+        # And the good answer is the one cached
+        assert generate_packed_scripts(prompts, FakeChatClient(broken_packs=True), config) == scripts
+    finally:
+        set_llm_cache(None)
@@ -0,0 +1,119 @@
+import os
+import threading
+
+import pytest
+
+from src import segment_streamer
+from src.segment_streamer import SegmentStreamer
+from src.build_manifest import BuildManifest, MANIFEST_FILENAME
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """
+    Replace the ffmpeg steps with recorders that write the output files. Every audio
+    file lasts 0.25s.
+    """
+    calls = {"segments": [], "concats": [], "narrations": []}
+    lock = threading.Lock()
+
+    def prepare(img_path, processed_path, *args):
+        open(processed_path, 'w').close()
+
+    def encode(img_path, frame_count, segment_path, config):
+        with lock:
+            calls["segments"].append((os.path.basename(segment_path), frame_count))
+        with open(segment_path, 'w') as f:
+            f.write(str(frame_count))
+
+    def narration(audio_files, temp_dir, config):
+        with lock:
+            calls["narrations"].append([os.path.basename(p) for p in audio_files])
+        return os.path.join(temp_dir, 'narration.mp3'), ['-c:a', 'copy']
+
+    def mux(segment_paths, narration_path, audio_codec_args, output_path):
+        with lock:
+            calls["concats"].append((os.path.basename(output_path), [os.path.basename(p) for p in segment_paths]))
+        open(output_path, 'w').close()
+
+    monkeypatch.setattr(segment_streamer, 'prepare_slide_image', prepare)
+    monkeypatch.setattr(segment_streamer, 'audio_duration', lambda path: 0.25)
+    monkeypatch.setattr(segment_streamer, 'encode_slide_segment', encode)
+    monkeypatch.setattr(segment_streamer, 'build_narration_track', narration)
+    monkeypatch.setattr(segment_streamer, 'mux_segments', mux)
+    return calls
+
+
+def _config(tmp_path, **pipeline):
+    return {'output_dir': str(tmp_path), 'pipeline': pipeline, 'video': {'output_filename': 'out.mp4', 'fps': 10}}
+
+
+def test_segments_start_when_image_and_audio_are_both_ready(tmp_path, encoder):
+    streamer = SegmentStreamer(_config(tmp_path, preview_interval=0))
+    streamer.audio_ready(1, 'audio_2.mp3')
+    streamer.audio_ready(0, 'audio_1.mp3')
+    # No images yet: nothing can be encoded
+    assert not streamer.futures
+    streamer.set_images(['slide-1.png', 'slide-2.png', 'slide-3.png'])
+    streamer.audio_ready(2, 'audio_3.mp3')
+
+    output = streamer.finish(3)
+    assert output == os.path.join(str(tmp_path), 'out.mp4')
+    # Frames follow the joined narration (0.25s, 0.5s, 0.75s at 10 fps), not each clip rounded alone
+    assert sorted(encoder["segments"]) == [('segment_001.mp4', 2), ('segment_002.mp4', 3), ('segment_003.mp4', 3)]
+    assert encoder["concats"][-1] == ('out.mp4', ['segment_001.mp4', 'segment_002.mp4', 'segment_003.mp4'])
+    # The narration is built once per mux, from the audio of exactly the muxed slides
+    assert encoder["narrations"][-1] == ['audio_1.mp3', 'audio_2.mp3', 'audio_3.mp3']
+    assert all(len(audio) == len(segments) for audio, (_, segments) in zip(encoder["narrations"], encoder["concats"]))
+    # Previews only ever hold the finished prefix, and are gone once the video exists
+    for name, segments in encoder["concats"][:-1]:
+        assert name == 'preview.mp4'
+        assert segments == [f'segment_{k:03d}.mp4' for k in range(1, len(segments) + 1)]
+    assert not os.path.exists(streamer.preview_path)
+    assert "3/3 segments (100%)" in streamer.report()
+
+
+def test_segments_wait_for_the_audio_of_earlier_slides(tmp_path, encoder):
+    streamer = SegmentStreamer(_config(tmp_path, preview_interval=0))
+    streamer.set_images(['slide-1.png', 'slide-2.png'])
+    # Slide 2 starts where slide 1's audio ends, which is not known yet
+    streamer.audio_ready(1, 'audio_2.mp3')
+    assert not streamer.futures
+    streamer.audio_ready(0, 'audio_1.mp3')
+    streamer.close()
+    assert "2/2 segments (100%)" in streamer.progress()
+    assert sorted(encoder["segments"]) == [('segment_001.mp4', 2), ('segment_002.mp4', 3)]
+
+
+def test_missing_segment_fails_the_video(tmp_path, encoder):
+    streamer = SegmentStreamer(_config(tmp_path))
+    streamer.set_images(['slide-1.png', 'slide-2.png'])
+    streamer.audio_ready(0, 'audio_1.mp3')
+    assert streamer.finish(2) == ""
+    assert all(name != 'out.mp4' for name, _ in encoder["concats"])
+
+
+def test_checkpointed_segments_are_reused(tmp_path, encoder):
+    images = []
+    audio = []
+    for k in (1, 2):
+        images.append(str(tmp_path / f"slide_{k}.png"))
+        audio.append(str(tmp_path / f"audio_{k}.mp3"))
+        open(images[-1], 'w').write(f"png {k}")
+        open(audio[-1], 'w').write(f"mp3 {k}")
+    manifest_path = str(tmp_path / MANIFEST_FILENAME)
+
+    first = SegmentStreamer(_config(tmp_path), manifest=BuildManifest(manifest_path))
+    first.set_images(images)
+    first.audio_ready(0, audio[0])
+    # The run stops before slide 2 has audio; slide 1's segment is kept
+    first.close()
+    assert len(encoder["segments"]) == 1
+
+    open(audio[1], 'w').write("mp3 2")
+    second = SegmentStreamer(_config(tmp_path), manifest=BuildManifest(manifest_path), reuse=True)
+    second.set_images(images)
+    second.audio_ready(0, audio[0])
+    second.audio_ready(1, audio[1])
+    assert second.finish(2)
+    assert [name for name, _ in encoder["segments"]] == ['segment_001.mp4', 'segment_002.mp4']
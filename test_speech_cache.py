@@ -0,0 +1,69 @@
+import os
+import multiprocessing
+import pytest
+
+from src import speech_cache
+from src.speech_cache import FormulaSpeechCache, configure_formula_cache, set_formula_cache, get_formula_cache
+from src.math_speech import latex_to_speech_pt, SPEECH_CACHE_ENGINE
+from src.narration_generator import latex_math_to_speakable_text_pt
+from src.run_report import run_report_lines
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    yield str(tmp_path / "formula_speech.sqlite3")
+    set_formula_cache(None)
+
+
+def _store_in_child(path):
+    FormulaSpeechCache(path).put("engine/1", "pt", "x^2", "x ao quadrado")
+
+
+def test_entries_are_keyed_by_engine_and_language(cache_path):
+    cache = FormulaSpeechCache(cache_path)
+    cache.put("engine/1", "pt", "x^2", "x ao quadrado")
+    assert cache.get("engine/1", "pt", "x^2") == "x ao quadrado"
+    assert cache.get("engine/2", "pt", "x^2") is None
+    assert cache.get("engine/1", "en", "x^2") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_entries_are_evicted(cache_path, monkeypatch):
+    monkeypatch.setattr(speech_cache, "EVICTION_CHECK_INTERVAL", 1)
+    cache = FormulaSpeechCache(cache_path, max_bytes=300)
+    for i in range(10):
+        cache.put("engine/1", "pt", f"f_{i}", "x" * 50)
+        if i >= 1:
+            # Keep the first formula in use so that it survives eviction
+            cache.get("engine/1", "pt", "f_0")
+    assert cache.entry_count() < 10
+    assert cache.get("engine/1", "pt", "f_0") is not None
+    assert cache.get("engine/1", "pt", "f_1") is None
+
+
+def test_cache_is_shared_between_processes(cache_path):
+    process = multiprocessing.get_context("spawn").Process(target=_store_in_child, args=(cache_path,))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    assert FormulaSpeechCache(cache_path).get("engine/1", "pt", "x^2") == "x ao quadrado"
+
+
+def test_speech_engines_use_the_configured_cache(cache_path):
+    formula = r"\frac{\hbar^2}{2 m_{persist}}"
+    config = {'cache': {'dir': os.path.dirname(cache_path)}}
+    cache = configure_formula_cache(config)
+    assert get_formula_cache() is cache
+    speech = latex_to_speech_pt(formula)
+    assert cache.get(SPEECH_CACHE_ENGINE, "pt", formula) == speech
+
+    narration = latex_math_to_speakable_text_pt(r"$E_{persist} = mc^2$")
+    assert latex_math_to_speakable_text_pt(r"$E_{persist} = mc^2$") == narration
+    assert cache.hits >= 2
+    assert any(line.startswith("Formula speech cache:") for line in run_report_lines())
+
+
+def test_cache_can_be_disabled(cache_path):
+    assert configure_formula_cache({'cache': {'formula_speech': False}}) is None
+    assert get_formula_cache() is None
+    assert not any(line.startswith("Formula speech cache:") for line in run_report_lines())
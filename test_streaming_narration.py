@@ -0,0 +1,143 @@
+import os
+import re
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.streaming_narration import SentenceSplitter, split_sentences, stream_scripts_to_audio
+from src.audio_utils import strip_id3_tags, concatenate_mp3
+from src.tts_provider import TTSProvider
+
+CHUNK_DELAY = 0.02
+ID3_TAG = b'ID3\x04\x00\x00\x00\x00\x00\x02ab'
+
+
+class FakeStreamingClient:
+    """Streams a fixed answer per slide title, a few characters per chunk."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.stream_ended = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, **options):
+        return self
+
+    def _create(self, stream=False, **request):
+        title = re.search(r'^# (.+)$', request['messages'][-1]['content'], re.MULTILINE).group(1)
+        answer = self.answers[title]
+
+        def chunks():
+            for start in range(0, len(answer), 8):
+                time.sleep(CHUNK_DELAY)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=answer[start:start + 8]))])
+            self.stream_ended[title] = time.monotonic()
+        return chunks()
+
+
+class FakeTTSProvider(TTSProvider):
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+
+    def generate_audio(self, text, output_path):
+        with self.lock:
+            self.calls.append((time.monotonic(), text))
+        if self.fail_on and self.fail_on in text:
+            return False
+        with open(output_path, 'wb') as f:
+            f.write(ID3_TAG + text.encode('utf-8'))
+        return True
+
+
+ANSWERS = {
+    "Slide 1": "Claro, aqui está: Nesta aula vamos estudar a energia cinética. "
+               "A fórmula é \\( E = \\frac{1}{2} m v^2 \\). Isso conclui o slide.",
+    "Slide 2": "Agora vemos o momento linear de uma partícula. Ele vale p igual a m v no caso clássico.",
+}
+
+
+def _prompts():
+    return [{"slide_number": i, "title": f"Slide {i}", "prompt": f"# Slide {i}\n\nConteúdo"} for i in (1, 2)]
+
+
+def test_splitter_emits_sentences_as_they_complete():
+    splitter = SentenceSplitter(min_chars=10)
+    assert splitter.feed("Primeira frase completa. Segunda fr") == ["Primeira frase completa."]
+    assert splitter.feed("ase aqui! ") == ["Segunda frase aqui!"]
+    assert splitter.flush() == []
+
+
+def test_splitter_does_not_cut_inside_math_or_short_sentences():
+    text = r"A soma \( 1. 2 \) aparece aqui. Sim. Então continuamos com o resto da explicação."
+    assert split_sentences(text, min_chars=10) == [
+        r"A soma \( 1. 2 \) aparece aqui.",
+        "Sim. Então continuamos com o resto da explicação.",
+    ]
+
+
+def test_mp3_parts_are_joined_without_tags(tmp_path):
+    assert strip_id3_tags(ID3_TAG + b'frames' + b'TAG' + b'\x00' * 125) == b'frames'
+    parts = []
+    for i, data in enumerate([ID3_TAG + b'one', b'two']):
+        parts.append(str(tmp_path / f"part{i}.mp3"))
+        with open(parts[-1], 'wb') as f:
+            f.write(data)
+    output = concatenate_mp3(parts, str(tmp_path / "joined.mp3"))
+    with open(output, 'rb') as f:
+        assert f.read() == b'onetwo'
+
+
+def test_sentences_reach_tts_before_the_stream_ends(tmp_path):
+    client = FakeStreamingClient(ANSWERS)
+    provider = FakeTTSProvider()
+    config = {'output_dir': str(tmp_path), 'openai': {'concurrency': 2}}
+
+    scripts, audio_paths = stream_scripts_to_audio(_prompts(), client, config, provider)
+
+    assert audio_paths == [os.path.join(str(tmp_path), 'audio', f"audio_{i}.mp3") for i in (1, 2)]
+    assert scripts[0] == ("Nesta aula vamos estudar a energia cinética. "
+                          "A fórmula é E igual a 1 dividido por 2 m v ao quadrado. Isso conclui o slide.")
+    first_tts_call = min(call_time for call_time, _ in provider.calls)
+    assert first_tts_call < client.stream_ended["Slide 1"]
+
+    with open(audio_paths[1], 'rb') as f:
+        audio = f.read()
+    assert audio.startswith(b"Agora vemos o momento linear")
+    assert b'ID3' not in audio
+    assert not os.listdir(os.path.join(str(tmp_path), 'audio', 'parts'))
+
+
+def test_failed_sentence_fails_the_deck(tmp_path):
+    client = FakeStreamingClient(ANSWERS)
+    config = {'output_dir': str(tmp_path)}
+    scripts, audio_paths = stream_scripts_to_audio(_prompts(), client, config, FakeTTSProvider(fail_on="momento"))
+    assert len(scripts) == 2
+    assert audio_paths == []
+
+
+def test_stream_failure_leaves_no_part_files(tmp_path):
+    client = FakeStreamingClient(ANSWERS)
+    create = client._create
+
+    def failing_create(stream=False, **request):
+        chunks = create(stream=stream, **request)
+
+        def broken():
+            # Nine chunks of 8 characters hold the first sentence of both slides
+            for _ in range(9):
+                yield next(chunks)
+            raise ConnectionError("stream dropped")
+        return broken()
+    client.chat.completions.create = failing_create
+    provider = FakeTTSProvider()
+    config = {'output_dir': str(tmp_path)}
+
+    scripts, audio_paths = stream_scripts_to_audio(_prompts(), client, config, provider)
+
+    assert audio_paths == []
+    assert provider.calls
+    assert not os.listdir(os.path.join(str(tmp_path), 'audio', 'parts'))
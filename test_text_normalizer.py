@@ -0,0 +1,95 @@
+import os
+import re
+import shutil
+import tempfile
+import pytest
+
+from src.text_normalizer import (
+    Rule, TextNormalizer, normalize_chatgpt_response, normalize_for_narration,
+    replace_y_with_ipsilon, find_narration_issues,
+)
+from src.automated_video_generation import process_scripts_for_narration
+
+
+@pytest.fixture
+def temp_scripts_dir():
+    temp_dir = tempfile.mkdtemp()
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def test_stage_is_compiled_into_one_pass():
+    normalizer = TextNormalizer([
+        ('symbols', [
+            Rule(r'\\nabla\s*\\times', 'rotacional'),
+            Rule(r'\\nabla', 'gradiente'),
+            Rule(r'\\times', 'vezes'),
+            Rule(r'(\w)_(\w)', r'\1 índice \2'),
+        ]),
+    ])
+    assert len(normalizer.stages) == 1
+    assert normalizer(r"\nabla \times A") == "rotacional A"
+    assert normalizer(r"\nabla f \times x_i") == "gradiente f vezes x índice i"
+
+
+def test_rule_flags_are_scoped_to_their_rule():
+    normalizer = TextNormalizer([
+        ('mixed', [
+            Rule(r'^claro.*?:', '', re.IGNORECASE | re.MULTILINE),
+            Rule(r'fim', 'FIM'),
+        ]),
+    ])
+    assert normalizer("Claro, aqui está: texto\nFim e fim") == "texto\nFim e FIM"
+
+
+def test_rules_with_back_references_are_rejected():
+    with pytest.raises(ValueError):
+        TextNormalizer([('bad', [Rule(r'(a)\1', 'b')])])
+
+
+def test_chatgpt_response_cleanup():
+    raw = "Claro, aqui está o script: **Olá** a todos!\n\n- Vemos \\alpha e \\Gamma.\n[Fim]"
+    assert normalize_chatgpt_response(raw) == "Olá a todos! Vemos alfa e Gama maiúsculo."
+
+
+@pytest.mark.parametrize("raw, expected", [
+    # Outputs of the old sequential clean_chatgpt_response, where rules see each other's results
+    ("**negrito com *italico* dentro**", "negrito com italico dentro"),
+    ("__sub _it_ x__", "sub it x"),
+    ("`**código**` e **`x`**", "código e x"),
+    (r"A raiz \sqrt{\pi} e \sqrt{\alpha + 1}", "A raiz raiz quadrada de pi e raiz quadrada de alfa + 1"),
+    (r"\frac{\pi}{2} e \sqrt[3]{\beta}", "pi dividido por 2 e raiz cúbica de beta"),
+    (r"\sqrt{\infty} \sqrt{x \cdot y}", "raiz quadrada de infinito raiz quadrada de x vezes y"),
+    (r"e^{x^2} e x^{\sqrt{2}}", "e sobrescrito x sobrescrito 2 e x sobrescrito raiz quadrada de 2"),
+    (r"$x_{i}^{2}$ e \(\sqrt{\theta}\)", "x subscrito i sobrescrito 2 e raiz quadrada de teta"),
+])
+def test_chatgpt_response_cleanup_matches_the_sequential_chain(raw, expected):
+    assert normalize_chatgpt_response(raw) == expected
+
+
+def test_narration_normalization():
+    assert normalize_for_narration(r"Seja \( f(x, y) = xy \) com \lambda") == "Seja  f(x, ipsilon) = x·ipsilon  com "
+    assert replace_y_with_ipsilon("y + 2y") == "ipsilon + 2·ipsilon"
+    assert find_narration_issues("ipsilon") == []
+    assert find_narration_issues(r"\alpha e y")
+
+
+def test_process_scripts_for_narration_writes_each_file_once(temp_scripts_dir):
+    untouched = os.path.join(temp_scripts_dir, "slide_1_response.txt")
+    changed = os.path.join(temp_scripts_dir, "slide_2_response.txt")
+    with open(untouched, 'w', encoding='utf-8') as f:
+        f.write("Texto sem marcação.")
+    with open(changed, 'w', encoding='utf-8') as f:
+        f.write(r"O ponto \( (x, y) \).")
+    os.utime(untouched, (0, 0))
+
+    assert process_scripts_for_narration(temp_scripts_dir)
+
+    with open(changed, encoding='utf-8') as f:
+        assert f.read() == "O ponto  (x, ipsilon) ."
+    # Files that need no change are not rewritten
+    assert os.path.getmtime(untouched) == 0
+
+
+def test_process_scripts_for_narration_without_files(temp_scripts_dir):
+    assert process_scripts_for_narration(temp_scripts_dir) is False
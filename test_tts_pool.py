@@ -0,0 +1,119 @@
+import time
+import threading
+
+from src.tts_provider import TTSProvider
+from src.tts_pool import TTSPool, tts_concurrency, tts_requests_per_minute, share_tts_limits
+from src import audio_generator
+
+
+class SlowProvider(TTSProvider):
+    """Takes `latency` seconds per request and fails the first `failures` requests for a text."""
+
+    max_concurrency = 3
+
+    def __init__(self, latency=0.1, failures=None):
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def generate_audio(self, text, output_path):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures.get(text, 0) > 0
+            if fail:
+                self.failures[text] -= 1
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+        if fail:
+            return False
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return True
+
+
+def test_limits_come_from_config_or_provider():
+    provider = SlowProvider()
+    assert tts_concurrency(provider, {}) == 3
+    assert tts_concurrency(provider, {'tts': {'concurrency': 5}}) == 5
+    assert tts_requests_per_minute(provider, {}) is None
+    assert tts_requests_per_minute(provider, {'tts': {'delay_between_calls': 0.5}}) == 120
+
+
+def test_pool_runs_in_parallel_and_keeps_order(tmp_path):
+    provider = SlowProvider(latency=0.2)
+    pool = TTSPool(provider, concurrency=3)
+    jobs = [(f"Texto {i}", str(tmp_path / f"audio_{i}.mp3")) for i in range(6)]
+    start = time.monotonic()
+    assert pool.synthesize_all(jobs) == [True] * 6
+    # Six serial requests would take 1.2s
+    assert time.monotonic() - start < 0.9
+    assert provider.max_in_flight == 3
+
+
+def test_failed_slide_is_retried(tmp_path):
+    provider = SlowProvider(latency=0, failures={"Texto 1": 1, "Texto 2": 5})
+    pool = TTSPool(provider, concurrency=2, max_retries=2, retry_backoff=0)
+    jobs = [(f"Texto {i}", str(tmp_path / f"audio_{i}.mp3")) for i in range(3)]
+    assert pool.synthesize_all(jobs) == [True, True, False]
+    assert pool.calls == 1 + 2 + 3
+
+
+def test_rate_limit_spaces_requests(tmp_path):
+    pool = TTSPool(SlowProvider(latency=0), concurrency=4, requests_per_minute=600)
+    start = time.monotonic()
+    pool.synthesize_all([(f"Texto {i}", str(tmp_path / f"audio_{i}.mp3")) for i in range(4)])
+    # One request up front, the other three at 10 per second
+    assert time.monotonic() - start >= 0.28
+
+
+def test_generate_all_audio_is_concurrent_without_fixed_delay(tmp_path, monkeypatch):
+    provider = SlowProvider(latency=0.2)
+    monkeypatch.setattr(audio_generator, 'create_tts_provider', lambda config: provider)
+    start = time.monotonic()
+    paths = audio_generator.generate_all_audio(["Um", "Dois", "Três", "Um"], {'output_dir': str(tmp_path)})
+    assert time.monotonic() - start < 0.6
+    assert [p.rsplit('_', 1)[1] for p in paths] == ["1.mp3", "2.mp3", "3.mp3", "4.mp3"]
+    with open(paths[3], encoding='utf-8') as f:
+        assert f.read() == "Um"
+
+
+class TruncatingProvider(TTSProvider):
+    """Writes part of the audio, then fails as a dropped connection would."""
+
+    def generate_audio(self, text, output_path):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(text[:3])
+        raise ConnectionError("connection reset")
+
+
+def test_failed_request_never_leaves_a_truncated_file(tmp_path):
+    output = tmp_path / "audio_1.mp3"
+    output.write_text("previous run")
+    pool = TTSPool(TruncatingProvider(), max_retries=0)
+    assert pool.synthesize_all([("Texto completo", str(output))]) == [False]
+    assert output.read_text() == "previous run"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["audio_1.mp3"]
+
+
+def test_pools_of_concurrent_decks_share_the_account_limit(tmp_path):
+    provider = SlowProvider(latency=0.1)
+    config = {'tts': {'concurrency': 2}}
+    share_tts_limits(True)
+    try:
+        pools = [TTSPool.from_config(provider, config) for _ in range(2)]
+    finally:
+        share_tts_limits(False)
+    threads = [threading.Thread(target=pool.synthesize_all,
+                                args=([(f"Deck {d} texto {i}", str(tmp_path / f"d{d}_{i}.mp3")) for i in range(4)],))
+               for d, pool in enumerate(pools)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Two decks with two requests each would reach four without the shared limit
+    assert provider.max_in_flight == 2
+    assert TTSPool.from_config(provider, config).slots is None
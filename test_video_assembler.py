@@ -13,7 +13,7 @@ from pydub import AudioSegment
 import yaml
 
 # Adjust the import path if necessary
-from src.simple_video_assembler import assemble_video, load_config
+from src.simple_video_assembler import assemble_video, load_config, segment_frame_counts, build_narration_track
 
 class TestVideoAssembler(unittest.TestCase):
 
@@ -91,5 +91,27 @@ class TestVideoAssembler(unittest.TestCase):
         output_video_path = assemble_video([], [], self.config)
         self.assertEqual(output_video_path, "", "Video assembly should fail with no image files.")
 
+class TestNarrationTrack(unittest.TestCase):
+    """Timing and narration joining that need no ffmpeg."""
+
+    def test_frame_counts_do_not_drift(self):
+        counts = segment_frame_counts([1.01] * 100, 30)
+        self.assertEqual(sum(counts), round(101 * 30))
+        self.assertTrue(all(c in (30, 31) for c in counts))
+
+    def test_matching_mp3s_are_joined_and_copied(self):
+        frame = b'\xff\xfb\x90\x64' + b'\x00' * 413
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for i in range(2):
+                paths.append(os.path.join(temp_dir, f"audio_{i + 1}.mp3"))
+                with open(paths[-1], 'wb') as f:
+                    f.write(frame * (i + 1))
+            narration, codec_args = build_narration_track(paths, temp_dir, {'video': {'audio_codec': 'copy'}})
+            with open(narration, 'rb') as f:
+                self.assertEqual(f.read(), frame * 3)
+            self.assertEqual(codec_args, ['-c:a', 'copy'])
+
+
 if __name__ == '__main__':
     unittest.main()